@@ -1,7 +1,7 @@
 import os
 import time
 import threading
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, render_template, request, jsonify, send_file, Response, stream_with_context
 from werkzeug.utils import secure_filename
 import tkinter as tk
 from tkinter import filedialog
@@ -12,6 +12,17 @@ import openai
 from dotenv import load_dotenv
 from collections import deque
 import traceback
+import job_scheduler
+import workspace
+import source_cache
+import render_cache
+import hashlib
+import encode_profiles
+import cancellation
+import task_events
+import task_store
+import artifacts
+import uploads
 
 # Load environment variables
 load_dotenv()
@@ -34,10 +45,28 @@ except ImportError as e:
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = 'output'  # Default folder
 app.config['MAX_CONTENT_LENGTH'] = 1024 * 1024 * 1024  # 1GB max upload size
+app.config['RENDER_BACKEND'] = os.getenv('RENDER_BACKEND', 'moviepy')  # 'moviepy' or 'ffmpeg'
+app.config['ENCODE_PROFILE'] = os.getenv('ENCODE_PROFILE', encode_profiles.DEFAULT_PROFILE)
+app.config['MAX_WORKERS'] = int(os.getenv('MAX_WORKERS', max(1, (os.cpu_count() or 2) // 2)))  # Concurrent encodes
+app.config['MAX_QUEUE'] = int(os.getenv('MAX_QUEUE', 20))  # Jobs allowed to wait for a worker
+app.config['AUTO_CANCEL_AFTER'] = int(os.getenv('AUTO_CANCEL_AFTER', 0))  # Cancel jobs unpolled this long (s); 0 = off
+app.config['REFRAME'] = os.getenv('REFRAME', 'false').lower() == 'true'  # Follow the subject instead of a center crop (opt-in)
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
-# Dictionary to store processing status
-processing_tasks = {}
+# Task records, persisted in SQLite (TASK_DB)
+processing_tasks = task_store.get_task_store()
+# Change notifications for /events streams
+task_updates = task_events.TaskEvents()
+# Version counters go with the records the store releases
+processing_tasks.on_release = task_updates.forget
+# Seconds a finished job waits for the rest of its chunked upload, to cache the render under its digest
+UPLOAD_KEY_WAIT = 30
+# Granularity (s) of the wait/run times in /status, so unchanged tasks can still get a 304
+STATUS_TIME_STEP = 5
+
+# Job scheduler, created on first use so worker processes importing this module don't start their own
+scheduler = None
+scheduler_lock = threading.Lock()
 
 # Global variable to ensure Tkinter is only used in the main thread
 main_thread = threading.current_thread()
@@ -46,7 +75,7 @@ main_thread = threading.current_thread()
 chat_history = {}
 MAX_HISTORY_LENGTH = 10
 
-def process_video(task_id, url, output_path, format_type, duration=45, captions=True):
+def process_video(task_id, url, output_path, format_type, duration=45, captions=True, render_backend='moviepy'):
     """Process a YouTube video in the background and create a short from the first 45 seconds."""
     try:
         task = processing_tasks[task_id]
@@ -90,7 +119,8 @@ def process_video(task_id, url, output_path, format_type, duration=45, captions=
                     output_file=output_file,
                     duration=duration,
                     progress_callback=update_progress,
-                    captions=captions
+                    captions=captions,
+                    render_backend=render_backend
                 )
                 
                 # Update task on completion
@@ -101,8 +131,7 @@ def process_video(task_id, url, output_path, format_type, duration=45, captions=
                 task['time_estimate'] = 'Done!'
                 
                 # Generate download URL
-                filename = os.path.basename(output_file)
-                task['download_url'] = f'/download/{filename}'
+                task['download_url'] = artifacts.publish(output_file, task_id)
                 
                 logging.info(f"Task {task_id} completed. Output file: {output_file}")
             except ValueError as e:
@@ -247,11 +276,204 @@ def sanitize_path(path):
         logging.error("Path validation error: %s", str(e))
         raise ValueError(f"Cannot use the specified path: {str(e)}")
 
+def apply_task_update(task_id, key, value):
+    """Apply a task update reported by the job scheduler or a worker process."""
+    task = processing_tasks.get(task_id)
+    if task is not None:
+        task[key] = value
+        task_updates.publish(task_id)
+    # A job queued or picked up by a worker moves everyone behind it
+    if key in ('queued_at', 'started_at'):
+        task_updates.publish_queue()
+    # A stop request that raced with the end of the job has nobody left to read it
+    elif key == 'finished_at':
+        cancellation.clear(task_id)
+
+def get_scheduler():
+    """Return the job scheduler, starting its worker pool on first use."""
+    global scheduler
+    with scheduler_lock:
+        if scheduler is None:
+            scheduler = job_scheduler.JobScheduler(
+                target=run_task_in_worker,
+                workers=app.config['MAX_WORKERS'],
+                max_queue=app.config['MAX_QUEUE'],
+                on_update=apply_task_update
+            )
+            logging.info(f"Job scheduler started with {app.config['MAX_WORKERS']} workers")
+            # Jobs queued or running before a restart have lost their worker
+            processing_tasks.recover_interrupted()
+            workspace.start_reaper()
+            if app.config['AUTO_CANCEL_AFTER']:
+                start_abandoned_job_monitor(app.config['AUTO_CANCEL_AFTER'])
+        return scheduler
+
+def cancel_task(task_id, reason='Cancelled by user'):
+    """
+    Cancel a queued or running task.
+    
+    Queued tasks are dropped from the queue right away. Running tasks are
+    asked to stop through a cancellation marker; their worker marks them
+    'cancelled' once in-flight downloads and encodes have been stopped.
+    
+    Returns:
+        str: The task's status after the request, or None if the task is unknown
+    """
+    task = processing_tasks.get(task_id)
+    if task is None:
+        return None
+    if task['status'] in ('completed', 'failed', 'cancelled'):
+        return task['status']
+    
+    # The marker is written only while a worker still has the job; its finish removes it
+    outcome = scheduler.cancel(task_id, cancellation.request_cancel) if scheduler is not None else None
+    if outcome == 'running':
+        task['status'] = 'cancelling'
+        task['current_stage'] = 'Cancelling'
+    else:
+        task['status'] = 'cancelled'
+        task['current_stage'] = reason
+        discard_upload(task.get('upload_path'), task.get('upload_id'))
+    task_updates.publish(task_id)
+    if outcome == 'dequeued':
+        task_updates.publish_queue()
+    logging.info(f"Task {task_id}: {reason} ({task['status']})")
+    return task['status']
+
+def start_abandoned_job_monitor(max_idle, interval=30):
+    """Cancel queued or running tasks whose status hasn't been polled for max_idle seconds."""
+    def run():
+        while True:
+            time.sleep(min(interval, max_idle))
+            cutoff = time.time() - max_idle
+            for task_id, task in processing_tasks.with_status('queued', 'processing'):
+                last_seen = task.get('last_polled') or task.get('queued_at')
+                if last_seen and last_seen < cutoff:
+                    try:
+                        cancel_task(task_id, 'Cancelled: status not checked for a while')
+                    except Exception as e:
+                        logging.error(f"Could not cancel abandoned task {task_id}: {str(e)}")
+    
+    threading.Thread(target=run, name='abandoned-job-monitor', daemon=True).start()
+
+def run_task_in_worker(task_id, task_snapshot, *args):
+    """Entry point in a worker process: run a task, reporting updates to the web process."""
+    processing_tasks.attach(task_id, job_scheduler.ReportingTask(task_id, task_snapshot))
+    cancellation.activate(cancellation.CancelToken(task_id))
+    try:
+        process_video_task(task_id, *args)
+    finally:
+        cancellation.activate(None)
+        cancellation.clear(task_id)
+        processing_tasks.pop(task_id, None)
+
+def save_upload(uploaded_file, upload_path, chunk_size=1024 * 1024):
+    """Save an uploaded file in chunks and return its SHA-256 hex digest."""
+    digest = hashlib.sha256()
+    with open(upload_path, 'wb') as f:
+        while True:
+            chunk = uploaded_file.stream.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+            f.write(chunk)
+    return digest.hexdigest()
+
+def discard_upload(upload_path, upload_id=None):
+    """Delete an uploaded source: the whole session for chunked uploads, otherwise the saved file."""
+    if upload_id:
+        uploads.discard(upload_id)
+    elif upload_path and os.path.exists(upload_path):
+        os.remove(upload_path)
+
+def get_render_key(youtube_url, upload_digest, duration, captions, format_type, render_backend, encode_profile,
+                   letterbox_source=False, highlights=False, reframe=False):
+    """Deterministic key for a render, or None if the source can't be identified."""
+    if upload_digest:
+        source = f"upload:{upload_digest}"
+    elif youtube_url and processor_available:
+        try:
+            source = f"youtube:{video_processor.get_video_id(youtube_url)}"
+        except Exception as e:
+            logging.warning("Could not extract video id from %s: %s", youtube_url, str(e))
+            return None
+    else:
+        return None
+    return render_cache.make_render_key(
+        source, duration=duration, captions=captions, format_type=format_type, render_backend=render_backend,
+        encode_profile=encode_profile, letterbox_source=letterbox_source, highlights=highlights, reframe=reframe
+    )
+
+def upload_status(upload, state=None):
+    """Progress of a chunked upload, for resuming clients."""
+    state = state or upload.state()
+    return {
+        'success': True,
+        'upload_id': upload.upload_id,
+        'size': upload.size,
+        'chunk_size': upload.chunk_size,
+        'chunk_count': upload.chunk_count,
+        'received_bytes': upload.contiguous_bytes(state),
+        'missing_chunks': upload.missing_chunks(state),
+        'complete': state['complete']
+    }
+
+@app.route('/uploads', methods=['POST'])
+def create_upload():
+    """Start a resumable chunked upload; body: filename, size and optionally chunk_size."""
+    data = request.get_json(silent=True) or request.form
+    try:
+        size = int(data.get('size', 0))
+        chunk_size = int(data.get('chunk_size') or uploads.CHUNK_SIZE)
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'size and chunk_size must be integers'}), 400
+    if size > app.config['MAX_CONTENT_LENGTH']:
+        return jsonify({'success': False, 'error': 'File is too large'}), 413
+    try:
+        upload = uploads.ChunkedUpload.create(data.get('filename', ''), size, chunk_size)
+    except uploads.UploadError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify(upload_status(upload)), 201
+
+@app.route('/uploads/<upload_id>', methods=['GET'])
+def get_upload(upload_id):
+    """Report which chunks of an upload have arrived."""
+    try:
+        return jsonify(upload_status(uploads.ChunkedUpload(upload_id)))
+    except uploads.UploadError as e:
+        return jsonify({'success': False, 'error': str(e)}), 404
+
+@app.route('/uploads/<upload_id>/chunks/<int:index>', methods=['PUT'])
+def put_upload_chunk(upload_id, index):
+    """Store one chunk; the raw body is the data and X-Chunk-SHA256 its checksum."""
+    try:
+        upload = uploads.ChunkedUpload(upload_id)
+    except uploads.UploadError as e:
+        return jsonify({'success': False, 'error': str(e)}), 404
+    try:
+        state = upload.write_chunk(index, request.stream, request.headers.get('X-Chunk-SHA256', ''))
+    except uploads.ChecksumMismatch as e:
+        return jsonify({'success': False, 'error': str(e), 'retry': True}), 422
+    except uploads.UploadError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except FileNotFoundError:
+        # Session removed meanwhile (processing finished or the upload was abandoned)
+        return jsonify({'success': False, 'error': f'Unknown upload: {upload_id}'}), 404
+    return jsonify(upload_status(upload, state))
+
+@app.route('/uploads/<upload_id>', methods=['DELETE'])
+def delete_upload(upload_id):
+    """Abandon a chunked upload."""
+    if not uploads.discard(upload_id):
+        return jsonify({'success': False, 'error': f'Unknown upload: {upload_id}'}), 404
+    return jsonify({'success': True})
+
 @app.route('/process', methods=['POST'])
 def process_video():
     try:
         # Check if a file was uploaded or a YouTube URL was provided
         uploaded_file = request.files.get('videoFile')
+        upload_id = request.form.get('upload_id', '')
         youtube_url = request.form.get('youtubeUrl', '')
         
         logging.info("Process request - URL: %s, File: %s", youtube_url, 
@@ -262,40 +484,67 @@ def process_video():
         format_type = request.form.get('format', 'mp4')
         output_path = request.form.get('output_path', '')
         captions = request.form.get('captions', 'true').lower() == 'true'
+        render_backend = request.form.get('render_backend', app.config['RENDER_BACKEND'])
+        encode_profile = request.form.get('encode_profile', app.config['ENCODE_PROFILE'])
+        preview = request.form.get('preview', 'false').lower() == 'true'
+        letterbox_source = request.form.get('letterbox_source', 'false').lower() == 'true'
+        highlights = request.form.get('highlights', 'false').lower() == 'true'
+        reframe = request.form.get('reframe', str(app.config['REFRAME'])).lower() == 'true'
         
         # Sanitize and validate the output path
         output_path = sanitize_path(output_path or 'output')
         
         # Validate inputs
-        if not youtube_url and (not uploaded_file or not uploaded_file.filename):
+        if not youtube_url and not upload_id and (not uploaded_file or not uploaded_file.filename):
             return jsonify({'success': False, 'error': 'No video source provided. Please enter a YouTube URL or upload a file.'}), 400
             
         if format_type not in ['mp4', 'mov']:
             return jsonify({'success': False, 'error': f'Invalid format: {format_type}'}), 400
         
+        if render_backend not in ['moviepy', 'ffmpeg']:
+            return jsonify({'success': False, 'error': f'Invalid render backend: {render_backend}'}), 400
+        
+        if encode_profile not in encode_profiles.ENCODE_PROFILES:
+            return jsonify({'success': False, 'error': f'Invalid encode profile: {encode_profile}'}), 400
+        
         try:
             duration = int(duration_str)
         except ValueError:
             logging.warning("Invalid duration value: %s, defaulting to 30", duration_str)
             duration = 30
         
+        # A chunked upload may still be arriving; the job waits for the part it needs
+        chunked_upload = None
+        if upload_id:
+            try:
+                chunked_upload = uploads.ChunkedUpload(upload_id)
+            except uploads.UploadError as e:
+                return jsonify({'success': False, 'error': str(e)}), 404
+        
         task_id = str(uuid.uuid4())
         task = {
             'id': task_id,
-            'status': 'processing',
+            'status': 'queued',
+            'current_stage': 'Waiting in queue',
             'progress': 0,
             'url': youtube_url,
             'file_path': None,
             'error': None,
             'captions': captions,
-            'is_upload': bool(uploaded_file and uploaded_file.filename)
+            'is_upload': bool(upload_id or (uploaded_file and uploaded_file.filename))
         }
         
-        processing_tasks[task_id] = task
+        task = processing_tasks.add(task)
         
         # If it's a file upload, save the file first
         upload_path = None
-        if uploaded_file and uploaded_file.filename:
+        upload_digest = None
+        if chunked_upload:
+            upload_path = chunked_upload.path
+            upload_digest = chunked_upload.state().get('sha256')
+            task['upload_path'] = upload_path
+            task['upload_id'] = upload_id
+        elif uploaded_file and uploaded_file.filename:
             # Create uploads directory if it doesn't exist
             upload_dir = os.path.join(output_path, 'uploads')
             os.makedirs(upload_dir, exist_ok=True)
@@ -303,26 +552,70 @@ def process_video():
             # Save the uploaded file
             filename = secure_filename(uploaded_file.filename)
             upload_path = os.path.join(upload_dir, f"{task_id}_{filename}")
-            uploaded_file.save(upload_path)
+            upload_digest = save_upload(uploaded_file, upload_path)
             
             # Store the path in the task
             task['upload_path'] = upload_path
         
-        # Start processing in a background thread
-        threading.Thread(
-            target=process_video_task,
-            args=(task_id, youtube_url, upload_path, output_path, format_type, duration, captions),
-            daemon=True
-        ).start()
+        # Return an identical earlier render right away instead of encoding again. Uploads are
+        # identified by their digest only; a chunked upload still arriving gets its key in the worker
+        render_key = get_render_key('' if upload_path else youtube_url, upload_digest, duration, captions,
+                                    format_type, render_backend, encode_profile, letterbox_source, highlights,
+                                    reframe)
+        cached_output = render_cache.get_render_cache().lookup(render_key) if render_key else None
+        if cached_output:
+            output_file = render_cache.place_artifact(cached_output, output_path)
+            task.update({
+                'status': 'completed',
+                'progress': 100,
+                'file_path': output_file,
+                'current_stage': 'Completed (cached render)',
+                'time_estimate': 'Done!',
+                'download_url': artifacts.publish(output_file, task_id),
+                'render_path': 'render-cache',
+                'cached': True
+            })
+            discard_upload(upload_path, upload_id)
+            logging.info(f"Task {task_id} served from render cache: {output_file}")
+            return jsonify({'success': True, 'task_id': task_id, 'cached': True})
         
-        return jsonify({'success': True, 'task_id': task_id})
+        # Queue the job for a worker process
+        try:
+            position = get_scheduler().submit(
+                task_id, dict(task), youtube_url, upload_path, output_path, format_type, duration, captions,
+                render_backend, encode_profile, render_key, preview, letterbox_source, highlights, upload_id, reframe,
+                upload_digest
+            )
+        except job_scheduler.QueueFull as e:
+            processing_tasks.pop(task_id, None)
+            # A chunked upload is kept so the request can be retried with the same upload_id
+            if not upload_id:
+                discard_upload(upload_path)
+            logging.warning("Rejecting task %s: %s", task_id, str(e))
+            response = jsonify({
+                'success': False,
+                'error': 'Server is busy, please try again shortly.',
+                'queue_position': e.depth + 1,
+                'queue_depth': e.depth
+            })
+            return response, 429, {'Retry-After': '30'}
+        
+        return jsonify({'success': True, 'task_id': task_id, 'queue_position': position})
     except Exception as e:
         logging.error("Error in process_video route: %s", str(e))
         traceback.print_exc()
         return jsonify({'success': False, 'error': str(e)}), 500
 
-def process_video_task(task_id, url, upload_path, output_path, format_type, duration=30, captions=True):
-    """Process a video in the background from either a YouTube URL or uploaded file."""
+def process_video_task(task_id, url, upload_path, output_path, format_type, duration=30, captions=True,
+                       render_backend='moviepy', encode_profile=encode_profiles.DEFAULT_PROFILE, render_key=None,
+                       preview=False, letterbox_source=False, highlights=False, upload_id=None, reframe=False,
+                       upload_digest=None):
+    """
+    Process a video in the background from either a YouTube URL or uploaded file.
+    
+    upload_digest is the SHA-256 computed while the file was received, so the
+    processor doesn't read the upload again to identify it.
+    """
     try:
         task = processing_tasks[task_id]
         task['status'] = 'processing'
@@ -349,14 +642,61 @@ def process_video_task(task_id, url, upload_path, output_path, format_type, dura
                 task['time_estimate'] = time_estimate
             logging.info(f"Task {task_id} progress: {progress}% - Stage: {task['current_stage']}")
         
-        # Generate output filename
+        # Publish the quick proxy while the full render continues
+        def update_preview(preview_path):
+            task['preview_path'] = preview_path
+            task['preview_url'] = artifacts.publish(preview_path, task_id, kind='preview')
+            logging.info(f"Task {task_id} preview ready: {preview_path}")
+        
+        # Record job details reported by the processor (e.g. the chosen render path)
+        def report(key, value):
+            task[key] = value
+        
+        # Generate output filename (task id suffix keeps concurrent jobs apart)
         timestamp = time.strftime("%Y%m%d-%H%M%S")
-        output_file = os.path.join(output_path, f"short_{timestamp}.{format_type}")
+        output_file = os.path.join(output_path, f"short_{timestamp}_{task_id[:8]}.{format_type}")
+        
+        # Whole-file digest of a chunked upload (None until all of it has arrived)
+        def chunked_upload_digest():
+            return uploads.ChunkedUpload(upload_id).state().get('sha256')
+        
+        # Render key of an upload, known once its digest is
+        def upload_render_key(digest):
+            if not digest:
+                return None
+            return get_render_key('', digest, duration, captions, format_type, render_backend, encode_profile,
+                                  letterbox_source, highlights, reframe)
         
         # Process the video based on source
         if processor_available:
             try:
                 if upload_path:
+                    if upload_id:
+                        # Start once the part of the video we need has arrived (all of it for highlights)
+                        update_progress(5, 'Waiting for upload', 'Calculating...')
+                        uploads.ChunkedUpload(upload_id).wait_until_ready(
+                            None if highlights else duration,
+                            progress_callback=lambda share: update_progress(
+                                5, f'Waiting for upload ({int(share * 100)}% received)')
+                        )
+                        # Already complete: an identical earlier render can be reused after all
+                        upload_digest = chunked_upload_digest()
+                        render_key = upload_render_key(upload_digest)
+                        cached_output = render_cache.get_render_cache().lookup(render_key) if render_key else None
+                        if cached_output:
+                            output_file = render_cache.place_artifact(cached_output, output_path)
+                            task.update({
+                                'status': 'completed',
+                                'progress': 100,
+                                'file_path': output_file,
+                                'current_stage': 'Completed (cached render)',
+                                'time_estimate': 'Done!',
+                                'download_url': artifacts.publish(output_file, task_id),
+                                'render_path': 'render-cache',
+                                'cached': True
+                            })
+                            logging.info(f"Task {task_id} served from render cache: {output_file}")
+                            return
                     # Process uploaded file
                     update_progress(10, 'Processing uploaded file', 'Calculating...')
                     video_processor.process_local_video(
@@ -364,7 +704,16 @@ def process_video_task(task_id, url, upload_path, output_path, format_type, dura
                         output_file=output_file,
                         duration=duration,
                         progress_callback=update_progress,
-                        captions=captions
+                        captions=captions,
+                        render_backend=render_backend,
+                        task_id=task_id,
+                        encode_profile=encode_profile,
+                        preview_callback=update_preview if preview else None,
+                        letterbox_source=letterbox_source,
+                        report_callback=report,
+                        highlights_mode=highlights,
+                        reframe=reframe,
+                        source_digest=upload_digest
                     )
                 else:
                     # Process YouTube URL - Use the new implementation
@@ -374,7 +723,15 @@ def process_video_task(task_id, url, upload_path, output_path, format_type, dura
                         output_file=output_file,
                         duration=duration,
                         progress_callback=update_progress,
-                        captions=captions
+                        captions=captions,
+                        render_backend=render_backend,
+                        task_id=task_id,
+                        encode_profile=encode_profile,
+                        preview_callback=update_preview if preview else None,
+                        letterbox_source=letterbox_source,
+                        report_callback=report,
+                        highlights_mode=highlights,
+                        reframe=reframe
                     )
                 
                 # Update task on completion
@@ -385,11 +742,39 @@ def process_video_task(task_id, url, upload_path, output_path, format_type, dura
                 task['time_estimate'] = 'Done!'
                 
                 # Generate download URL
-                filename = os.path.basename(output_file)
-                task['download_url'] = f'/download/{filename}'
+                task['download_url'] = artifacts.publish(output_file, task_id)
+                
+                # A chunked upload that was still arriving is keyed once the rest of it is in
+                if upload_id and not render_key:
+                    try:
+                        uploads.ChunkedUpload(upload_id).wait_until_ready(stall_timeout=UPLOAD_KEY_WAIT)
+                        render_key = upload_render_key(chunked_upload_digest())
+                    except ValueError as e:
+                        # Stalled or abandoned (UploadError is a ValueError too)
+                        logging.info(f"Task {task_id}: upload not completed, render not cached ({str(e)})")
+                
+                # Remember the render so identical requests can reuse it
+                if render_key:
+                    try:
+                        render_cache.get_render_cache().register(render_key, output_file)
+                    except Exception as e:
+                        logging.warning(f"Could not register render for task {task_id}: {str(e)}")
                 
                 logging.info(f"Task {task_id} completed. Output file: {output_file}")
                 
+            except cancellation.TaskCancelled as e:
+                task['status'] = 'cancelled'
+                task['current_stage'] = 'Cancelled'
+                task['error'] = 'Processing was cancelled'
+                logging.info(f"Task {task_id} cancelled: {str(e)}")
+                # Drop the partially written output; scratch files go with the workspace
+                for partial in (output_file, task.get('preview_path')):
+                    if partial and os.path.exists(partial):
+                        try:
+                            os.remove(partial)
+                        except OSError as remove_error:
+                            logging.warning(f"Could not remove {partial}: {str(remove_error)}")
+            
             except ValueError as e:
                 # Handle specific ValueError
                 task['status'] = 'failed'
@@ -406,9 +791,9 @@ def process_video_task(task_id, url, upload_path, output_path, format_type, dura
                 
             finally:
                 # Clean up uploaded file if needed
-                if upload_path and os.path.exists(upload_path):
+                if upload_path:
                     try:
-                        os.remove(upload_path)
+                        discard_upload(upload_path, upload_id)
                         logging.info(f"Removed temporary upload file: {upload_path}")
                     except Exception as e:
                         logging.warning(f"Could not remove upload file {upload_path}: {str(e)}")
@@ -428,12 +813,8 @@ def process_video_task(task_id, url, upload_path, output_path, format_type, dura
             task['current_stage'] = 'Failed: unexpected error'
         traceback.print_exc()
 
-@app.route('/status/<task_id>', methods=['GET'])
-def check_status(task_id):
-    task = processing_tasks.get(task_id)
-    if not task:
-        return jsonify({'success': False, 'error': 'Task not found'}), 404
-    
+def task_status(task_id, task):
+    """Build the status payload shared by /status and /events."""
     response = {
         'success': True,
         'status': task['status'],
@@ -442,29 +823,156 @@ def check_status(task_id):
         'time_estimate': task.get('time_estimate', 'Calculating...')
     }
     
+    # Scheduling metrics
+    now = time.time()
+    queued_at = task.get('queued_at')
+    started_at = task.get('started_at')
+    finished_at = task.get('finished_at')
+    if scheduler is not None:
+        response['queue_position'] = scheduler.queue_position(task_id)
+        response['queue_depth'] = scheduler.queue_depth()
+    if queued_at:
+        response['wait_time'] = coarse_time((started_at or now) - queued_at)
+    if started_at:
+        response['run_time'] = coarse_time((finished_at or now) - started_at)
+    
+    if task.get('preview_url'):
+        response['preview_url'] = task['preview_url']
+    if task.get('render_path'):
+        response['render_path'] = task['render_path']
+    if task.get('segments'):
+        response['segments'] = task['segments']
+    if task.get('stage_timings'):
+        response['stage_timings'] = task['stage_timings']
+    
     # Add additional info depending on status
     if task['status'] == 'completed':
         response['file_path'] = task['file_path']
         response['download_url'] = task.get('download_url', '')
-    elif task['status'] == 'failed':
-        response['error'] = task['error']
+    elif task['status'] in ('failed', 'cancelled'):
+        response['error'] = task.get('error') or 'Processing was cancelled'
+    
+    return response
+
+def coarse_time(seconds):
+    """Round a duration down to STATUS_TIME_STEP seconds."""
+    return int(seconds // STATUS_TIME_STEP * STATUS_TIME_STEP)
+
+def task_etag(task_id, task):
+    """Weak ETag for a task's status: changes with every update, queue move and time step."""
+    position = scheduler.queue_position(task_id) if scheduler is not None else 0
+    depth = scheduler.queue_depth() if scheduler is not None else 0
+    # Wait and run times keep growing without updates, so the tag follows them at the same granularity
+    now = time.time()
+    queued_at = task.get('queued_at')
+    started_at = task.get('started_at')
+    wait_time = coarse_time((started_at or now) - queued_at) if queued_at else ''
+    run_time = coarse_time((task.get('finished_at') or now) - started_at) if started_at else ''
+    return f"{task_id}-{task_updates.version(task_id)}-{position}-{depth}-{wait_time}-{run_time}"
+
+@app.route('/status/<task_id>', methods=['GET'])
+def check_status(task_id):
+    task = processing_tasks.get(task_id)
+    if not task:
+        return jsonify({'success': False, 'error': 'Task not found'}), 404
+    task['last_polled'] = time.time()
+    
+    # Unchanged since the client's last poll: no body
+    etag = task_etag(task_id, task)
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(task_status(task_id, task))
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/events/<task_id>', methods=['GET'])
+def task_event_stream(task_id):
+    """Stream a task's status as Server-Sent Events until it finishes."""
+    if task_id not in processing_tasks:
+        return jsonify({'success': False, 'error': 'Task not found'}), 404
+    
+    def stream():
+        last_etag = None
+        marker = task_updates.marker(task_id)
+        changed = True
+        polled_at = 0
+        while True:
+            task = processing_tasks.get(task_id)
+            if task is None:
+                yield task_events.format_event({'success': False, 'error': 'Task not found'}, event='gone')
+                return
+            # An open stream counts as polling for the auto-cancel monitor (recorded once per keep-alive period)
+            if time.time() - polled_at >= task_events.KEEPALIVE_INTERVAL:
+                polled_at = time.time()
+                task['last_polled'] = polled_at
+            etag = task_etag(task_id, task)
+            if etag != last_etag:
+                last_etag = etag
+                status = task_status(task_id, task)
+                yield task_events.format_event(status, event_id=task_updates.version(task_id))
+                if status['status'] in ('completed', 'failed', 'cancelled'):
+                    return
+            elif not changed:
+                yield task_events.keepalive()
+            # Wakes on this task's updates and on queue moves
+            previous, marker = marker, task_updates.wait(task_id, marker)
+            changed = marker != previous
     
-    return jsonify(response)
+    response = Response(stream_with_context(stream()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/tasks/<task_id>', methods=['DELETE'])
+@app.route('/cancel/<task_id>', methods=['POST'])
+def cancel(task_id):
+    """Cancel a queued or running task."""
+    status = cancel_task(task_id)
+    if status is None:
+        return jsonify({'success': False, 'error': 'Task not found'}), 404
+    return jsonify({'success': True, 'status': status})
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """Hit/miss/eviction counters for the shared source cache."""
+    try:
+        return jsonify({'success': True, 'sources': source_cache.get_cache().stats()})
+    except Exception as e:
+        logging.error(f"Error reading cache stats: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+def send_download(file_path):
+    """Send a file with Range, ETag and Last-Modified support, so players can seek and clients resume."""
+    logging.info(f"Sending file for download: {file_path}")
+    return send_file(file_path, as_attachment=True, download_name=os.path.basename(file_path),
+                     conditional=True, etag=True, max_age=0)
+
+@app.route('/artifacts/<artifact_id>')
+@app.route('/artifacts/<artifact_id>/<filename>')
+def download_artifact(artifact_id, filename=None):
+    """
+    Route to download a processed video by its artifact id
+    """
+    try:
+        file_path = artifacts.get_registry().lookup(artifact_id)
+        if not file_path:
+            return jsonify({'error': 'File not found'}), 404
+        return send_download(file_path)
+    
+    except Exception as e:
+        logging.error(f"Error in artifact download route: {str(e)}")
+        return jsonify({'error': str(e)}), 500
 
 @app.route('/download/<filename>')
 def download(filename):
     """
-    Route to download processed videos
+    Route to download processed videos by file name (links issued before artifact ids)
     """
     try:
         # Look for the task with this filename
-        task_id = None
-        file_path = None
-        
-        for task_id, task in processing_tasks.items():
-            if task.get('file_path') and os.path.basename(task.get('file_path')) == filename:
-                file_path = task.get('file_path')
-                break
+        file_path = processing_tasks.find_file(filename)
         
         if not file_path:
             # If not found in tasks, check the default output directory
@@ -472,16 +980,10 @@ def download(filename):
             if not os.path.exists(file_path):
                 return jsonify({'error': 'File not found'}), 404
                 
-        # Get the directory from the file path
-        directory = os.path.dirname(file_path)
+        if not os.path.isfile(file_path):
+            return jsonify({'error': 'File not found'}), 404
         
-        # Check if directory exists
-        if not os.path.exists(directory):
-            return jsonify({'error': 'Directory not found'}), 404
-            
-        # Send the file for download
-        logging.info(f"Sending file for download: {file_path}")
-        return send_from_directory(directory, os.path.basename(file_path), as_attachment=True)
+        return send_download(file_path)
         
     except Exception as e:
         logging.error(f"Error in download route: {str(e)}")
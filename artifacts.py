@@ -0,0 +1,118 @@
+"""
+Registry of downloadable files (finished shorts and previews).
+
+Each file gets an opaque artifact id when its task produces it; downloads
+resolve the id with a single primary-key lookup instead of searching task
+records by file name. The registry lives in its own SQLite database so
+links keep working after a restart and after the task records have been
+compacted away. Worker processes register files directly; SQLite's WAL
+mode lets them write while the web process reads.
+"""
+import logging
+import os
+import secrets
+import sqlite3
+import threading
+import time
+
+DB_PATH = os.getenv('ARTIFACT_DB', os.path.join('cache', 'artifacts.db'))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS artifacts (
+    id TEXT PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    task_id TEXT,
+    kind TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+
+class ArtifactRegistry:
+    """
+    Maps artifact ids to files on disk.
+
+    Args:
+        db_path (str): SQLite database file
+    """
+
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    def _db(self):
+        # Opened lazily, and again after a fork, so processes never share a connection
+        if self._conn is None or self._pid != os.getpid():
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None,
+                                         timeout=30)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.executescript(_SCHEMA)
+            self._pid = os.getpid()
+        return self._conn
+
+    def register(self, path, task_id=None, kind='output'):
+        """
+        Register a file for download.
+
+        Registering the same path again returns its existing id.
+
+        Returns:
+            str: Artifact id to put in download URLs
+        """
+        path = os.path.abspath(path)
+        with self._lock:
+            conn = self._db()
+            conn.execute(
+                'INSERT OR IGNORE INTO artifacts (id, path, task_id, kind, created_at) VALUES (?, ?, ?, ?, ?)',
+                (secrets.token_urlsafe(12), path, task_id, kind, time.time())
+            )
+            return conn.execute('SELECT id FROM artifacts WHERE path = ?', (path,)).fetchone()[0]
+
+    def lookup(self, artifact_id):
+        """
+        Resolve an artifact id.
+
+        Returns:
+            str: Path of the file, or None if the id is unknown or the file is gone
+        """
+        with self._lock:
+            row = self._db().execute('SELECT path FROM artifacts WHERE id = ?', (artifact_id,)).fetchone()
+        if row is None:
+            return None
+        if not os.path.isfile(row[0]):
+            logging.info(f"Artifact {artifact_id} points to a missing file: {row[0]}")
+            self.forget(artifact_id)
+            return None
+        return row[0]
+
+    def forget(self, artifact_id):
+        """Remove an artifact from the registry (the file itself is left alone)."""
+        with self._lock:
+            self._db().execute('DELETE FROM artifacts WHERE id = ?', (artifact_id,))
+
+
+def download_url(artifact_id, path):
+    """URL for an artifact; the file name is only there for the browser's benefit."""
+    return f'/artifacts/{artifact_id}/{os.path.basename(path)}'
+
+
+def publish(path, task_id=None, kind='output'):
+    """Register a file and return its download URL."""
+    return download_url(get_registry().register(path, task_id, kind), path)
+
+
+_registry = None
+
+
+def get_registry():
+    """Return the process-wide artifact registry."""
+    global _registry
+    if _registry is None:
+        _registry = ArtifactRegistry()
+    return _registry
@@ -0,0 +1,81 @@
+"""
+Windowed audio loudness (RMS) for highlight scoring.
+
+ffmpeg decodes the audio track once to mono 16-bit PCM at a low sample rate.
+Fixed-size batches of windows are reduced with NumPy, so only one float per
+window is kept in memory.
+"""
+import numpy as np
+
+import ffmpeg_runner
+
+# Bump when the output of compute_audio_rms changes, so stored features are recomputed
+ANALYZER_VERSION = 1
+
+SAMPLE_RATE = 16000
+# Length of each RMS window in seconds
+WINDOW_SECONDS = 0.5
+# Windows reduced per NumPy batch
+BATCH_WINDOWS = 240
+
+
+class AudioProfile:
+    """
+    Per-window audio RMS with prefix sums for range queries.
+
+    Args:
+        times (ndarray): Start of each window in seconds
+        rms (ndarray): RMS level of each window, in [0, 1]
+    """
+
+    def __init__(self, times, rms):
+        self.times = np.asarray(times, dtype=np.float64)
+        self.rms = np.asarray(rms, dtype=np.float32)
+        self.prefix = np.concatenate([[0.0], np.cumsum(self.rms, dtype=np.float64)])
+
+    def __len__(self):
+        return len(self.rms)
+
+    def mean_energy(self, starts, ends):
+        """Mean RMS of the windows starting inside each [start, end), vectorized (0 if none)."""
+        i = np.searchsorted(self.times, np.atleast_1d(starts), side='left')
+        j = np.searchsorted(self.times, np.atleast_1d(ends), side='left')
+        counts = np.maximum(j - i, 0)
+        sums = self.prefix[np.maximum(i, j)] - self.prefix[i]
+        return np.where(counts > 0, sums / np.maximum(counts, 1), 0.0)
+
+
+def compute_audio_rms(video_path, window_seconds=WINDOW_SECONDS, sample_rate=SAMPLE_RATE,
+                      batch_windows=BATCH_WINDOWS):
+    """
+    Decode a source's audio once and measure loudness per window.
+
+    Sources without an audio track give an empty profile.
+
+    Returns:
+        AudioProfile: Per-window RMS with prefix sums
+    """
+    window_samples = int(window_seconds * sample_rate)
+    window_bytes = window_samples * 2
+    command = [
+        'ffmpeg', '-loglevel', 'error', '-i', video_path,
+        '-vn', '-ac', '1', '-ar', str(sample_rate), '-f', 's16le', 'pipe:1',
+    ]
+
+    rms_batches = []
+    try:
+        for data in ffmpeg_runner.iter_chunks(command, window_bytes * batch_windows, label='ffmpeg audio analysis'):
+            count = len(data) // window_bytes
+            if not count:
+                continue
+            samples = np.frombuffer(data[:count * window_bytes], dtype='<i2').reshape(count, window_samples)
+            samples = samples.astype(np.float32) / 32768.0
+            rms_batches.append(np.sqrt(np.mean(samples * samples, axis=1)))
+    except ffmpeg_runner.FFmpegError as e:
+        # No audio track: ffmpeg has nothing to write
+        if 'does not contain any stream' not in e.stderr:
+            raise
+
+    rms = np.concatenate(rms_batches) if rms_batches else np.zeros(0, dtype=np.float32)
+    times = np.arange(len(rms), dtype=np.float64) * window_seconds
+    return AudioProfile(times, rms)
@@ -0,0 +1,89 @@
+"""
+Compare the caption parser with the former inline SRT parsing.
+
+Parses a multi-hour caption file (a synthetic one unless a path is given)
+with the old split-everything helpers, with the streaming parser over the
+whole file, and with the streaming parser stopping at the short's window.
+Also times timestamp lookups on the resulting index.
+
+Usage:
+    python benchmarks/caption_benchmark.py [captions.srt|captions.vtt] [--hours 4] [--window 45]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import caption_parser  # noqa: E402
+from ffmpeg_render import format_srt_time  # noqa: E402
+
+
+def synthetic_srt(hours, cue_seconds=2.5):
+    blocks = []
+    t = 0.0
+    index = 1
+    while t < hours * 3600:
+        blocks.append(f"{index}\n{format_srt_time(t)} --> {format_srt_time(t + cue_seconds)}\n"
+                      f"caption number {index} with a few more words\n")
+        t += cue_seconds
+        index += 1
+    return "\n".join(blocks)
+
+
+def legacy_parse(srt_text):
+    """The helpers formerly inlined in create_short_from_youtube."""
+    def srt_to_seconds(time_str):
+        h, m, s = time_str.split(":")
+        s, ms = s.split(",")
+        return int(h) * 3600 + int(m) * 60 + int(s) + int(ms) / 1000
+
+    formatted = []
+    for block in srt_text.strip().split("\n\n"):
+        lines = block.split("\n")
+        if len(lines) >= 3:
+            start, end = lines[1].split(" --> ")
+            formatted.append((srt_to_seconds(start), srt_to_seconds(end), " ".join(lines[2:])))
+    return formatted
+
+
+def timed(label, function, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<34}{best * 1000:>10.1f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', nargs='?', help='SRT or WebVTT file (default: synthetic SRT)')
+    parser.add_argument('--hours', type=float, default=4)
+    parser.add_argument('--window', type=float, default=45)
+    args = parser.parse_args()
+
+    if args.input:
+        with open(args.input, encoding='utf-8-sig') as f:
+            text = f.read()
+    else:
+        text = synthetic_srt(args.hours)
+    print(f"{len(text) / 1024 ** 2:.1f} MB of captions")
+
+    if not args.input or args.input.endswith('.srt'):
+        timed('legacy inline parse (all cues)', lambda: legacy_parse(text))
+    track = timed('streaming parse (all cues)', lambda: caption_parser.parse_captions(text))
+    timed(f'streaming parse (first {args.window:g}s)', lambda: caption_parser.parse_captions(text, args.window))
+    print(f"{len(track)} cues")
+
+    if len(track):
+        last = track.ends[-1]
+        times = [random.uniform(0, last) for _ in range(100000)]
+        timed('100k timestamp lookups', lambda: [track.active(t) for t in times])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Report encode speed and output size for each x264 encode profile.
+
+Renders the same local sample clip once per profile and prints seconds of
+wall time per second of output, plus the output file size.
+
+Usage:
+    python benchmarks/encode_benchmark.py sample.mp4 [--duration 45] [--backend ffmpeg]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import encode_profiles  # noqa: E402
+
+
+def render(backend, input_path, output_file, duration, profile):
+    if backend == 'ffmpeg':
+        import ffmpeg_render
+        ffmpeg_render.render_short(input_path, output_file, duration, encode_profile=profile)
+    else:
+        import youtube_short_creator_enhanced as video_processor
+        video_processor.render_short_moviepy(input_path, output_file, duration, encode_profile=profile)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help='Merged sample video (video + audio)')
+    parser.add_argument('--duration', type=float, default=45)
+    parser.add_argument('--backend', choices=['ffmpeg', 'moviepy'], default='ffmpeg')
+    parser.add_argument('--profiles', default=','.join(encode_profiles.ENCODE_PROFILES))
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        print(f"{'profile':<14}{'s / output s':>14}{'size (MB)':>12}")
+        for profile in args.profiles.split(','):
+            output_file = os.path.join(work_dir, f"{profile}.mp4")
+            start = time.perf_counter()
+            render(args.backend, args.input, output_file, args.duration, profile)
+            elapsed = time.perf_counter() - start
+            size_mb = os.path.getsize(output_file) / 1024 ** 2
+            print(f"{profile:<14}{elapsed / args.duration:>14.3f}{size_mb:>12.2f}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Compare the moviepy and ffmpeg render backends on a local sample clip.
+
+Each backend runs in its own child process so peak RSS (which includes the
+ffmpeg subprocesses it waits on) is measured per backend.
+
+Usage:
+    python benchmarks/render_benchmark.py sample.mp4 [--duration 45] [--captions]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def synthetic_captions(duration, every=2.5):
+    """Caption cues every few seconds, roughly like an auto-generated track."""
+    captions = []
+    start = 0.0
+    index = 1
+    while start < duration:
+        captions.append((start, start + every, f"Caption number {index} for the benchmark clip"))
+        start += every
+        index += 1
+    return captions
+
+
+def run_backend(backend, input_path, output_file, duration, captions):
+    """Render once with the given backend (runs inside the child process)."""
+    import youtube_short_creator_enhanced as video_processor
+    import ffmpeg_render
+
+    caption_data = synthetic_captions(duration) if captions else None
+    if backend == 'ffmpeg':
+        ffmpeg_render.render_short(input_path, output_file, duration, caption_data)
+    else:
+        video_processor.render_short_moviepy(input_path, output_file, duration, caption_data)
+
+
+def measure(backend, args):
+    """Run one backend in a child process and return (wall seconds, peak RSS MB)."""
+    output_file = os.path.join(tempfile.mkdtemp(), f"bench_{backend}.mp4")
+    command = [sys.executable, os.path.abspath(__file__), args.input, '--duration', str(args.duration),
+               '--run-backend', backend, '--output', output_file]
+    if args.captions:
+        command.append('--captions')
+
+    start = time.perf_counter()
+    proc = subprocess.Popen(command)
+    _, status, usage = os.wait4(proc.pid, 0)
+    elapsed = time.perf_counter() - start
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{backend} render failed with exit code {proc.returncode}")
+
+    # ru_maxrss is reported in kilobytes on Linux
+    return elapsed, usage.ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help='Merged sample video (video + audio)')
+    parser.add_argument('--duration', type=float, default=45)
+    parser.add_argument('--captions', action='store_true', help='Burn in synthetic captions')
+    parser.add_argument('--backends', default='moviepy,ffmpeg')
+    parser.add_argument('--run-backend', help=argparse.SUPPRESS)
+    parser.add_argument('--output', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_backend:
+        run_backend(args.run_backend, args.input, args.output, args.duration, args.captions)
+        return
+
+    print(f"{'backend':<10}{'wall (s)':>12}{'peak RSS (MB)':>16}")
+    for backend in args.backends.split(','):
+        elapsed, peak_rss = measure(backend, args)
+        print(f"{backend:<10}{elapsed:>12.2f}{peak_rss:>16.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""
+Measure scene detection throughput in source-minutes per wall-second.
+
+Runs the sharded analyzer with 1 worker and with the given worker count so
+the speedup from parallel shards is visible.
+
+Usage:
+    python benchmarks/scene_benchmark.py long_source.mp4 [--workers 8] [--downscale 4] [--frame-skip 1]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scenedetect import open_video  # noqa: E402
+
+import scene_detection  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help='Source video, ideally several minutes long')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--downscale', type=int, default=scene_detection.DEFAULT_DOWNSCALE)
+    parser.add_argument('--frame-skip', type=int, default=scene_detection.DEFAULT_FRAME_SKIP)
+    parser.add_argument('--shard-seconds', type=float, default=scene_detection.SHARD_SECONDS)
+    args = parser.parse_args()
+
+    source_minutes = open_video(args.input).duration.get_seconds() / 60
+
+    print(f"{'workers':>8}{'scenes':>8}{'wall (s)':>10}{'src-min / s':>13}")
+    for workers in sorted({1, args.workers}):
+        start = time.perf_counter()
+        scenes = scene_detection.find_scenes(
+            args.input, downscale=args.downscale, frame_skip=args.frame_skip,
+            workers=workers, shard_seconds=args.shard_seconds
+        )
+        elapsed = time.perf_counter() - start
+        print(f"{workers:>8}{len(scenes):>8}{elapsed:>10.2f}{source_minutes / elapsed:>13.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Cooperative cancellation of processing jobs across processes.
+
+The web process asks for a job to stop by creating a marker file named
+after the task id. The worker process running the job activates a
+CancelToken for it; long-running steps poll the token (downloads between
+chunks, moviepy between frames, pipeline stages in between) and the ffmpeg
+runner stops its subprocess as soon as the marker appears.
+"""
+import contextlib
+import os
+import tempfile
+import time
+
+from workspace import workspace_path
+
+CANCEL_DIR = os.getenv('CANCEL_DIR', os.path.join(tempfile.gettempdir(), 'clipkart_cancel'))
+# Seconds between checks of the marker file
+CHECK_INTERVAL = 0.5
+
+# Token of the job running in this process, set by activate()
+_current = None
+
+
+class TaskCancelled(Exception):
+    """Raised inside a job once its cancellation has been requested."""
+
+
+def _marker_path(task_id):
+    return workspace_path(task_id, root=CANCEL_DIR)
+
+
+def request_cancel(task_id):
+    """Ask the worker running `task_id` to stop."""
+    os.makedirs(CANCEL_DIR, exist_ok=True)
+    with open(_marker_path(task_id), 'w') as f:
+        f.write(str(time.time()))
+
+
+def is_requested(task_id):
+    """True if cancellation of `task_id` has been requested."""
+    return os.path.exists(_marker_path(task_id))
+
+
+def clear(task_id):
+    """Forget a cancellation request (once its job has ended)."""
+    with contextlib.suppress(OSError):
+        os.remove(_marker_path(task_id))
+
+
+class CancelToken:
+    """
+    Cancellation state of one task, usable wherever an event with is_set() is expected.
+
+    The marker file is checked at most every CHECK_INTERVAL seconds, so the
+    token is cheap to poll from tight loops.
+    """
+
+    def __init__(self, task_id):
+        self.task_id = task_id
+        self._cancelled = False
+        self._checked_at = 0.0
+
+    def is_set(self):
+        if not self._cancelled:
+            now = time.time()
+            if now - self._checked_at >= CHECK_INTERVAL:
+                self._checked_at = now
+                self._cancelled = is_requested(self.task_id)
+        return self._cancelled
+
+    def raise_if_set(self):
+        """Raise TaskCancelled if the task has been cancelled."""
+        if self.is_set():
+            raise TaskCancelled(f"Task {self.task_id} was cancelled")
+
+
+def activate(token):
+    """Make `token` the current job's token in this process (None to clear it)."""
+    global _current
+    _current = token
+
+
+def current():
+    """Token of the job running in this process, or None."""
+    return _current
+
+
+def check():
+    """Raise TaskCancelled if the job running in this process has been cancelled."""
+    if _current is not None:
+        _current.raise_if_set()
@@ -0,0 +1,187 @@
+"""
+Streaming SRT and WebVTT caption parser with a compact cue index.
+
+Cues are parsed block by block from any iterable of lines, so a multi-hour
+caption file is never split into memory as a whole, and parsing stops as
+soon as cues start past the requested time window. Malformed blocks (bad
+index lines, broken timestamps, missing text) are skipped one at a time
+instead of failing the whole file.
+"""
+import bisect
+import io
+import itertools
+import logging
+import re
+from array import array
+
+# HH:MM:SS,mmm (SRT), HH:MM:SS.mmm or MM:SS.mmm (WebVTT)
+_TIMESTAMP = re.compile(r'^(?:(\d+):)?(\d{1,2}):(\d{1,2})(?:[,.](\d{1,3}))?$')
+# Inline markup: WebVTT voice/class tags and timestamps, SRT <i>/<b>/<font>
+_TAGS = re.compile(r'<[^>]*>')
+# WebVTT blocks that carry no cues
+_VTT_SKIP_BLOCKS = ('WEBVTT', 'NOTE', 'STYLE', 'REGION')
+
+
+def parse_timestamp(text):
+    """
+    Convert an SRT or WebVTT timestamp to seconds.
+
+    Raises:
+        ValueError: If the timestamp is malformed
+    """
+    text = text.strip()
+    # Fixed-width HH:MM:SS,mmm / HH:MM:SS.mmm, by far the most common form
+    if len(text) == 12 and text[2] == ':' and text[5] == ':' and text[8] in ',.':
+        try:
+            return int(text[:2]) * 3600 + int(text[3:5]) * 60 + int(text[6:8]) + int(text[9:]) / 1000
+        except ValueError:
+            pass
+    match = _TIMESTAMP.match(text)
+    if not match:
+        raise ValueError(f"Invalid caption timestamp: {text!r}")
+    hours, minutes, seconds, fraction = match.groups()
+    millis = int(fraction.ljust(3, '0')) if fraction else 0
+    return int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds) + millis / 1000
+
+
+def _parse_block(lines):
+    """Parse one cue block into (start, end, text), or None for non-cue blocks."""
+    if lines[0].lstrip('\ufeff').startswith(_VTT_SKIP_BLOCKS):
+        return None
+    for i, line in enumerate(lines):
+        if '-->' in line:
+            start_text, end_text = line.split('-->', 1)
+            # WebVTT cue settings follow the end timestamp
+            end_text = end_text.strip().split(' ', 1)[0]
+            start, end = parse_timestamp(start_text), parse_timestamp(end_text)
+            text = ' '.join(lines[i + 1:])
+            if '<' in text:
+                text = _TAGS.sub('', text)
+            text = text.strip()
+            if not text or end <= start:
+                return None
+            return start, end, text
+    raise ValueError("Caption block has no timing line")
+
+
+def _blocks(lines):
+    block = []
+    for line in lines:
+        line = line.rstrip()
+        if line:
+            block.append(line)
+        elif block:
+            yield block
+            block = []
+    if block:
+        yield block
+
+
+def iter_cues(lines, end=None):
+    """
+    Yield (start, end, text) cues from SRT or WebVTT lines.
+
+    Args:
+        lines (iterable): Lines of the caption file, or its whole text
+        end (float): Stop at the first cue starting at or after this time (cues are
+            expected in time order, as both formats require)
+
+    Yields:
+        tuple: (start, end, text) with times in seconds
+    """
+    if isinstance(lines, str):
+        lines = io.StringIO(lines)
+    skipped = 0
+    for block in _blocks(lines):
+        try:
+            cue = _parse_block(block)
+        except ValueError:
+            skipped += 1
+            continue
+        if cue is None:
+            continue
+        if end is not None and cue[0] >= end:
+            break
+        yield cue
+    if skipped:
+        logging.warning(f"Skipped {skipped} malformed caption blocks")
+
+
+class CaptionTrack:
+    """
+    Caption cues sorted by start time, in compact arrays.
+
+    Start and end times are kept in `array('d')` buffers so lookups by
+    timestamp are a bisect over plain doubles. `reach` holds the running
+    maximum of the end times, which (unlike the ends themselves) is sorted.
+    """
+
+    __slots__ = ('starts', 'ends', 'reach', 'texts')
+
+    def __init__(self, cues=(), duration=None):
+        kept = []
+        for start, end, text in cues:
+            if duration is not None:
+                if start >= duration:
+                    continue
+                end = min(end, duration)
+            if end > start and text.strip():
+                kept.append((start, end, text))
+        kept.sort(key=lambda cue: cue[0])
+
+        self.starts = array('d', (cue[0] for cue in kept))
+        self.ends = array('d', (cue[1] for cue in kept))
+        self.reach = array('d', itertools.accumulate(self.ends, max))
+        self.texts = [cue[2] for cue in kept]
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __iter__(self):
+        return iter(zip(self.starts, self.ends, self.texts))
+
+    def active(self, t):
+        """
+        Return the text of the caption showing at time t, or None.
+
+        When cues overlap, the most recently started one wins so only a
+        single caption layer is ever drawn.
+        """
+        # Cues before the first whose running max end passes t have all ended
+        first = bisect.bisect_right(self.reach, t)
+        for i in range(bisect.bisect_right(self.starts, t) - 1, first - 1, -1):
+            if t < self.ends[i]:
+                return self.texts[i]
+        return None
+
+    def window(self, start, end):
+        """Cues overlapping [start, end) as (start, end, text) tuples."""
+        # No cue before the first one whose running max end passes `start` can still be showing
+        first = bisect.bisect_right(self.reach, start)
+        last = bisect.bisect_left(self.starts, end)
+        return [cue for cue in zip(self.starts[first:last], self.ends[first:last], self.texts[first:last])
+                if cue[1] > start]
+
+    def to_list(self):
+        """All cues as (start, end, text) tuples."""
+        return list(self)
+
+
+def parse_captions(source, end=None):
+    """
+    Parse SRT or WebVTT captions up to a time window.
+
+    Args:
+        source (str or iterable): Caption text, or an iterable of lines (e.g. an open file)
+        end (float): Only cues starting before this time are parsed; the last one is clipped
+
+    Returns:
+        CaptionTrack: Sorted cues
+    """
+    return CaptionTrack(iter_cues(source, end), duration=end)
+
+
+def load_captions(path, end=None):
+    """Parse an SRT or WebVTT file, streaming it line by line."""
+    with open(path, encoding='utf-8-sig', errors='replace') as f:
+        return parse_captions(f, end)
@@ -0,0 +1,142 @@
+"""
+In-process caption rendering for the moviepy pipeline.
+
+Replaces one ImageMagick TextClip (and one composited layer) per caption cue
+with Pillow rasterization, an LRU cache of rendered bitmaps and a single
+overlay pass that blends at most one caption into each frame.
+"""
+import functools
+import logging
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from caption_parser import CaptionTrack
+
+# Style matching the previous TextClip captions
+DEFAULT_STYLE = (
+    'Arial-Bold',      # font
+    40,                # font size (px)
+    (255, 255, 255),   # text color
+    (0, 0, 0, 128),    # background RGBA
+    (0, 0, 0),         # stroke color
+    1,                 # stroke width
+)
+
+# Font files tried, in order, for the logical 'Arial-Bold' font
+FONT_CANDIDATES = {
+    'Arial-Bold': ['arialbd.ttf', 'Arial Bold.ttf', 'Arial_Bold.ttf', 'DejaVuSans-Bold.ttf'],
+}
+
+CACHE_SIZE = 256
+PADDING = 8
+
+
+@functools.lru_cache(maxsize=None)
+def load_font(font_name, font_size):
+    """Load a TrueType font by logical name, falling back to Pillow's default font."""
+    for candidate in FONT_CANDIDATES.get(font_name, [font_name]):
+        try:
+            return ImageFont.truetype(candidate, font_size)
+        except OSError:
+            continue
+    logging.warning(f"Font {font_name} not found, using Pillow default font")
+    return ImageFont.load_default()
+
+
+def wrap_text(text, font, max_width, stroke_width=0):
+    """Greedy word wrap so each line fits within max_width pixels."""
+    lines = []
+    current = ''
+    for word in text.split():
+        candidate = f"{current} {word}" if current else word
+        if current and font.getlength(candidate) + 2 * stroke_width > max_width:
+            lines.append(current)
+            current = word
+        else:
+            current = candidate
+    if current:
+        lines.append(current)
+    return lines or ['']
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def rasterize_caption(text, style, width):
+    """
+    Rasterize one caption into premultiplied RGB and inverse-alpha arrays.
+
+    Memoized by (text, style, width), so repeated cues and re-renders of the
+    same clip never rasterize twice.
+
+    Args:
+        text (str): Caption text
+        style (tuple): (font, size, color, bg_rgba, stroke_color, stroke_width)
+        width (int): Box width in pixels; text is wrapped to fit
+
+    Returns:
+        tuple: (premultiplied float32 HxWx3, 1 - alpha float32 HxWx1)
+    """
+    font_name, font_size, color, bg_color, stroke_color, stroke_width = style
+    font = load_font(font_name, font_size)
+    lines = wrap_text(text, font, width - 2 * PADDING, stroke_width)
+
+    ascent, descent = font.getmetrics()
+    line_height = ascent + descent
+    height = line_height * len(lines) + 2 * PADDING
+
+    image = Image.new('RGBA', (width, height), bg_color)
+    draw = ImageDraw.Draw(image)
+    for i, line in enumerate(lines):
+        x = (width - font.getlength(line)) / 2
+        y = PADDING + i * line_height
+        draw.text((x, y), line, font=font, fill=color,
+                  stroke_width=stroke_width, stroke_fill=stroke_color)
+
+    rgba = np.asarray(image, dtype=np.float32) / 255.0
+    alpha = rgba[:, :, 3:4]
+    premultiplied = rgba[:, :, :3] * alpha * 255.0
+    return premultiplied, 1.0 - alpha
+
+
+def overlay_captions(clip, caption_data, style=DEFAULT_STYLE, width_ratio=0.8):
+    """
+    Burn captions into a moviepy clip with a single per-frame overlay.
+
+    Captions are centered horizontally at the bottom of the frame, like the
+    former TextClip layers positioned ('center', 'bottom').
+
+    Args:
+        clip (VideoClip): Clip to caption
+        caption_data (list): (start, end, text) tuples in clip time
+        style (tuple): Caption style, see DEFAULT_STYLE
+        width_ratio (float): Caption box width relative to the frame width
+
+    Returns:
+        VideoClip: Captioned clip (the input clip if there is nothing to draw)
+    """
+    index = CaptionTrack(caption_data, clip.duration)
+    if not len(index):
+        return clip
+
+    box_width = int(clip.w * width_ratio)
+
+    def draw(get_frame, t):
+        frame = get_frame(t)
+        text = index.active(t)
+        if text is None:
+            return frame
+
+        premultiplied, inverse_alpha = rasterize_caption(text, style, box_width)
+        h = min(premultiplied.shape[0], frame.shape[0])
+        w = premultiplied.shape[1]
+        x = (frame.shape[1] - w) // 2
+        y = frame.shape[0] - h
+
+        frame = frame.copy()
+        region = frame[y:y + h, x:x + w].astype(np.float32)
+        region *= inverse_alpha[-h:]
+        region += premultiplied[-h:]
+        frame[y:y + h, x:x + w] = region.astype(np.uint8)
+        return frame
+
+    return clip.fl(draw)
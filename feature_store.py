@@ -0,0 +1,215 @@
+"""
+Persistent per-video store of analysis features.
+
+Each feature of a video is a set of NumPy columns saved as `.npy` files:
+
+    <root>/<video_id>/<feature>-v<version>/<column>.npy
+                                          /meta.json
+
+Columns are loaded memory-mapped, so reusing the analysis of a long source
+costs milliseconds instead of another decode. The version is the
+analyzer's version; bumping it makes old entries invisible, and they are
+removed the next time that feature is saved. A feature directory is
+written under a temporary name and renamed into place, and a lock file per
+video feature stops concurrent jobs from computing the same thing twice.
+"""
+import json
+import logging
+import math
+import os
+import re
+import shutil
+import time
+
+import numpy as np
+
+import audio_analysis
+from caption_parser import CaptionTrack
+import motion_analysis
+import scene_detection
+from source_cache import file_lock
+
+FEATURE_STORE_DIR = os.getenv('FEATURE_STORE_DIR', os.path.join('cache', 'features'))
+
+META_FILE = 'meta.json'
+# Version of the stored caption cue layout
+CAPTIONS_VERSION = 1
+# How long to wait for another process computing the same feature
+COMPUTE_TIMEOUT = 3600
+
+_SAFE_ID = re.compile(r'^[A-Za-z0-9_-]+$')
+
+
+class FeatureStore:
+    """
+    Columnar feature arrays keyed by video id, feature name and analyzer version.
+
+    Args:
+        root (str): Directory holding one subdirectory per video
+    """
+
+    def __init__(self, root=FEATURE_STORE_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _video_dir(self, video_id):
+        if not _SAFE_ID.match(video_id):
+            raise ValueError(f"Invalid video id for feature store: {video_id}")
+        return os.path.join(self.root, video_id)
+
+    def _feature_dir(self, video_id, feature, version):
+        return os.path.join(self._video_dir(video_id), f"{feature}-v{version}")
+
+    def load(self, video_id, feature, version, min_duration=None):
+        """
+        Load a feature's columns memory-mapped.
+
+        Args:
+            min_duration (float): Reject features computed on less than this many
+                seconds of source (e.g. from a partial download)
+
+        Returns:
+            dict: Column name -> read-only array, or None if not stored
+        """
+        feature_dir = self._feature_dir(video_id, feature, version)
+        try:
+            with open(os.path.join(feature_dir, META_FILE)) as f:
+                meta = json.load(f)
+            covered = meta.get('source_duration')
+            if min_duration is not None and covered is not None and covered < min_duration:
+                return None
+            return {name: np.load(os.path.join(feature_dir, f"{name}.npy"), mmap_mode='r')
+                    for name in meta['columns']}
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def save(self, video_id, feature, version, columns, source_duration=None):
+        """Store a feature's columns, replacing any other version of it."""
+        video_dir = self._video_dir(video_id)
+        feature_dir = self._feature_dir(video_id, feature, version)
+        tmp_dir = f"{feature_dir}.{os.getpid()}.tmp"
+        os.makedirs(tmp_dir, exist_ok=True)
+        try:
+            for name, values in columns.items():
+                np.save(os.path.join(tmp_dir, f"{name}.npy"), np.asarray(values))
+            with open(os.path.join(tmp_dir, META_FILE), 'w') as f:
+                json.dump({
+                    'version': version,
+                    'columns': list(columns),
+                    'source_duration': source_duration,
+                    'created': time.time(),
+                }, f)
+            if os.path.isdir(feature_dir):
+                shutil.rmtree(feature_dir, ignore_errors=True)
+            try:
+                os.rename(tmp_dir, feature_dir)
+            except OSError:
+                # Another process stored the same feature in the meantime
+                if not os.path.isdir(feature_dir):
+                    raise
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        # Older analyzer versions of this feature will never be read again
+        for name in os.listdir(video_dir):
+            path = os.path.join(video_dir, name)
+            if (name.startswith(f"{feature}-v") and path != feature_dir and os.path.isdir(path)
+                    and not name.endswith('.tmp')):
+                shutil.rmtree(path, ignore_errors=True)
+
+    def get_or_compute(self, video_id, feature, version, compute, source_duration=None):
+        """
+        Load a feature, computing and storing it first if needed.
+
+        Args:
+            compute (function): Called with no arguments, returns a dict of columns
+            source_duration (float): Seconds of source the feature is computed on
+
+        Returns:
+            dict: Column name -> array
+        """
+        columns = self.load(video_id, feature, version, source_duration)
+        if columns is not None:
+            return columns
+
+        os.makedirs(self._video_dir(video_id), exist_ok=True)
+        lock_path = self._feature_dir(video_id, feature, version) + '.lock'
+        with file_lock(lock_path, timeout=COMPUTE_TIMEOUT):
+            # Another job may have stored it while we waited
+            columns = self.load(video_id, feature, version, source_duration)
+            if columns is not None:
+                return columns
+            start_time = time.time()
+            columns = compute()
+            self.save(video_id, feature, version, columns, source_duration)
+            logging.info(f"Computed {feature} for {video_id} in {time.time() - start_time:.1f}s")
+            return columns
+
+
+_store = None
+
+
+def get_store():
+    """Process-wide feature store."""
+    global _store
+    if _store is None:
+        _store = FeatureStore()
+    return _store
+
+
+def scenes(video_id, video_path, source_duration=None):
+    """Scene boundaries of a source as (start, end) tuples."""
+    def compute():
+        bounds = np.asarray(scene_detection.find_scenes(video_path), dtype=np.float64).reshape(-1, 2)
+        return {'starts': bounds[:, 0], 'ends': bounds[:, 1]}
+
+    columns = get_store().get_or_compute(video_id, 'scenes', scene_detection.ANALYZER_VERSION, compute,
+                                         source_duration)
+    return list(zip(columns['starts'].tolist(), columns['ends'].tolist()))
+
+
+def motion(video_id, video_path, source_duration=None):
+    """Per-sample motion of a source as a MotionProfile."""
+    def compute():
+        profile = motion_analysis.compute_motion_profile(video_path)
+        return {'times': profile.times, 'diffs': profile.diffs}
+
+    columns = get_store().get_or_compute(video_id, 'motion', motion_analysis.ANALYZER_VERSION, compute,
+                                         source_duration)
+    return motion_analysis.MotionProfile(columns['times'], columns['diffs'])
+
+
+def audio_rms(video_id, video_path, source_duration=None):
+    """Per-window audio loudness of a source as an AudioProfile."""
+    def compute():
+        profile = audio_analysis.compute_audio_rms(video_path)
+        return {'times': profile.times, 'rms': profile.rms}
+
+    columns = get_store().get_or_compute(video_id, 'audio_rms', audio_analysis.ANALYZER_VERSION, compute,
+                                         source_duration)
+    return audio_analysis.AudioProfile(columns['times'], columns['rms'])
+
+
+def load_captions(video_id, until=None):
+    """
+    Stored caption cues as (start, end, text) tuples, or None if not stored.
+
+    Args:
+        until (float): Only cues starting before this time are needed (None = whole track);
+            a track stored for a shorter window doesn't count
+    """
+    columns = get_store().load(video_id, 'captions', CAPTIONS_VERSION,
+                               min_duration=math.inf if until is None else until)
+    if columns is None:
+        return None
+    cues = zip(columns['starts'].tolist(), columns['ends'].tolist(), columns['texts'].tolist())
+    return CaptionTrack(cues, duration=until).to_list()
+
+
+def save_captions(video_id, caption_data, until=None):
+    """Store parsed caption cues for a video, covering the track up to `until` seconds (None = whole)."""
+    get_store().save(video_id, 'captions', CAPTIONS_VERSION, {
+        'starts': np.array([cue[0] for cue in caption_data], dtype=np.float64),
+        'ends': np.array([cue[1] for cue in caption_data], dtype=np.float64),
+        'texts': np.array([cue[2] for cue in caption_data], dtype=np.str_),
+    }, source_duration=until)
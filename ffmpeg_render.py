@@ -0,0 +1,302 @@
+"""
+Native ffmpeg render backend for vertical shorts.
+
+Produces the same 1080x1920 letterboxed output as the moviepy chain
+(crop to a centered square, resize to 1080 wide, pad top/bottom to 1920,
+burn in captions) with a single ffmpeg invocation, so frames never pass
+through Python.
+"""
+import json
+import logging
+import os
+
+import encode_profiles
+import ffmpeg_runner
+
+TARGET_WIDTH = 1080
+TARGET_HEIGHT = 1920
+OUTPUT_FPS = 24
+
+# Low-resolution proxy rendered first so users can check the result quickly
+PREVIEW_WIDTH = 360
+PREVIEW_HEIGHT = 640
+PREVIEW_PROFILE = 'fast-preview'
+
+# Caption style mirroring the moviepy TextClip (white bold text on a
+# translucent black box). Font sizes are in ASS script units, where the
+# frame height is 288, so 11 ~= 40px on the 1080px video area.
+CAPTION_STYLE = (
+    "Fontname=Arial,Bold=1,Fontsize=11,PrimaryColour=&H00FFFFFF,"
+    "OutlineColour=&H80000000,BackColour=&H80000000,BorderStyle=3,"
+    "Outline=1,Shadow=0,Alignment=2,MarginV=4"
+)
+
+
+# Sources at most this much wider than 9:16 count as already vertical
+VERTICAL_TOLERANCE = 1.02
+
+
+def probe_video(input_path):
+    """
+    Read the first video stream's dimensions and the container duration with ffprobe.
+
+    Returns:
+        tuple: (width, height, duration)
+    """
+    command = [
+        'ffprobe', '-v', 'error', '-select_streams', 'v:0',
+        '-show_entries', 'stream=width,height:format=duration',
+        '-of', 'json', input_path,
+    ]
+    info = json.loads(ffmpeg_runner.capture(command))
+    stream = info['streams'][0]
+    return int(stream['width']), int(stream['height']), float(info['format'].get('duration', 0))
+
+
+def probe_packet_extent(input_path, duration):
+    """
+    Find where the packets (all streams) of a file's first `duration` seconds end.
+
+    Packet positions come from the container's index, so for a file with its
+    header first this works on a partially written copy; packet data is read
+    but not decoded.
+
+    Returns:
+        tuple: (end byte offset, seconds of packets found, container duration)
+    """
+    command = [
+        'ffprobe', '-v', 'error', '-read_intervals', f'%+{duration:.3f}',
+        '-show_entries', 'packet=pts_time,pos,size:format=duration',
+        '-of', 'json', input_path,
+    ]
+    info = json.loads(ffmpeg_runner.capture(command))
+    end = 0
+    covered = 0.0
+    for packet in info.get('packets', []):
+        try:
+            end = max(end, int(packet['pos']) + int(packet['size']))
+            covered = max(covered, float(packet['pts_time']))
+        except (KeyError, ValueError):
+            continue
+    return end, covered, float(info.get('format', {}).get('duration', 0))
+
+
+def has_audio(input_path):
+    """True if the file has at least one audio stream."""
+    command = [
+        'ffprobe', '-v', 'error', '-select_streams', 'a',
+        '-show_entries', 'stream=index', '-of', 'csv=p=0', input_path,
+    ]
+    return bool(ffmpeg_runner.capture(command).strip())
+
+
+def is_vertical(width, height):
+    """True if the frame is already (close to) 9:16 or narrower."""
+    return width * 16 <= height * 9 * VERTICAL_TOLERANCE
+
+
+def can_stream_copy(width, height, captions, letterbox_source=False):
+    """
+    Decide whether a short can be cut without re-encoding.
+
+    Burned-in captions always need an encode. Otherwise a source that is
+    already vertical, or one the user accepts letterboxed by the player at
+    its own resolution, only needs trimming.
+    """
+    if captions:
+        return False
+    return is_vertical(width, height) or letterbox_source
+
+
+def stream_copy(input_path, output_file, duration, start=0, progress_callback=None):
+    """
+    Trim a source without re-encoding.
+
+    With stream copy, ffmpeg starts at the keyframe at or before `start` and
+    the container is simply remuxed, so this runs at I/O speed.
+    progress_callback, if given, receives the completed fraction (0-1).
+    """
+    command = [
+        'ffmpeg', '-y', '-loglevel', 'error',
+        '-ss', str(start), '-t', str(duration), '-i', input_path,
+        '-map', '0:v:0', '-map', '0:a:0?',
+        '-c', 'copy',
+        '-avoid_negative_ts', 'make_zero',
+        '-movflags', '+faststart',
+        output_file,
+    ]
+    logging.info(f"Stream copying with ffmpeg: {' '.join(command)}")
+    ffmpeg_runner.run(command, duration, progress_callback, label='ffmpeg stream copy')
+    return output_file
+
+
+def format_srt_time(seconds):
+    """Format seconds as an SRT timestamp (HH:MM:SS,mmm)."""
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
+
+
+def write_srt(caption_data, srt_path, duration=None):
+    """
+    Write (start, end, text) caption tuples to an SRT file.
+
+    Cues starting at or after `duration` are dropped and the last one is clipped.
+
+    Returns:
+        int: Number of cues written
+    """
+    count = 0
+    with open(srt_path, 'w', encoding='utf-8') as f:
+        for start, end, text in caption_data:
+            if duration is not None:
+                if start >= duration:
+                    continue
+                end = min(end, duration)
+            count += 1
+            f.write(f"{count}\n{format_srt_time(start)} --> {format_srt_time(end)}\n{text}\n\n")
+    return count
+
+
+def escape_filter_path(path):
+    """Escape a file path for use as a filter option value in a filtergraph."""
+    path = os.path.abspath(path).replace('\\', '/')
+    return path.replace(':', r'\:').replace("'", r"\'")
+
+
+def build_filtergraph(subtitles_path=None, width=TARGET_WIDTH, height=TARGET_HEIGHT, crop_path=None):
+    """
+    Build the video filtergraph: center square crop, scale, letterbox pad, captions.
+
+    Captions are burned in on the square before padding so they sit at the
+    bottom of the picture area, as in the moviepy output. With a crop_path
+    (see reframing) the square and the bars are replaced by a full 9:16
+    window that moves along the path.
+    """
+    if crop_path is not None:
+        filters = [
+            f"crop={crop_path.width}:{crop_path.height}:'{crop_path.ffmpeg_x()}':0",
+            f"scale={width}:{height}",
+        ]
+    else:
+        filters = [
+            "crop='min(iw,ih)':'min(iw,ih)'",
+            f"scale={width}:{width}",
+        ]
+    if subtitles_path:
+        filters.append(f"subtitles='{escape_filter_path(subtitles_path)}':force_style='{CAPTION_STYLE}'")
+    if crop_path is None:
+        filters.append(f"pad={width}:{height}:0:(oh-ih)/2:black")
+    filters.append("setsar=1")
+    return ",".join(filters)
+
+
+def build_concat_filter(segments, audio=True):
+    """
+    Build a filtergraph prefix cutting `segments` out of input 0 and joining them.
+
+    Every segment is trimmed with its timestamps reset, then all of them go
+    through a single concat filter, so the selection is decoded and encoded
+    in one pass. The outputs are labelled [cv] and, with audio, [ca].
+    """
+    parts = []
+    labels = []
+    for i, (start, end) in enumerate(segments):
+        parts.append(f"[0:v]trim=start={start:.3f}:end={end:.3f},setpts=PTS-STARTPTS[v{i}]")
+        labels.append(f"[v{i}]")
+        if audio:
+            parts.append(f"[0:a]atrim=start={start:.3f}:end={end:.3f},asetpts=PTS-STARTPTS[a{i}]")
+            labels.append(f"[a{i}]")
+    outputs = "[cv][ca]" if audio else "[cv]"
+    parts.append(f"{''.join(labels)}concat=n={len(segments)}:v=1:a={int(audio)}{outputs}")
+    return ";".join(parts)
+
+
+def build_command(input_path, output_file, duration, subtitles_path=None, start=0, encode_profile=None,
+                  size=(TARGET_WIDTH, TARGET_HEIGHT), segments=None, crop_path=None, audio=True):
+    """Build the ffmpeg argument list for a single-pass render (audio: the source has an audio stream)."""
+    if segments:
+        # Highlights: cut and concatenate the segments, then apply the vertical chain
+        filtergraph = (f"{build_concat_filter(segments, audio)};"
+                       f"[cv]{build_filtergraph(subtitles_path, *size, crop_path)}[outv]")
+        source_args = ['-i', input_path, '-filter_complex', filtergraph, '-map', '[outv]']
+        if audio:
+            source_args += ['-map', '[ca]']
+    else:
+        source_args = ['-ss', str(start), '-t', str(duration), '-i', input_path,
+                       '-vf', build_filtergraph(subtitles_path, *size, crop_path)]
+    return [
+        'ffmpeg', '-y', '-loglevel', 'error',
+        *source_args,
+        '-r', str(OUTPUT_FPS),
+        '-c:v', 'libx264', '-pix_fmt', 'yuv420p',
+        *encode_profiles.ffmpeg_args(encode_profile),
+        '-c:a', 'aac',
+        '-movflags', '+faststart',
+        output_file,
+    ]
+
+
+def render_short(input_path, output_file, duration, caption_data=None, work_dir=None, encode_profile=None,
+                 size=(TARGET_WIDTH, TARGET_HEIGHT), segments=None, progress_callback=None, crop_path=None):
+    """
+    Render a vertical short with one ffmpeg filtergraph.
+
+    Args:
+        input_path (str): Merged source video (video + audio)
+        output_file (str): Path to save the output file
+        duration (float): Seconds to keep from the start of the source
+        caption_data (list): Optional (start, end, text) tuples to burn in
+        work_dir (str): Directory for the temporary subtitle file (default: next to the output)
+        encode_profile (str): Name of the x264 encode profile (see encode_profiles)
+        size (tuple): Output (width, height); the video area is a width x width square
+            unless a crop_path is given
+        segments (list): Optional (start, end) tuples to concatenate instead of the first
+            `duration` seconds; caption times are then on the concatenated timeline
+        progress_callback (function): Optional callback receiving the completed fraction (0-1)
+        crop_path (reframing.CropPath): Optional moving 9:16 window to cut instead of the
+            letterboxed square, on the same timeline as the captions
+
+    Returns:
+        str: Path to the output video file
+    """
+    srt_path = None
+    subtitles_path = None
+    try:
+        if caption_data:
+            if work_dir:
+                srt_path = os.path.join(work_dir, f'captions_{size[0]}.srt')
+            else:
+                srt_path = os.path.splitext(output_file)[0] + '.captions.srt'
+            if write_srt(caption_data, srt_path, duration):
+                subtitles_path = srt_path
+
+        # Silent sources (e.g. some uploads) have no audio for the concat to join
+        audio = has_audio(input_path) if segments else True
+        command = build_command(input_path, output_file, duration, subtitles_path,
+                                encode_profile=encode_profile, size=size, segments=segments, crop_path=crop_path,
+                                audio=audio)
+        logging.info(f"Rendering with ffmpeg: {' '.join(command)}")
+        ffmpeg_runner.run(command, duration, progress_callback, label='ffmpeg render')
+        return output_file
+    finally:
+        if srt_path and os.path.exists(srt_path):
+            try:
+                os.remove(srt_path)
+            except OSError:
+                pass
+
+
+def render_preview(input_path, output_file, duration, caption_data=None, work_dir=None, segments=None,
+                   crop_path=None):
+    """
+    Render a low-resolution (360x640) proxy of the short at the fastest preset.
+
+    Uses the same trim/crop/pad/caption pipeline as the full render, so the
+    proxy shows exactly what the final short will look like.
+    """
+    return render_short(input_path, output_file, duration, caption_data, work_dir=work_dir,
+                        encode_profile=PREVIEW_PROFILE, size=(PREVIEW_WIDTH, PREVIEW_HEIGHT), segments=segments,
+                        crop_path=crop_path)
@@ -0,0 +1,240 @@
+"""
+Managed execution of ffmpeg and ffprobe subprocesses.
+
+Every invocation takes an argument list (no shell), is bounded by a
+timeout, can be cancelled through an event-like object, and raises
+FFmpegError with the tail of stderr when the process fails. Long runs can
+report progress: ffmpeg is started with `-progress pipe:1` and its
+`out_time_us` reports are turned into a completed fraction.
+
+A watchdog thread per process enforces the timeout and cancellation by
+terminating (then killing) the process, so even a call blocked on a pipe
+read returns promptly. Without an explicit cancel event, the token of the
+job running in this process (see cancellation) is used.
+"""
+import collections
+import logging
+import os
+import subprocess
+import threading
+import time
+
+import cancellation
+
+# Upper bound for a single ffmpeg run (renders of long sources included)
+FFMPEG_TIMEOUT = float(os.getenv('FFMPEG_TIMEOUT', 3600))
+# Upper bound for ffprobe and other quick calls
+PROBE_TIMEOUT = 60
+# How often the watchdog checks for timeout and cancellation
+POLL_INTERVAL = 0.2
+# Minimum time between progress callbacks
+PROGRESS_INTERVAL = 0.5
+# Time a terminated process gets to exit before it is killed
+TERMINATE_GRACE = 5
+# Lines of stderr kept for error messages
+STDERR_LINES = 40
+
+
+class FFmpegError(RuntimeError):
+    """An ffmpeg/ffprobe process failed; carries its exit code and stderr tail."""
+
+    def __init__(self, message, returncode=None, stderr=''):
+        super().__init__(f"{message}: {stderr}" if stderr else message)
+        self.returncode = returncode
+        self.stderr = stderr
+
+
+class FFmpegTimeout(FFmpegError):
+    """The process ran longer than its timeout and was stopped."""
+
+
+class FFmpegCancelled(FFmpegError, cancellation.TaskCancelled):
+    """The process was stopped because its job was cancelled."""
+
+
+def stop_process(process, grace=TERMINATE_GRACE):
+    """Terminate a process, killing it if it doesn't exit within `grace` seconds."""
+    if process.poll() is not None:
+        return
+    process.terminate()
+    try:
+        process.wait(grace)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+class _Watchdog(threading.Thread):
+    """Stops a process on timeout or cancellation and remembers why."""
+
+    def __init__(self, process, timeout, cancel_event):
+        super().__init__(daemon=True)
+        self.process = process
+        self.deadline = time.time() + timeout if timeout else None
+        self.cancel_event = cancel_event
+        self.reason = None
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(POLL_INTERVAL):
+            if self.process.poll() is not None:
+                return
+            if self.cancel_event is not None and self.cancel_event.is_set():
+                self.reason = 'cancelled'
+            elif self.deadline and time.time() > self.deadline:
+                self.reason = 'timeout'
+            if self.reason:
+                stop_process(self.process)
+                return
+
+    def finish(self):
+        self._done.set()
+        self.join()
+
+
+def _drain_lines(stream, lines):
+    for line in iter(stream.readline, b''):
+        lines.append(line.decode(errors='replace').rstrip())
+    stream.close()
+
+
+def _start(args, stdout, cancel_event, timeout):
+    if cancel_event is None:
+        cancel_event = cancellation.current()
+    if cancel_event is not None and cancel_event.is_set():
+        raise FFmpegCancelled(f"{os.path.basename(args[0])} not started: job cancelled")
+    logging.debug(f"Running: {' '.join(args)}")
+    process = subprocess.Popen(args, stdin=subprocess.DEVNULL, stdout=stdout, stderr=subprocess.PIPE)
+    watchdog = _Watchdog(process, timeout, cancel_event)
+    watchdog.start()
+    return process, watchdog
+
+
+def _check(process, watchdog, label, stderr_tail):
+    if watchdog.reason == 'cancelled':
+        raise FFmpegCancelled(f"{label} cancelled", process.returncode)
+    if watchdog.reason == 'timeout':
+        raise FFmpegTimeout(f"{label} timed out", process.returncode, stderr_tail)
+    if process.returncode != 0:
+        raise FFmpegError(f"{label} failed (exit code {process.returncode})", process.returncode, stderr_tail)
+
+
+def _report_progress(stream, duration, progress_callback):
+    """Turn `-progress` key=value output into progress_callback(fraction) calls."""
+    last_report = 0.0
+    last_fraction = None
+    for raw in iter(stream.readline, b''):
+        key, _, value = raw.decode(errors='replace').strip().partition('=')
+        fraction = None
+        if key in ('out_time_us', 'out_time_ms') and duration:
+            # Both keys are in microseconds; the value is N/A until the first frame
+            try:
+                fraction = min(1.0, max(0.0, int(value) / 1e6 / duration))
+            except ValueError:
+                continue
+        elif key == 'progress' and value == 'end':
+            fraction = 1.0
+        if fraction is None or fraction == last_fraction:
+            continue
+        now = time.time()
+        if fraction == 1.0 or now - last_report >= PROGRESS_INTERVAL:
+            last_report = now
+            last_fraction = fraction
+            try:
+                progress_callback(fraction)
+            except Exception as e:
+                logging.warning(f"Progress callback failed: {str(e)}")
+    stream.close()
+
+
+def run(args, duration=None, progress_callback=None, timeout=FFMPEG_TIMEOUT, cancel_event=None, label=None):
+    """
+    Run ffmpeg to completion.
+
+    Args:
+        args (list): Full argument list, starting with 'ffmpeg'
+        duration (float): Output duration in seconds, to turn progress into a fraction
+        progress_callback (function): Called with the completed fraction (0-1)
+        timeout (float): Seconds before the process is stopped (None = no limit)
+        cancel_event: Object with is_set(); the process is stopped once it is set
+            (default: the current job's cancellation token)
+        label (str): Name used in log and error messages
+
+    Raises:
+        FFmpegError: If ffmpeg exits with an error (FFmpegTimeout / FFmpegCancelled
+            if it was stopped)
+    """
+    label = label or os.path.basename(args[0])
+    if progress_callback:
+        args = [args[0], '-progress', 'pipe:1', '-nostats'] + list(args[1:])
+    process, watchdog = _start(args, subprocess.PIPE if progress_callback else subprocess.DEVNULL,
+                               cancel_event, timeout)
+
+    stderr_lines = collections.deque(maxlen=STDERR_LINES)
+    readers = [threading.Thread(target=_drain_lines, args=(process.stderr, stderr_lines), daemon=True)]
+    if progress_callback:
+        readers.append(threading.Thread(target=_report_progress,
+                                        args=(process.stdout, duration, progress_callback), daemon=True))
+    for reader in readers:
+        reader.start()
+    start_time = time.time()
+    try:
+        process.wait()
+        for reader in readers:
+            reader.join()
+    finally:
+        stop_process(process)
+        watchdog.finish()
+    _check(process, watchdog, label, '\n'.join(stderr_lines))
+    logging.debug(f"{label} finished in {time.time() - start_time:.1f}s")
+
+
+def capture(args, timeout=PROBE_TIMEOUT, cancel_event=None, label=None, text=True):
+    """
+    Run ffmpeg/ffprobe and return everything it wrote to stdout.
+
+    Returns:
+        str or bytes: Standard output (bytes if text is False)
+
+    Raises:
+        FFmpegError: As for run()
+    """
+    label = label or os.path.basename(args[0])
+    process, watchdog = _start(args, subprocess.PIPE, cancel_event, timeout)
+    try:
+        stdout, stderr = process.communicate()
+    finally:
+        stop_process(process)
+        watchdog.finish()
+    _check(process, watchdog, label, stderr.decode(errors='replace').strip()[-2000:])
+    return stdout.decode(errors='replace') if text else stdout
+
+
+def iter_chunks(args, chunk_size, timeout=FFMPEG_TIMEOUT, cancel_event=None, label=None):
+    """
+    Run ffmpeg writing raw data to stdout and yield it in chunks of `chunk_size` bytes.
+
+    The last chunk may be shorter. Use for decoders that reduce frames or
+    samples batch by batch without holding the whole output.
+
+    Raises:
+        FFmpegError: As for run(), after the data that was produced has been yielded
+    """
+    label = label or os.path.basename(args[0])
+    process, watchdog = _start(args, subprocess.PIPE, cancel_event, timeout)
+    stderr_lines = collections.deque(maxlen=STDERR_LINES)
+    reader = threading.Thread(target=_drain_lines, args=(process.stderr, stderr_lines), daemon=True)
+    reader.start()
+    try:
+        while True:
+            data = process.stdout.read(chunk_size)
+            if not data:
+                break
+            yield data
+        process.wait()
+        reader.join()
+    finally:
+        process.stdout.close()
+        stop_process(process)
+        watchdog.finish()
+    _check(process, watchdog, label, '\n'.join(stderr_lines))
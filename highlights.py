@@ -0,0 +1,148 @@
+"""
+Highlight selection: pick the best N seconds of a source instead of the first N.
+
+Scene boundaries, motion and audio loudness are combined into an optimal
+segment selection with a 0/1 knapsack over the duration budget. The
+analysis is kept in the feature store per video, so selecting again at a
+different duration only reruns the (cheap) knapsack.
+"""
+import logging
+
+import numpy as np
+
+import audio_analysis
+from caption_parser import CaptionTrack
+import feature_store
+import motion_analysis
+from scene_detection import find_scenes
+
+# Scenes shorter than this are never used on their own
+MIN_SEGMENT = 1.0
+# Longer scenes are split so the budget can be filled tightly
+MAX_SEGMENT = 15.0
+# Knapsack time step in seconds; segment lengths are rounded up to it
+TIME_RESOLUTION = 0.25
+# Share of a segment's score that comes from its loudness relative to the loudest segment
+AUDIO_WEIGHT = 0.25
+
+
+def split_long_scenes(scenes, max_segment=MAX_SEGMENT):
+    """Split scenes longer than max_segment into roughly equal parts."""
+    segments = []
+    for start, end in scenes:
+        parts = max(1, int(np.ceil((end - start) / max_segment)))
+        step = (end - start) / parts
+        segments.extend((start + i * step, start + (i + 1) * step) for i in range(parts))
+    return segments
+
+
+def select_segments(segments, scores, budget, resolution=TIME_RESOLUTION, min_segment=MIN_SEGMENT):
+    """
+    Choose the segments with the highest total interest that fit the budget.
+
+    Each segment is worth score * length, so the selection maximizes the
+    interest of the seconds shown. Solved exactly as a 0/1 knapsack with
+    lengths rounded up to `resolution`, so the result never exceeds `budget`.
+
+    Args:
+        segments (list): (start_time, end_time) tuples
+        scores (list): Interest score per segment
+        budget (float): Maximum total length in seconds
+        resolution (float): Time step of the knapsack
+        min_segment (float): Segments shorter than this are skipped
+
+    Returns:
+        list: Selected (start_time, end_time) tuples in source order
+    """
+    capacity = int(budget / resolution)
+    candidates = [i for i, (start, end) in enumerate(segments) if end - start >= min_segment]
+    if capacity <= 0 or not candidates:
+        return []
+
+    weights = [int(np.ceil((segments[i][1] - segments[i][0]) / resolution - 1e-9)) for i in candidates]
+    values = [scores[i] * (segments[i][1] - segments[i][0]) for i in candidates]
+
+    # best[c] = highest value using at most c units; taken[k, c] records the choice
+    best = np.zeros(capacity + 1)
+    taken = np.zeros((len(candidates), capacity + 1), dtype=bool)
+    for k, (weight, value) in enumerate(zip(weights, values)):
+        if weight > capacity:
+            continue
+        with_item = best[:capacity + 1 - weight] + value
+        improved = with_item > best[weight:]
+        taken[k, weight:] = improved
+        best[weight:] = np.where(improved, with_item, best[weight:])
+
+    selected = []
+    c = capacity
+    for k in range(len(candidates) - 1, -1, -1):
+        if taken[k, c]:
+            selected.append(segments[candidates[k]])
+            c -= weights[k]
+    return sorted(selected)
+
+
+def analyze(video_path, video_id=None, source_duration=None):
+    """
+    Detect scenes and measure motion and loudness for a source.
+
+    Args:
+        video_path (str): Full-length source video
+        video_id (str): Feature store key; analysis isn't stored without one
+        source_duration (float): Length of the source, so features from a shorter
+            (partial) copy are not reused
+
+    Returns:
+        tuple: (scenes, MotionProfile, AudioProfile)
+    """
+    if not video_id:
+        return (find_scenes(video_path), motion_analysis.compute_motion_profile(video_path),
+                audio_analysis.compute_audio_rms(video_path))
+    return (feature_store.scenes(video_id, video_path, source_duration),
+            feature_store.motion(video_id, video_path, source_duration),
+            feature_store.audio_rms(video_id, video_path, source_duration))
+
+
+def score_segments(segments, motion, audio):
+    """Interest score per segment from motion and relative loudness."""
+    scores = motion_analysis.score_scenes(motion, segments)
+    if len(audio) and len(segments):
+        bounds = np.asarray(segments, dtype=np.float64)
+        energy = audio.mean_energy(bounds[:, 0], bounds[:, 1])
+        if energy.max() > 0:
+            scores = scores * (1 - AUDIO_WEIGHT) + energy / energy.max() * AUDIO_WEIGHT
+    return scores
+
+
+def pick_highlights(video_path, duration, video_id=None, source_duration=None):
+    """
+    Select the most interesting segments of a source filling `duration` seconds.
+
+    Returns:
+        list: (start_time, end_time) tuples in source order
+    """
+    scenes, motion, audio = analyze(video_path, video_id, source_duration)
+    segments = split_long_scenes(scenes)
+    scores = score_segments(segments, motion, audio)
+    selected = select_segments(segments, scores, duration)
+    total = sum(end - start for start, end in selected)
+    logging.info(f"Selected {len(selected)} of {len(segments)} segments, {total:.1f}s of {duration}s")
+    return selected
+
+
+def remap_captions(caption_data, segments):
+    """
+    Move caption cues from source time onto the concatenated highlight timeline.
+
+    Cues are clipped to the segments they overlap; a cue spanning a cut is
+    split into one cue per segment.
+    """
+    track = CaptionTrack(caption_data)
+    remapped = []
+    offset = 0.0
+    for seg_start, seg_end in segments:
+        for start, end, text in track.window(seg_start, seg_end):
+            remapped.append((offset + max(start, seg_start) - seg_start,
+                             offset + min(end, seg_end) - seg_start, text))
+        offset += seg_end - seg_start
+    return remapped
@@ -0,0 +1,197 @@
+"""
+Process-based job scheduler for video processing tasks.
+
+Runs tasks on a fixed pool of worker processes (moviepy's frame loop holds
+the GIL, so threads don't scale) fed from a bounded FIFO queue. Worker
+processes report task updates back over a multiprocessing queue, which a
+listener thread in the web process applies to the shared task records.
+"""
+import collections
+import concurrent.futures
+import logging
+import multiprocessing
+import threading
+import time
+
+# Set in each worker process by _init_worker
+_event_queue = None
+
+
+class QueueFull(Exception):
+    """Raised when a job is submitted while the pending queue is at capacity."""
+
+    def __init__(self, depth):
+        super().__init__(f"Job queue is full ({depth} jobs waiting)")
+        self.depth = depth
+
+
+def _init_worker(event_queue):
+    global _event_queue
+    _event_queue = event_queue
+
+
+class ReportingTask(dict):
+    """
+    Task record used inside a worker process.
+
+    Behaves like the plain task dict the processing code expects, but every
+    assignment is also sent to the parent process so /status sees it.
+    """
+
+    def __init__(self, task_id, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.task_id = task_id
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        if _event_queue is not None:
+            _event_queue.put((self.task_id, key, value))
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+
+class JobScheduler:
+    """
+    Bounded FIFO queue in front of a pool of worker processes.
+
+    Args:
+        target (function): Module-level function run as target(task_id, *args)
+            in a worker process
+        workers (int): Number of worker processes (and concurrent jobs)
+        max_queue (int): Maximum number of jobs waiting for a worker
+        on_update (function): Called in the parent as on_update(task_id, key, value)
+            for every task update, including queued_at/started_at/finished_at
+    """
+
+    def __init__(self, target, workers=2, max_queue=20, on_update=None):
+        self.target = target
+        self.workers = workers
+        self.max_queue = max_queue
+        self.on_update = on_update or (lambda task_id, key, value: None)
+
+        self._events = multiprocessing.Queue()
+        self._executor = self._create_executor()
+        self._pending = collections.deque()
+        self._running = set()
+        self._condition = threading.Condition()
+
+        threading.Thread(target=self._dispatch_loop, name='job-dispatcher', daemon=True).start()
+        threading.Thread(target=self._event_loop, name='job-events', daemon=True).start()
+
+    def submit(self, task_id, *args):
+        """
+        Queue a job.
+
+        Returns:
+            int: 1-based position in the pending queue
+
+        Raises:
+            QueueFull: If max_queue jobs are already waiting
+        """
+        with self._condition:
+            # Jobs about to be picked up by an idle worker don't count against the queue
+            idle_workers = max(0, self.workers - len(self._running))
+            if len(self._pending) >= self.max_queue + idle_workers:
+                raise QueueFull(len(self._pending))
+            self._pending.append((task_id, args))
+            self.on_update(task_id, 'queued_at', time.time())
+            self._condition.notify_all()
+            return len(self._pending)
+
+    def cancel(self, task_id, request_stop=None):
+        """
+        Remove a job from the pending queue.
+
+        Args:
+            request_stop (function): Called as request_stop(task_id) if a worker has
+                the job, before the job can be reported finished
+
+        Returns:
+            str: 'dequeued' if it was waiting (it will never run), 'running' if a
+            worker has it (stopping it is up to the job), or None if unknown
+        """
+        with self._condition:
+            for pending in self._pending:
+                if pending[0] == task_id:
+                    self._pending.remove(pending)
+                    break
+            else:
+                if task_id not in self._running:
+                    return None
+                if request_stop:
+                    request_stop(task_id)
+                return 'running'
+        self.on_update(task_id, 'finished_at', time.time())
+        return 'dequeued'
+
+    def queue_position(self, task_id):
+        """Return the 1-based position of a pending job, or 0 if it isn't waiting."""
+        with self._condition:
+            for position, (pending_id, _) in enumerate(self._pending, start=1):
+                if pending_id == task_id:
+                    return position
+        return 0
+
+    def queue_depth(self):
+        """Number of jobs waiting for a worker."""
+        with self._condition:
+            return len(self._pending)
+
+    def running_count(self):
+        """Number of jobs currently executing."""
+        with self._condition:
+            return len(self._running)
+
+    def _create_executor(self):
+        return concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_init_worker, initargs=(self._events,)
+        )
+
+    def _dispatch_loop(self):
+        while True:
+            with self._condition:
+                while not self._pending or len(self._running) >= self.workers:
+                    self._condition.wait()
+                task_id, args = self._pending.popleft()
+                self._running.add(task_id)
+
+            self.on_update(task_id, 'started_at', time.time())
+            executor = self._executor
+            try:
+                future = executor.submit(self.target, task_id, *args)
+            except Exception as e:
+                self._job_done(task_id, e, executor)
+                continue
+            future.add_done_callback(
+                lambda f, task_id=task_id, executor=executor: self._job_done(task_id, f.exception(), executor)
+            )
+
+    def _job_done(self, task_id, error=None, executor=None):
+        if error is not None:
+            # The task function handles its own errors; this is a crashed or killed worker
+            logging.error(f"Worker for task {task_id} failed: {error}")
+            if isinstance(error, concurrent.futures.process.BrokenProcessPool):
+                # A killed worker (e.g. OOM) breaks the whole pool; start a fresh one
+                with self._condition:
+                    if executor is self._executor:
+                        self._executor.shutdown(wait=False)
+                        self._executor = self._create_executor()
+            self.on_update(task_id, 'status', 'failed')
+            self.on_update(task_id, 'error', f"Worker error: {error}")
+            self.on_update(task_id, 'current_stage', 'Failed: worker error')
+
+        with self._condition:
+            self._running.discard(task_id)
+            self._condition.notify_all()
+        # After the job left the running set, so no stop request can follow this
+        self.on_update(task_id, 'finished_at', time.time())
+
+    def _event_loop(self):
+        while True:
+            try:
+                task_id, key, value = self._events.get()
+                self.on_update(task_id, key, value)
+            except Exception as e:
+                logging.error(f"Error applying task update: {str(e)}")
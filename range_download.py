@@ -0,0 +1,212 @@
+"""
+Range-limited downloads for fragmented MP4 streams.
+
+YouTube serves its adaptive (video-only / audio-only) streams as fragmented
+MP4 files laid out as ftyp + moov + sidx + (moof + mdat)*. The segment index
+box (sidx) lists the byte size and duration of every fragment, which lets us
+fetch only the fragments covering the start of the video instead of the whole
+file. Anything that does not follow this layout raises RangeNotSupported so
+the caller can fall back to a full download.
+"""
+import logging
+import struct
+import urllib.error
+import urllib.request
+
+import cancellation
+
+# Bytes fetched up front to locate the ftyp/moov/sidx boxes
+HEADER_PROBE_SIZE = 64 * 1024
+# Size of each read when streaming fragment data to disk
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+REQUEST_TIMEOUT = 30
+
+# Top-level boxes that start the media data; the index must appear before them
+MEDIA_BOXES = (b'moof', b'mdat')
+
+
+class RangeNotSupported(Exception):
+    """Raised when a stream cannot be cut by byte range."""
+
+
+def fetch_range(url, start, end, timeout=REQUEST_TIMEOUT):
+    """
+    Fetch the inclusive byte range [start, end] of a URL.
+
+    Raises:
+        RangeNotSupported: If the server ignores the Range header
+    """
+    request = urllib.request.Request(url, headers={'Range': f'bytes={start}-{end}'})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        if response.status != 206:
+            raise RangeNotSupported(f"Server answered {response.status} to a range request")
+        return response.read()
+
+
+def read_box_header(data, pos):
+    """
+    Read the MP4 box header starting at `pos`.
+
+    Returns:
+        tuple: (box_type, box_size, header_size), or None if the buffer is too
+        short to hold the header. box_size is None for a box running to EOF.
+    """
+    if pos + 8 > len(data):
+        return None
+    size, box_type = struct.unpack('>I4s', data[pos:pos + 8])
+    header_size = 8
+    if size == 1:
+        if pos + 16 > len(data):
+            return None
+        size = struct.unpack('>Q', data[pos + 8:pos + 16])[0]
+        header_size = 16
+    elif size == 0:
+        return box_type, None, header_size
+    if size < header_size:
+        raise RangeNotSupported(f"Corrupt box header for {box_type!r}")
+    return box_type, size, header_size
+
+
+def parse_sidx(payload):
+    """
+    Parse the body of a sidx (segment index) box.
+
+    Args:
+        payload (bytes): Box contents following the box header
+
+    Returns:
+        tuple: (timescale, first_offset, references) where references is a list
+        of (referenced_size, subsegment_duration) tuples
+    """
+    version = payload[0]
+    pos = 4  # version (1) + flags (3)
+    _reference_id, timescale = struct.unpack('>II', payload[pos:pos + 8])
+    pos += 8
+    if version == 0:
+        _earliest, first_offset = struct.unpack('>II', payload[pos:pos + 8])
+        pos += 8
+    else:
+        _earliest, first_offset = struct.unpack('>QQ', payload[pos:pos + 16])
+        pos += 16
+    _reserved, reference_count = struct.unpack('>HH', payload[pos:pos + 4])
+    pos += 4
+
+    references = []
+    for _ in range(reference_count):
+        ref, duration, _sap = struct.unpack('>III', payload[pos:pos + 12])
+        pos += 12
+        if ref & 0x80000000:
+            # Hierarchical index pointing at another sidx; not worth following
+            raise RangeNotSupported("Nested segment indexes are not supported")
+        references.append((ref & 0x7FFFFFFF, duration))
+
+    if not timescale or not references:
+        raise RangeNotSupported("Empty segment index")
+    return timescale, first_offset, references
+
+
+def plan_prefix(url, seconds, probe_size=HEADER_PROBE_SIZE):
+    """
+    Work out which bytes of a fragmented MP4 cover its first `seconds`.
+
+    Returns:
+        tuple: (header, media_start, media_end) where header holds every
+        top-level box before the first fragment except sidx, and
+        [media_start, media_end] is the inclusive byte range of fragments to fetch
+    """
+    data = fetch_range(url, 0, probe_size - 1)
+    header = b''
+    sidx = None
+    sidx_end = None
+    seen = set()
+    pos = 0
+
+    while True:
+        box = read_box_header(data, pos)
+        if box is None:
+            # Header straddles the probe boundary
+            data += fetch_range(url, len(data), pos + probe_size - 1)
+            box = read_box_header(data, pos)
+            if box is None:
+                break
+        box_type, size, header_size = box
+        if box_type in MEDIA_BOXES or size is None:
+            break
+        if pos + size > len(data):
+            # The box continues past what we have; fetch the remainder
+            data += fetch_range(url, len(data), pos + size - 1)
+        seen.add(box_type)
+        if box_type == b'sidx':
+            sidx = parse_sidx(data[pos + header_size:pos + size])
+            sidx_end = pos + size
+            break
+        header += data[pos:pos + size]
+        pos += size
+
+    if b'moov' not in seen:
+        raise RangeNotSupported("No moov box ahead of the media data")
+    if sidx is None:
+        raise RangeNotSupported("Stream has no segment index")
+
+    timescale, first_offset, references = sidx
+    media_start = sidx_end + first_offset
+    media_end = media_start
+    covered = 0.0
+    for referenced_size, duration in references:
+        media_end += referenced_size
+        covered += duration / timescale
+        if covered >= seconds:
+            break
+
+    return header, media_start, media_end - 1
+
+
+def download_prefix(url, output_file, seconds, chunk_size=DEFAULT_CHUNK_SIZE, timeout=REQUEST_TIMEOUT,
+                    cancel_event=None):
+    """
+    Download only the fragments of a fragmented MP4 covering its first `seconds`.
+
+    The written file keeps the original init segment (ftyp + moov) followed by
+    the selected moof/mdat fragments, which ffmpeg and moviepy read as a
+    regular (shorter) fragmented MP4.
+
+    Args:
+        url (str): Direct URL of the stream
+        output_file (str): Path to write the trimmed file to
+        seconds (float): Minimum duration to cover from the start
+        chunk_size (int): Bytes read per iteration while streaming fragments
+        timeout (int): Socket timeout in seconds
+        cancel_event (threading.Event): Stops the download between chunks when set
+
+    Returns:
+        int: Number of bytes written
+
+    Raises:
+        RangeNotSupported: If the container can't be cut by byte range
+    """
+    header, media_start, media_end = plan_prefix(url, seconds)
+    logging.info(f"Range download: fetching bytes {media_start}-{media_end} to cover {seconds:.1f}s")
+
+    request = urllib.request.Request(url, headers={'Range': f'bytes={media_start}-{media_end}'})
+    written = 0
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        if response.status != 206:
+            raise RangeNotSupported(f"Server answered {response.status} to a range request")
+        with open(output_file, 'wb') as f:
+            f.write(header)
+            written += len(header)
+            while True:
+                cancellation.check()
+                if cancel_event is not None and cancel_event.is_set():
+                    raise cancellation.TaskCancelled("Range download stopped")
+                chunk = response.read(chunk_size)
+                if not chunk:
+                    break
+                f.write(chunk)
+                written += len(chunk)
+                logging.debug(f"Downloaded {written} bytes of range prefix")
+
+    expected = len(header) + media_end - media_start + 1
+    if written != expected:
+        raise urllib.error.URLError(f"Range download truncated ({written} of {expected} bytes)")
+    return written
@@ -0,0 +1,238 @@
+"""
+Subject-following 9:16 crop for landscape sources.
+
+Instead of a centered square with black bars, the short is cut from a
+full-height 9:16 window that pans to follow the subject. Frames are sampled
+sparsely (a few per second, decoded by ffmpeg already downscaled to gray)
+and each sample gets a horizontal subject position: the faces found by an
+OpenCV Haar cascade, or the peak of a spectral-residual saliency map when
+there are none. The positions are median-filtered against detection
+flicker, smoothed into a steady pan and reduced to a few keyframes. The
+resulting piecewise-linear path is applied per frame, either as an ffmpeg
+crop expression or in moviepy, so analysis costs a small fraction of the
+encode.
+"""
+import logging
+
+import cv2
+import numpy as np
+
+import ffmpeg_render
+import ffmpeg_runner
+
+# Frames analysed per second of output
+SAMPLE_FPS = 3
+# Width of the frames the face detector sees
+SAMPLE_WIDTH = 320
+# Width of the frames the saliency map is computed on
+SALIENCY_WIDTH = 64
+# Median filter length (samples) against single-frame detection errors
+MEDIAN_SAMPLES = 5
+# Length of the moving average that turns positions into a steady pan
+SMOOTH_SECONDS = 1.5
+# Keyframes may deviate from the smoothed path by this share of the source width
+KEYFRAME_TOLERANCE = 0.005
+# Sources whose 9:16 window covers this much of the width are left to the static crop
+MIN_CROP_GAIN = 0.9
+TARGET_ASPECT = 9 / 16
+
+_detector = None
+
+
+class CropPath:
+    """
+    Left edge of a fixed-size crop window over time, linear between keyframes.
+
+    Args:
+        times (ndarray): Keyframe times in seconds on the output timeline
+        xs (ndarray): Left edge of the window at each keyframe, in source pixels
+        width (int): Window width in source pixels
+        height (int): Window height in source pixels
+    """
+
+    def __init__(self, times, xs, width, height):
+        self.times = np.asarray(times, dtype=np.float64)
+        self.xs = np.asarray(xs, dtype=np.float64)
+        self.width = width
+        self.height = height
+
+    def __len__(self):
+        return len(self.times)
+
+    def x_at(self, t):
+        """Left edge of the window at time t (whole pixels)."""
+        return int(round(float(np.interp(t, self.times, self.xs))))
+
+    def crop_frame(self, frame, t):
+        """Cut the window out of a moviepy frame (H x W x 3 array) shown at time t."""
+        x = self.x_at(t)
+        return frame[:self.height, x:x + self.width]
+
+    def ffmpeg_x(self):
+        """
+        The path as an expression for the crop filter's x option.
+
+        Written as a flat sum of one term per keyframe interval rather than
+        nested if()s, so long paths stay cheap to parse and evaluate.
+        """
+        times, xs = self.times, self.xs
+        if len(times) == 1:
+            return f"{xs[0]:.1f}"
+        terms = [f"lt(t,{times[0]:.3f})*{xs[0]:.1f}"]
+        for t0, t1, x0, x1 in zip(times[:-1], times[1:], xs[:-1], xs[1:]):
+            slope = (x1 - x0) / (t1 - t0)
+            terms.append(f"gte(t,{t0:.3f})*lt(t,{t1:.3f})*({x0:.1f}+(t-{t0:.3f})*({slope:.4f}))")
+        terms.append(f"gte(t,{times[-1]:.3f})*{xs[-1]:.1f}")
+        return '+'.join(terms)
+
+
+def crop_size(width, height):
+    """Full-height 9:16 window (even dimensions) for a source, or None if it is already narrow."""
+    crop_width = int(height * TARGET_ASPECT) // 2 * 2
+    if crop_width >= width * MIN_CROP_GAIN:
+        return None
+    return crop_width, height // 2 * 2
+
+
+def _face_detector():
+    global _detector
+    if _detector is None:
+        _detector = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        if _detector.empty():
+            logging.warning("Face cascade not available; reframing uses saliency only")
+    return _detector
+
+
+def _saliency_center(frame, window_share):
+    """Horizontal center (0-1) of the window that holds most spectral-residual saliency."""
+    height = max(8, int(SALIENCY_WIDTH * frame.shape[0] / frame.shape[1]))
+    small = cv2.resize(frame, (SALIENCY_WIDTH, height), interpolation=cv2.INTER_AREA).astype(np.float32)
+    spectrum = np.fft.fft2(small)
+    log_amplitude = np.log(np.abs(spectrum) + 1e-6)
+    residual = log_amplitude - cv2.blur(log_amplitude, (3, 3))
+    saliency = np.abs(np.fft.ifft2(np.exp(residual + 1j * np.angle(spectrum)))) ** 2
+    columns = cv2.GaussianBlur(saliency.astype(np.float32), (9, 9), 2.5).sum(axis=0)
+    if not columns.any():
+        return None
+    window = max(1, int(round(window_share * SALIENCY_WIDTH)))
+    sums = np.convolve(columns, np.ones(window), mode='valid')
+    return (int(np.argmax(sums)) + window / 2) / SALIENCY_WIDTH
+
+
+def subject_center(frame, window_share):
+    """
+    Horizontal position (0-1) of the subject in a gray frame, or None if nothing stands out.
+
+    Faces win over saliency; several faces are averaged by area so the
+    window favours the largest.
+    """
+    detector = _face_detector()
+    if not detector.empty():
+        faces = detector.detectMultiScale(frame, scaleFactor=1.15, minNeighbors=5, minSize=(16, 16))
+        if len(faces):
+            faces = np.asarray(faces, dtype=np.float64)
+            areas = faces[:, 2] * faces[:, 3]
+            centers = faces[:, 0] + faces[:, 2] / 2
+            return float(np.sum(centers * areas) / np.sum(areas)) / frame.shape[1]
+    return _saliency_center(frame, window_share)
+
+
+def _sample_frames(video_path, ranges, sample_width, sample_height):
+    """Yield (output time, gray frame) at SAMPLE_FPS over the ranges, back to back on the output timeline."""
+    frame_bytes = sample_width * sample_height
+    offset = 0.0
+    for start, end in ranges:
+        command = [
+            'ffmpeg', '-loglevel', 'error', '-ss', f"{start:.3f}", '-t', f"{end - start:.3f}", '-i', video_path,
+            '-an', '-vf', f'fps={SAMPLE_FPS},scale={sample_width}:{sample_height},format=gray',
+            '-f', 'rawvideo', 'pipe:1',
+        ]
+        for index, data in enumerate(ffmpeg_runner.iter_chunks(command, frame_bytes, label='ffmpeg reframe sampling')):
+            if len(data) < frame_bytes:
+                continue
+            yield offset + index / SAMPLE_FPS, np.frombuffer(data, dtype=np.uint8).reshape(sample_height, sample_width)
+        offset += end - start
+
+
+def smooth_positions(positions, fps=SAMPLE_FPS):
+    """
+    Turn raw per-sample positions (NaN where nothing was found) into a steady path.
+
+    Gaps hold the nearest known position (the center if there is none), a
+    median filter drops one-off detections, and a moving average spreads
+    every move over SMOOTH_SECONDS.
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    known = ~np.isnan(positions)
+    if not known.any():
+        return np.full(len(positions), 0.5)
+    indexes = np.arange(len(positions))
+    filled = np.interp(indexes, indexes[known], positions[known])
+
+    half = MEDIAN_SAMPLES // 2
+    padded = np.pad(filled, half, mode='edge')
+    windows = np.lib.stride_tricks.sliding_window_view(padded, MEDIAN_SAMPLES)
+    filtered = np.median(windows, axis=1)
+
+    span = max(1, int(SMOOTH_SECONDS * fps)) | 1
+    padded = np.pad(filtered, span // 2, mode='edge')
+    return np.convolve(padded, np.ones(span) / span, mode='valid')
+
+
+def simplify_path(times, xs, tolerance):
+    """Keep only the keyframes needed to stay within `tolerance` of the path (Ramer-Douglas-Peucker)."""
+    keep = np.zeros(len(times), dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, len(times) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        inner = np.arange(first + 1, last)
+        line = np.interp(times[inner], [times[first], times[last]], [xs[first], xs[last]])
+        errors = np.abs(xs[inner] - line)
+        worst = int(np.argmax(errors))
+        if errors[worst] > tolerance:
+            split = inner[worst]
+            keep[split] = True
+            stack.extend([(first, split), (split, last)])
+    return times[keep], xs[keep]
+
+
+def compute_crop_path(video_path, ranges, source_size=None):
+    """
+    Find a subject-following 9:16 crop for the parts of a source that make up the short.
+
+    Args:
+        video_path (str): Source video
+        ranges (list): (start, end) source ranges, concatenated in order in the short
+        source_size (tuple): (width, height) of the source, probed when omitted
+
+    Returns:
+        CropPath: Window path on the short's timeline, or None if the source is already
+            narrow enough (keep the static crop)
+    """
+    width, height = source_size or ffmpeg_render.probe_video(video_path)[:2]
+    size = crop_size(width, height)
+    if size is None:
+        return None
+    crop_width, crop_height = size
+    window_share = crop_width / width
+
+    sample_width = min(SAMPLE_WIDTH, width) // 2 * 2
+    sample_height = max(2, int(round(sample_width * height / width / 2)) * 2)
+    times = []
+    positions = []
+    for t, frame in _sample_frames(video_path, ranges, sample_width, sample_height):
+        center = subject_center(frame, window_share)
+        times.append(t)
+        positions.append(np.nan if center is None else center)
+    if not times:
+        return None
+
+    centers = smooth_positions(positions) * width
+    xs = np.clip(centers - crop_width / 2, 0, width - crop_width)
+    times, xs = simplify_path(np.asarray(times), xs, KEYFRAME_TOLERANCE * width)
+    logging.info(f"Reframing path: {len(positions)} samples, {len(times)} keyframes, "
+                 f"{crop_width}x{crop_height} window of {width}x{height}")
+    return CropPath(times, xs, crop_width, crop_height)
@@ -0,0 +1,127 @@
+"""
+Index of finished renders keyed by source identity and render parameters.
+
+When a job asks for a short that was already produced (same source video,
+duration, captions, format and backend), the existing file is returned
+instead of re-encoding. The index is a bounded JSON file shared by worker
+processes; evicting an entry only forgets it, the user's output file is
+never deleted.
+"""
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+
+from source_cache import atomic_write_json, file_lock
+
+INDEX_PATH = os.getenv('RENDER_CACHE_INDEX', os.path.join('cache', 'renders.json'))
+MAX_ENTRIES = int(os.getenv('RENDER_CACHE_MAX_ENTRIES', 500))
+
+
+def make_render_key(source, **params):
+    """
+    Build a deterministic render key.
+
+    Args:
+        source (str): Source identity, e.g. 'youtube:<video id>' or 'upload:<sha256>'
+        **params: Render parameters (duration, captions, format_type, ...)
+
+    Returns:
+        str: Hex digest identifying the render
+    """
+    payload = json.dumps({'source': source, 'params': params}, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class RenderCache:
+    """
+    Bounded LRU index of rendered outputs.
+
+    Args:
+        index_path (str): JSON file holding the index
+        max_entries (int): Number of renders remembered before the oldest are forgotten
+    """
+
+    def __init__(self, index_path=INDEX_PATH, max_entries=MAX_ENTRIES):
+        self.index_path = index_path
+        self.max_entries = max_entries
+        directory = os.path.dirname(index_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock_path = index_path + '.lock'
+
+    @contextlib.contextmanager
+    def _index(self):
+        with file_lock(self._lock_path, stale_after=60):
+            try:
+                with open(self.index_path) as f:
+                    index = json.load(f)
+            except (OSError, ValueError):
+                index = {}
+            yield index
+            atomic_write_json(self.index_path, index)
+
+    def lookup(self, render_key):
+        """Return the path of a finished render that still exists on disk, or None."""
+        with self._index() as index:
+            entry = index.get(render_key)
+            if entry is None:
+                return None
+            path = entry['path']
+            try:
+                if os.path.getsize(path) != entry['size']:
+                    raise OSError("size changed")
+            except OSError:
+                # The file was moved, deleted or overwritten since it was rendered
+                del index[render_key]
+                return None
+            entry['last_used'] = time.time()
+            return path
+
+    def register(self, render_key, path):
+        """Remember a finished render, forgetting the least recently used ones beyond max_entries."""
+        with self._index() as index:
+            index[render_key] = {
+                'path': os.path.abspath(path),
+                'size': os.path.getsize(path),
+                'created': time.time(),
+                'last_used': time.time(),
+            }
+            if len(index) > self.max_entries:
+                for key in sorted(index, key=lambda k: index[k]['last_used'])[:len(index) - self.max_entries]:
+                    del index[key]
+
+
+def place_artifact(path, output_dir):
+    """
+    Make a cached render available in output_dir.
+
+    Returns the cached file itself when it already lives there, otherwise a
+    hard link (or copy, across filesystems) with the same file name.
+    """
+    if os.path.abspath(os.path.dirname(path)) == os.path.abspath(output_dir):
+        return path
+
+    target = os.path.join(output_dir, os.path.basename(path))
+    if os.path.exists(target) and os.path.getsize(target) == os.path.getsize(path):
+        return target
+    try:
+        os.link(path, target)
+    except OSError:
+        shutil.copy2(path, target)
+    logging.info(f"Placed cached render {path} at {target}")
+    return target
+
+
+_cache = None
+
+
+def get_render_cache():
+    """Return the process-wide render cache configured from the environment."""
+    global _cache
+    if _cache is None:
+        _cache = RenderCache()
+    return _cache
@@ -0,0 +1,154 @@
+"""
+Local scene detection with PySceneDetect's ContentDetector, sharded across processes.
+
+The source is split into time shards that are analyzed in parallel. Each
+shard has ffmpeg decode a downscaled, frame-skipped stream (as reframing
+does), so full-resolution frames never reach Python, and starts slightly
+before its nominal start so the detector has context at the boundary; cuts
+falling in that overlap belong to the previous shard and are dropped when
+the shard results are stitched together. A job gets its share of the CPUs
+(SCENE_WORKERS), since up to MAX_WORKERS jobs run at once.
+"""
+import concurrent.futures
+import json
+import logging
+import math
+import os
+
+import numpy as np
+from scenedetect.detectors import ContentDetector
+
+import ffmpeg_runner
+
+# Bump when the analyzer output changes, so stored features are recomputed
+ANALYZER_VERSION = 2
+
+DEFAULT_THRESHOLD = 30.0
+# Frames are shrunk by this factor before comparison
+DEFAULT_DOWNSCALE = 4
+# Frames skipped between analyzed frames (1 = every other frame)
+DEFAULT_FRAME_SKIP = 1
+# Length of each parallel shard
+SHARD_SECONDS = 120
+# Context decoded before each shard's start
+SHARD_OVERLAP = 2.0
+# Shard processes per job: the CPUs left to each of the app's concurrent jobs
+_JOB_WORKERS = max(1, int(os.getenv('MAX_WORKERS', max(1, (os.cpu_count() or 2) // 2))))
+SCENE_WORKERS = int(os.getenv('SCENE_WORKERS', max(1, (os.cpu_count() or 1) // _JOB_WORKERS)))
+
+
+def probe_stream(video_path):
+    """
+    Read the first video stream's dimensions and frame rate and the container duration with ffprobe.
+
+    Returns:
+        tuple: (width, height, frame rate, duration)
+    """
+    command = [
+        'ffprobe', '-v', 'error', '-select_streams', 'v:0',
+        '-show_entries', 'stream=width,height,r_frame_rate:format=duration',
+        '-of', 'json', video_path,
+    ]
+    info = json.loads(ffmpeg_runner.capture(command))
+    stream = info['streams'][0]
+    numerator, _, denominator = stream['r_frame_rate'].partition('/')
+    frame_rate = float(numerator) / float(denominator or 1)
+    return int(stream['width']), int(stream['height']), frame_rate, float(info['format'].get('duration', 0))
+
+
+def _detect_shard(video_path, start, end, threshold, frame_skip, frame_rate, size):
+    """
+    Detect cuts in [start, end) of a video.
+
+    Args:
+        frame_rate (float): Source frame rate, for turning frame numbers into times
+        size (tuple): (width, height) ffmpeg scales the analyzed frames to
+
+    Returns:
+        list: Cut times in seconds (absolute), only those at or after `start`
+    """
+    width, height = size
+    frame_bytes = width * height * 3
+    context_start = max(0.0, start - SHARD_OVERLAP)
+    command = [
+        'ffmpeg', '-loglevel', 'error', '-ss', f"{context_start:.3f}", '-t', f"{end - context_start:.3f}",
+        '-i', video_path, '-an', '-vf', f'framestep={frame_skip + 1},scale={width}:{height}',
+        '-pix_fmt', 'bgr24', '-f', 'rawvideo', 'pipe:1',
+    ]
+    detector = ContentDetector(threshold=threshold)
+    # Frame numbers on the source's timeline (the first frame at or after the seek), so
+    # min_scene_len keeps its meaning
+    first_frame = math.ceil(round(context_start, 3) * frame_rate - 1e-6)
+    frame_num = first_frame
+    cut_frames = []
+    for index, data in enumerate(ffmpeg_runner.iter_chunks(command, frame_bytes, label='ffmpeg scene decode')):
+        if len(data) < frame_bytes:
+            continue
+        frame_num = first_frame + index * (frame_skip + 1)
+        frame = np.frombuffer(data, dtype=np.uint8).reshape(height, width, 3)
+        cut_frames.extend(detector.process_frame(frame_num, frame))
+    cut_frames.extend(detector.post_process(frame_num))
+
+    return [frame / frame_rate for frame in cut_frames if frame / frame_rate >= start]
+
+
+def _plan_shards(duration, shard_seconds):
+    shards = []
+    start = 0.0
+    while start < duration:
+        end = min(duration, start + shard_seconds)
+        shards.append((start, end))
+        start = end
+    return shards
+
+
+def stitch_cuts(cut_lists, min_gap):
+    """Merge per-shard cut lists, dropping duplicates closer than min_gap seconds."""
+    cuts = []
+    for cut in sorted(cut for cut_list in cut_lists for cut in cut_list):
+        if not cuts or cut - cuts[-1] >= min_gap:
+            cuts.append(cut)
+    return cuts
+
+
+def cuts_to_scenes(cuts, duration):
+    """Turn cut times into (start, end) scene boundaries covering [0, duration]."""
+    boundaries = [0.0] + [cut for cut in cuts if 0.0 < cut < duration] + [duration]
+    return [(boundaries[i], boundaries[i + 1]) for i in range(len(boundaries) - 1)
+            if boundaries[i + 1] > boundaries[i]]
+
+
+def find_scenes(video_path, threshold=DEFAULT_THRESHOLD, downscale=DEFAULT_DOWNSCALE,
+                frame_skip=DEFAULT_FRAME_SKIP, workers=None, shard_seconds=SHARD_SECONDS):
+    """
+    Find scene boundaries in a video using local processing (PySceneDetect).
+
+    Args:
+        video_path (str): Path to the video
+        threshold (float): ContentDetector threshold
+        downscale (int): Factor frames are shrunk by before analysis
+        frame_skip (int): Frames skipped between analyzed frames
+        workers (int): Processes to use (default: SCENE_WORKERS)
+        shard_seconds (float): Length of each parallel shard
+
+    Returns:
+        list: (start_time, end_time) tuples in seconds
+    """
+    width, height, frame_rate, duration = probe_stream(video_path)
+    size = (max(2, width // downscale // 2 * 2), max(2, height // downscale // 2 * 2))
+
+    shards = _plan_shards(duration, shard_seconds)
+    workers = max(1, min(workers or SCENE_WORKERS, len(shards)))
+    logging.info(f"Detecting scenes in {duration:.0f}s of video with {len(shards)} shards on {workers} workers")
+
+    args = [(video_path, start, end, threshold, frame_skip, frame_rate, size) for start, end in shards]
+    if workers <= 1:
+        cut_lists = [_detect_shard(*shard_args) for shard_args in args]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            cut_lists = list(executor.map(_detect_shard, *zip(*args)))
+
+    # Cuts closer than the analyzed frame interval are the same cut seen by two shards
+    min_gap = (frame_skip + 1) / frame_rate
+    cuts = stitch_cuts(cut_lists, min_gap)
+    return cuts_to_scenes(cuts, duration)
@@ -0,0 +1,324 @@
+"""
+Content-addressed disk cache of downloaded and merged YouTube sources.
+
+Entries are keyed by video id, the video/audio stream itags and how many
+seconds of the source they cover (partial downloads only hold the start of
+the video), so a partial and a full download never share a file. The cache
+is shared by all worker processes:
+
+- the index is a JSON file updated under a lock file and replaced atomically
+- media files are written to a temporary name and moved into place
+- one lock file per video id coalesces concurrent downloads of the same
+  video, so other jobs wait for the first download instead of repeating it
+- the total size is bounded with least-recently-used eviction; entries
+  checked out by a running job are pinned and never evicted
+"""
+import contextlib
+import json
+import logging
+import math
+import os
+import threading
+import time
+import uuid
+
+import cancellation
+from workspace import pid_alive
+
+CACHE_DIR = os.getenv('SOURCE_CACHE_DIR', os.path.join('cache', 'sources'))
+CACHE_MAX_BYTES = int(os.getenv('SOURCE_CACHE_MAX_BYTES', 10 * 1024 ** 3))
+
+INDEX_FILE = 'index.json'
+# Entries used this recently are never evicted, since a job may be about to read them
+EVICTION_GRACE = 10 * 60
+# Locks and pins older than this are assumed abandoned even if the owner can't be checked
+LOCK_STALE_AFTER = 2 * 3600
+LOCK_POLL_INTERVAL = 0.25
+
+COUNTERS = ('hits', 'misses', 'evictions', 'coalesced')
+
+
+class LockTimeout(Exception):
+    """Raised when a cache lock can't be acquired in time."""
+
+
+def _lock_is_stale(lock_path, stale_after):
+    try:
+        age = time.time() - os.path.getmtime(lock_path)
+        with open(lock_path) as f:
+            pid = int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return False
+    return age > stale_after or pid_alive(pid) is False
+
+
+def _try_lock(lock_path, stale_after=LOCK_STALE_AFTER):
+    """Try to create a lock file once; returns True if this process now holds it."""
+    try:
+        fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        if _lock_is_stale(lock_path, stale_after):
+            logging.warning(f"Removing stale cache lock {lock_path}")
+            with contextlib.suppress(OSError):
+                os.remove(lock_path)
+        return False
+    with os.fdopen(fd, 'w') as f:
+        f.write(str(os.getpid()))
+    return True
+
+
+def _release_lock(lock_path):
+    with contextlib.suppress(OSError):
+        os.remove(lock_path)
+
+
+@contextlib.contextmanager
+def file_lock(lock_path, timeout=30, stale_after=LOCK_STALE_AFTER):
+    """Inter-process mutex based on exclusive creation of a lock file."""
+    deadline = time.time() + timeout
+    while not _try_lock(lock_path, stale_after):
+        if time.time() > deadline:
+            raise LockTimeout(f"Timed out waiting for {lock_path}")
+        time.sleep(LOCK_POLL_INTERVAL / 5)
+    try:
+        yield
+    finally:
+        _release_lock(lock_path)
+
+
+def atomic_write_json(path, data):
+    """Write JSON to a temporary file and move it over `path` in one step."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+class SourceCache:
+    """
+    Size-bounded LRU cache of merged source videos.
+
+    Args:
+        cache_dir (str): Directory holding media files and the index
+        max_bytes (int): Total size above which least-recently-used entries are evicted
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        self._index_path = os.path.join(cache_dir, INDEX_FILE)
+        self._index_lock_path = self._index_path + '.lock'
+
+    # Index helpers (call with the index lock held)
+
+    def _load_index(self):
+        try:
+            with open(self._index_path) as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        index.setdefault('entries', {})
+        index.setdefault('counters', {})
+        for name in COUNTERS:
+            index['counters'].setdefault(name, 0)
+        return index
+
+    def _save_index(self, index):
+        atomic_write_json(self._index_path, index)
+
+    @contextlib.contextmanager
+    def _index(self):
+        with file_lock(self._index_lock_path, stale_after=60):
+            index = self._load_index()
+            yield index
+            self._save_index(index)
+
+    def _find(self, index, video_id, duration):
+        """Most recently used entry for video_id covering at least `duration` seconds."""
+        best_key = None
+        for key, entry in index['entries'].items():
+            if entry['video_id'] != video_id:
+                continue
+            covered = entry.get('covered')
+            if covered is not None and duration is not None and covered < duration:
+                continue
+            if covered is not None and duration is None:
+                continue
+            if not os.path.exists(os.path.join(self.cache_dir, entry['file'])):
+                continue
+            if best_key is None or entry['last_used'] > index['entries'][best_key]['last_used']:
+                best_key = key
+        return best_key
+
+    def _use(self, index, key, pin):
+        """Mark an entry used, pinning it for this process if asked; returns (path, key, pin token)."""
+        entry = index['entries'][key]
+        entry['last_used'] = time.time()
+        token = None
+        if pin:
+            token = uuid.uuid4().hex
+            entry.setdefault('pins', {})[token] = {'pid': os.getpid(), 'since': time.time()}
+        return os.path.join(self.cache_dir, entry['file']), key, token
+
+    def _pinned(self, entry):
+        """True if a live job still has the entry checked out; pins of dead processes are dropped."""
+        pins = entry.get('pins') or {}
+        for token, pin in list(pins.items()):
+            if time.time() - pin['since'] > LOCK_STALE_AFTER or pid_alive(pin['pid']) is False:
+                del pins[token]
+        return bool(pins)
+
+    def _evict(self, index, keep=None):
+        """Drop least-recently-used entries until the cache fits in max_bytes."""
+        entries = index['entries']
+        total = sum(entry['size'] for entry in entries.values())
+        now = time.time()
+        for key in sorted(entries, key=lambda k: entries[k]['last_used']):
+            if total <= self.max_bytes:
+                break
+            entry = entries[key]
+            if key == keep or now - entry['last_used'] < EVICTION_GRACE or self._pinned(entry):
+                continue
+            with contextlib.suppress(OSError):
+                os.remove(os.path.join(self.cache_dir, entry['file']))
+            total -= entry['size']
+            del entries[key]
+            index['counters']['evictions'] += 1
+            logging.info(f"Evicted cached source {key} ({entry['size'] / 1024 ** 2:.1f}MB)")
+
+    # Public API
+
+    def lookup(self, video_id, duration=None):
+        """
+        Return the cached source path for a video, or None.
+
+        Args:
+            video_id (str): YouTube video id
+            duration (float): Seconds that must be covered from the start (None = full video)
+        """
+        with self._index() as index:
+            key = self._find(index, video_id, duration)
+            if key is None:
+                return None
+            index['counters']['hits'] += 1
+            return self._use(index, key, pin=False)[0]
+
+    def fetch(self, video_id, producer, duration=None, wait_timeout=3600):
+        """
+        Return a cached source, producing it if needed.
+
+        Concurrent calls for the same video id (from any process) wait for the
+        first producer instead of downloading again. The entry isn't pinned, so
+        use checkout() while a job reads the file.
+
+        Args:
+            video_id (str): YouTube video id
+            producer (function): producer(tmp_path) writes the merged source to
+                tmp_path and returns (stream_key, covered) where stream_key
+                identifies the streams (e.g. "137-140") and covered is the number
+                of seconds in the file (None for the full video)
+            duration (float): Seconds that must be covered (None = full video)
+            wait_timeout (int): Seconds to wait for another process's download
+
+        Returns:
+            str: Path to the cached source
+        """
+        return self._fetch(video_id, producer, duration, wait_timeout, pin=False)[0]
+
+    @contextlib.contextmanager
+    def checkout(self, video_id, producer, duration=None, wait_timeout=3600):
+        """
+        Like fetch(), but the entry is pinned against eviction until the block exits.
+
+        Yields:
+            str: Path to the cached source
+        """
+        path, key, token = self._fetch(video_id, producer, duration, wait_timeout, pin=True)
+        try:
+            yield path
+        finally:
+            with self._index() as index:
+                entry = index['entries'].get(key)
+                if entry:
+                    entry.get('pins', {}).pop(token, None)
+
+    def _fetch(self, video_id, producer, duration, wait_timeout, pin):
+        """fetch() returning (path, entry key, pin token)."""
+        lock_path = os.path.join(self.cache_dir, f"{video_id}.download.lock")
+        deadline = time.time() + wait_timeout
+        waited = False
+
+        while True:
+            with self._index() as index:
+                key = self._find(index, video_id, duration)
+                if key is not None:
+                    index['counters']['hits'] += 1
+                    if waited:
+                        index['counters']['coalesced'] += 1
+                    return self._use(index, key, pin)
+            if _try_lock(lock_path):
+                break
+            if time.time() > deadline:
+                raise LockTimeout(f"Timed out waiting for download of {video_id}")
+            if not waited:
+                logging.info(f"Waiting for in-flight download of {video_id}")
+                waited = True
+            cancellation.check()
+            time.sleep(LOCK_POLL_INTERVAL)
+
+        try:
+            # Another process may have finished between our lookup and taking the lock
+            with self._index() as index:
+                key = self._find(index, video_id, duration)
+                if key is not None:
+                    index['counters']['hits'] += 1
+                    return self._use(index, key, pin)
+                index['counters']['misses'] += 1
+
+            tmp_path = os.path.join(self.cache_dir, f"{video_id}.{os.getpid()}.{threading.get_ident()}.tmp.mp4")
+            try:
+                stream_key, covered = producer(tmp_path)
+                # Coverage is part of the name, so a longer download never replaces a file in use
+                key = f"{video_id}-{stream_key}-{'full' if covered is None else f'{math.ceil(covered)}s'}"
+                filename = f"{key}.mp4"
+                os.replace(tmp_path, os.path.join(self.cache_dir, filename))
+            finally:
+                with contextlib.suppress(OSError):
+                    os.remove(tmp_path)
+
+            with self._index() as index:
+                index['entries'][key] = {
+                    'video_id': video_id,
+                    'file': filename,
+                    'size': os.path.getsize(os.path.join(self.cache_dir, filename)),
+                    'covered': covered,
+                    'created': time.time(),
+                    'last_used': time.time(),
+                }
+                self._evict(index, keep=key)
+                return self._use(index, key, pin)
+        finally:
+            _release_lock(lock_path)
+
+    def stats(self):
+        """Return hit/miss/eviction counters and current size."""
+        with self._index() as index:
+            entries = index['entries']
+            return dict(
+                index['counters'],
+                entries=len(entries),
+                size_bytes=sum(entry['size'] for entry in entries.values()),
+                max_bytes=self.max_bytes,
+            )
+
+
+_cache = None
+
+
+def get_cache():
+    """Return the process-wide source cache configured from the environment."""
+    global _cache
+    if _cache is None:
+        _cache = SourceCache()
+    return _cache
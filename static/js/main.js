@@ -40,6 +40,8 @@ document.addEventListener('DOMContentLoaded', function() {
         try {
             // Prepare form data
             const formData = new FormData(videoForm);
+            const reframe = document.getElementById('reframe');
+            if (reframe) formData.set('reframe', reframe.checked ? 'true' : 'false');
             
             // Start progress animation for visual feedback during initial request
             let progress = 0;
@@ -49,6 +51,14 @@ document.addEventListener('DOMContentLoaded', function() {
                     updateProgress(progress, "Preparing...");
                 }
             }, 500);
+            
+            // Send files in checksummed chunks; processing starts while the rest uploads
+            if (file && !url && ChunkedUploader.supported()) {
+                const upload = await ChunkedUploader.start(file);
+                formData.delete('videoFile');
+                formData.append('upload_id', upload.uploadId);
+                upload.finished.catch(error => console.warn('Upload stopped:', error.message));
+            }
 
             // Submit the form data
             const response = await fetch('/process', {
@@ -78,13 +88,20 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     });
 
-    // Poll task status
+    // Follow task status: pushed over Server-Sent Events, polling /status as a fallback
     function pollTaskStatus(taskId) {
-        const statusInterval = setInterval(async () => {
+        let statusInterval = null;
+        let source = null;
+        let finished = false;
+        
+        function stop() {
+            finished = true;
+            if (source) source.close();
+            if (statusInterval) clearInterval(statusInterval);
+        }
+        
+        function handleStatus(data) {
             try {
-                const response = await fetch(`/status/${taskId}`);
-                const data = await response.json();
-                
                 if (!data.success) {
                     throw new Error(data.error || 'Failed to check status');
                 }
@@ -97,7 +114,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 
                 // Handle completion or failure
                 if (data.status === 'completed') {
-                    clearInterval(statusInterval);
+                    stop();
                     
                     // Update UI with processed video
                     outputVideo.src = data.download_url;
@@ -105,17 +122,42 @@ document.addEventListener('DOMContentLoaded', function() {
                     shareBtn.onclick = () => shareVideo(window.location.origin + data.download_url);
                     
                     completeProcessing();
-                } else if (data.status === 'failed') {
-                    clearInterval(statusInterval);
+                } else if (data.status === 'failed' || data.status === 'cancelled') {
+                    stop();
                     throw new Error(data.error || 'Processing failed');
                 }
                 
             } catch (error) {
-                clearInterval(statusInterval);
+                stop();
                 showError(error.message || 'An error occurred');
                 resetUI();
             }
-        }, 1000); // Check every second
+        }
+        
+        function startPolling() {
+            // Unchanged polls are answered with 304 and served from the browser cache
+            statusInterval = setInterval(async () => {
+                try {
+                    const response = await fetch(`/status/${taskId}`);
+                    handleStatus(await response.json());
+                } catch (error) {
+                    handleStatus({ success: false, error: error.message });
+                }
+            }, 1000); // Check every second
+        }
+        
+        if (!window.EventSource) {
+            startPolling();
+            return;
+        }
+        source = new EventSource(`/events/${taskId}`);
+        source.onmessage = (event) => handleStatus(JSON.parse(event.data));
+        source.addEventListener('gone', (event) => handleStatus(JSON.parse(event.data)));
+        source.onerror = () => {
+            // The stream closes once the task finishes; otherwise fall back to polling
+            source.close();
+            if (!finished && !statusInterval) startPolling();
+        };
     }
 
     function updateProgress(progress, message = null) {
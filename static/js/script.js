@@ -24,6 +24,7 @@ document.addEventListener('DOMContentLoaded', function() {
     
     let currentTaskId = null;
     let statusCheckInterval = null;
+    let statusSource = null;
     let startTime = null;
     let lastProgress = 0;
     let progressHistory = [];
@@ -156,7 +157,35 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
     
-    // Check task status
+    // Follow task status: pushed over Server-Sent Events, polling /status as a fallback
+    function startStatusUpdates() {
+        if (!window.EventSource) {
+            statusCheckInterval = setInterval(checkStatus, 1000);
+            return;
+        }
+        const source = new EventSource(`/events/${currentTaskId}`);
+        statusSource = source;
+        source.onmessage = event => handleStatus(JSON.parse(event.data));
+        source.addEventListener('gone', event => handleStatus(JSON.parse(event.data)));
+        source.onerror = () => {
+            // The stream closes once the task finishes; otherwise fall back to polling
+            source.close();
+            if (statusSource === source) {
+                statusSource = null;
+                statusCheckInterval = setInterval(checkStatus, 1000);
+            }
+        };
+    }
+    
+    function stopStatusUpdates() {
+        if (statusSource) {
+            statusSource.close();
+            statusSource = null;
+        }
+        clearInterval(statusCheckInterval);
+    }
+    
+    // Check task status (unchanged polls are answered with 304 from the browser cache)
     function checkStatus() {
         if (!currentTaskId) return;
         
@@ -167,75 +196,10 @@ document.addEventListener('DOMContentLoaded', function() {
                 }
                 return response.json();
             })
-            .then(data => {
-                console.log('Status response:', data);
-                
-                if (!data.success) {
-                    clearInterval(statusCheckInterval);
-                    showError(data.error || 'Failed to check status');
-                    return;
-                }
-                
-                // Update progress bar
-                const progress = data.progress || 0;
-                downloadProgress.style.width = `${progress}%`;
-                processProgress.style.width = `${progress}%`;
-                percentageText.textContent = `${progress}%`;
-                
-                // Update status based on task state
-                const status = data.status;
-                let statusMessage = capitalizeFirstLetter(status);
-                
-                // Add stage information if available
-                if (data.current_stage) {
-                    statusMessage += `: ${data.current_stage}`;
-                }
-                statusText.textContent = statusMessage;
-                
-                // Update estimated time if progress changed
-                if (progress > lastProgress) {
-                    const estimatedTime = calculateEstimatedTime(progress);
-                    estimatedTimeEl.textContent = estimatedTime;
-                    lastProgress = progress;
-                }
-                
-                if (status === 'completed') {
-                    clearInterval(statusCheckInterval);
-                    
-                    // Show download section
-                    downloadSection.style.display = 'block';
-                    estimatedTimeEl.textContent = 'Complete!';
-                    
-                    // Set download link and file path
-                    if (data.file_path) {
-                        fileLocation.style.display = 'block';
-                        filePath.textContent = data.file_path;
-                        
-                        // Set download link if a download URL is provided
-                        if (data.download_url) {
-                            downloadLink.href = data.download_url;
-                        }
-                    }
-                    
-                    // Reset form
-                    submitBtn.disabled = false;
-                    submitBtn.textContent = 'Create Short';
-                    
-                    showToast('Video processing complete!', 'success');
-                } 
-                else if (status === 'failed') {
-                    clearInterval(statusCheckInterval);
-                    showError(data.error || 'Processing failed');
-                    estimatedTimeEl.textContent = 'Failed';
-                    
-                    // Reset form
-                    submitBtn.disabled = false;
-                    submitBtn.textContent = 'Create Short';
-                }
-            })
+            .then(handleStatus)
             .catch(error => {
                 console.error('Status check error:', error);
-                clearInterval(statusCheckInterval);
+                stopStatusUpdates();
                 showError('Failed to check status: ' + error.message);
                 
                 // Reset form
@@ -244,6 +208,74 @@ document.addEventListener('DOMContentLoaded', function() {
             });
     }
     
+    // Apply a status update to the progress UI
+    function handleStatus(data) {
+        console.log('Status response:', data);
+        
+        if (!data.success) {
+            stopStatusUpdates();
+            showError(data.error || 'Failed to check status');
+            return;
+        }
+        
+        // Update progress bar
+        const progress = data.progress || 0;
+        downloadProgress.style.width = `${progress}%`;
+        processProgress.style.width = `${progress}%`;
+        percentageText.textContent = `${progress}%`;
+        
+        // Update status based on task state
+        const status = data.status;
+        let statusMessage = capitalizeFirstLetter(status);
+        
+        // Add stage information if available
+        if (data.current_stage) {
+            statusMessage += `: ${data.current_stage}`;
+        }
+        statusText.textContent = statusMessage;
+        
+        // Update estimated time if progress changed
+        if (progress > lastProgress) {
+            const estimatedTime = calculateEstimatedTime(progress);
+            estimatedTimeEl.textContent = estimatedTime;
+            lastProgress = progress;
+        }
+        
+        if (status === 'completed') {
+            stopStatusUpdates();
+        
+            // Show download section
+            downloadSection.style.display = 'block';
+            estimatedTimeEl.textContent = 'Complete!';
+        
+            // Set download link and file path
+            if (data.file_path) {
+                fileLocation.style.display = 'block';
+                filePath.textContent = data.file_path;
+        
+                // Set download link if a download URL is provided
+                if (data.download_url) {
+                    downloadLink.href = data.download_url;
+                }
+            }
+        
+            // Reset form
+            submitBtn.disabled = false;
+            submitBtn.textContent = 'Create Short';
+        
+            showToast('Video processing complete!', 'success');
+        } 
+        else if (status === 'failed' || status === 'cancelled') {
+            stopStatusUpdates();
+            showError(data.error || 'Processing failed');
+            estimatedTimeEl.textContent = status === 'cancelled' ? 'Cancelled' : 'Failed';
+        
+            // Reset form
+            submitBtn.disabled = false;
+            submitBtn.textContent = 'Create Short';
+        }
+    }
+    
     // Show error message
     function showError(message) {
         errorSection.style.display = 'block';
@@ -328,8 +360,8 @@ document.addEventListener('DOMContentLoaded', function() {
             console.log('Response data:', data);
             if (data.success) {
                 currentTaskId = data.task_id;
-                // Start checking status
-                statusCheckInterval = setInterval(checkStatus, 1000);
+                // Start following status
+                startStatusUpdates();
             } else {
                 showError(data.error || 'Failed to process video');
             }
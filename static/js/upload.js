@@ -0,0 +1,77 @@
+// Resumable chunked uploads: the file is sent in fixed-size chunks, each with
+// its SHA-256, so a failed chunk is simply sent again and processing can
+// start on the server while the rest of the file is still uploading.
+const ChunkedUploader = (() => {
+    const MAX_ATTEMPTS = 3;
+
+    function supported() {
+        return !!(window.fetch && window.crypto && window.crypto.subtle);
+    }
+
+    async function sha256Hex(buffer) {
+        const digest = await crypto.subtle.digest('SHA-256', buffer);
+        return Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join('');
+    }
+
+    async function putChunk(upload, file, index) {
+        const start = index * upload.chunk_size;
+        const buffer = await file.slice(start, start + upload.chunk_size).arrayBuffer();
+        const checksum = await sha256Hex(buffer);
+        let lastError = null;
+        for (let attempt = 1; attempt <= MAX_ATTEMPTS; attempt++) {
+            try {
+                const response = await fetch(`/uploads/${upload.upload_id}/chunks/${index}`, {
+                    method: 'PUT',
+                    headers: { 'Content-Type': 'application/octet-stream', 'X-Chunk-SHA256': checksum },
+                    body: buffer
+                });
+                const data = await response.json();
+                if (response.ok) return data;
+                if (response.status === 404) throw Object.assign(new Error(data.error), { fatal: true });
+                lastError = new Error(data.error || `Chunk ${index} failed`);
+            } catch (error) {
+                if (error.fatal) throw error;
+                lastError = error;
+            }
+        }
+        throw lastError;
+    }
+
+    // Create a session and send the first chunk; the rest continues in the background
+    async function start(file, onProgress) {
+        const response = await fetch('/uploads', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ filename: file.name, size: file.size })
+        });
+        const upload = await response.json();
+        if (!upload.success) {
+            throw new Error(upload.error || 'Could not start upload');
+        }
+
+        let status = await putChunk(upload, file, 0);
+        if (onProgress) onProgress(status.received_bytes / file.size);
+
+        const finished = (async () => {
+            // Re-read the missing chunks after each pass, so interrupted uploads resume
+            for (let pass = 0; pass < MAX_ATTEMPTS && !status.complete; pass++) {
+                for (const index of status.missing_chunks) {
+                    status = await putChunk(upload, file, index);
+                    if (onProgress) onProgress(status.received_bytes / file.size);
+                }
+                if (!status.complete) {
+                    status = await (await fetch(`/uploads/${upload.upload_id}`)).json();
+                }
+            }
+            return status;
+        })().catch(error => {
+            // Drop the session so a job waiting for it fails instead of stalling
+            fetch(`/uploads/${upload.upload_id}`, { method: 'DELETE' });
+            throw error;
+        });
+
+        return { uploadId: upload.upload_id, finished };
+    }
+
+    return { supported, start };
+})();
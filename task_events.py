@@ -0,0 +1,94 @@
+"""
+Change notifications for task records, for Server-Sent Events.
+
+Every applied task update bumps the task's version and wakes only the
+stream handlers following that task. Queue moves (a job queued, started or
+dequeued) change every waiting task's position, so they are one broadcast
+to all handlers. A handler sends an event when its task's version or the
+queue moved, so clients receive changes as they happen instead of polling
+/status.
+"""
+import json
+import threading
+
+# Seconds between keep-alive comments on an idle stream
+KEEPALIVE_INTERVAL = 15
+
+
+class TaskEvents:
+    """Per-task version counters, each with a condition to wait for its next change."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions = {}
+        # Conditions (sharing the lock) of the tasks someone is waiting on, with their waiter counts
+        self._conditions = {}
+        self._queue_moves = 0
+
+    def publish(self, task_id):
+        """Record a change to `task_id` and wake the streams following it."""
+        with self._lock:
+            self._versions[task_id] = self._versions.get(task_id, 0) + 1
+            if task_id in self._conditions:
+                self._conditions[task_id][0].notify_all()
+
+    def publish_queue(self):
+        """Record a queue move (positions and depth changed) and wake every stream."""
+        with self._lock:
+            self._queue_moves += 1
+            for condition, _ in self._conditions.values():
+                condition.notify_all()
+
+    def version(self, task_id):
+        """Number of changes published for `task_id` so far."""
+        with self._lock:
+            return self._versions.get(task_id, 0)
+
+    def marker(self, task_id):
+        """Opaque token of what a stream following `task_id` has seen so far."""
+        with self._lock:
+            return self._versions.get(task_id, 0), self._queue_moves
+
+    def wait(self, task_id, marker, timeout=KEEPALIVE_INTERVAL):
+        """
+        Block until `task_id` changes or the queue moves after `marker`, or until the timeout.
+
+        Returns:
+            tuple: The current marker (unchanged if the wait timed out)
+        """
+        with self._lock:
+            condition, waiters = self._conditions.get(task_id) or (threading.Condition(self._lock), 0)
+            self._conditions[task_id] = (condition, waiters + 1)
+            try:
+                condition.wait_for(
+                    lambda: (self._versions.get(task_id, 0), self._queue_moves) != marker, timeout)
+                return self._versions.get(task_id, 0), self._queue_moves
+            finally:
+                condition, waiters = self._conditions[task_id]
+                if waiters > 1:
+                    self._conditions[task_id] = (condition, waiters - 1)
+                else:
+                    del self._conditions[task_id]
+
+    def forget(self, task_id):
+        """Drop the counter of a task that no longer exists."""
+        with self._lock:
+            self._versions.pop(task_id, None)
+            if task_id in self._conditions:
+                self._conditions[task_id][0].notify_all()
+
+
+def format_event(data, event=None, event_id=None):
+    """Encode `data` as one text/event-stream message."""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return '\n'.join(lines) + '\n\n'
+
+
+def keepalive():
+    """A comment line that keeps proxies from closing an idle stream."""
+    return ': keepalive\n\n'
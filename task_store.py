@@ -0,0 +1,309 @@
+"""
+Durable store of processing tasks backed by SQLite.
+
+Task records behave like the plain dicts the web app used before: reading
+and assigning keys works as usual, but every change is persisted to a
+SQLite database in WAL mode, so tasks survive restarts and are shared
+consistently across threads. Records of tasks that are still running are
+kept in memory; progress-style updates (progress, stage, time estimate) are
+written in batches by a background thread, while status changes are written
+through immediately.
+
+Finished tasks are dropped from memory after a while (they are reloaded on
+demand) and deleted from the database once they are older than the TTL.
+Tasks left queued or running by a previous process are marked failed when
+the job scheduler starts, since their worker is gone.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+DB_PATH = os.getenv('TASK_DB', os.path.join('cache', 'tasks.db'))
+# Seconds finished tasks are kept before compaction deletes them
+TASK_TTL = int(os.getenv('TASK_TTL', 24 * 3600))
+# Seconds between batched writes of progress updates
+FLUSH_INTERVAL = 1.0
+# Seconds between compaction passes
+COMPACT_INTERVAL = 300
+# Seconds a finished task stays in memory after its last change
+MEMORY_TTL = 600
+
+FINISHED_STATUSES = ('completed', 'failed', 'cancelled')
+# Keys written on every change; anything else waits for the next batch
+WRITE_THROUGH_KEYS = {'status', 'file_path', 'preview_path', 'download_url', 'error'}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    output_name TEXT,
+    preview_name TEXT,
+    updated_at REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, updated_at);
+CREATE INDEX IF NOT EXISTS tasks_output_name ON tasks (output_name);
+CREATE INDEX IF NOT EXISTS tasks_preview_name ON tasks (preview_name);
+"""
+
+
+class TaskRecord(dict):
+    """A task dict whose changes are saved by its store."""
+
+    def __init__(self, store, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._store = store
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._store._changed(self, key)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+
+class TaskStore:
+    """
+    Mapping of task id to task record, persisted in SQLite.
+
+    Args:
+        db_path (str): SQLite database file
+        ttl (int): Seconds finished tasks are kept
+        flush_interval (float): Seconds between batched writes
+    """
+
+    def __init__(self, db_path=DB_PATH, ttl=TASK_TTL, flush_interval=FLUSH_INTERVAL):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self._lock = threading.RLock()
+        self._records = {}
+        self._local = {}
+        self._touched = {}
+        self._dirty = {}
+        self._conn = None
+        self._pid = None
+        self._created_at = time.time()
+        # Called with a task id whenever a record is released from memory or deleted
+        self.on_release = None
+
+    def _db(self):
+        # Opened lazily (and again after a fork) so worker processes never share a connection
+        if self._conn is None or self._pid != os.getpid():
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.executescript(_SCHEMA)
+            self._pid = os.getpid()
+            threading.Thread(target=self._maintenance_loop, name='task-store', daemon=True).start()
+        return self._conn
+
+    def recover_interrupted(self):
+        """
+        Mark tasks left queued or running by an earlier process as failed.
+
+        Call once the process that runs jobs starts; tasks created since this
+        store was opened are left alone.
+        """
+        with self._lock:
+            rows = self._db().execute(
+                'SELECT id, data FROM tasks WHERE status NOT IN (?, ?, ?) AND updated_at < ?',
+                FINISHED_STATUSES + (self._created_at,)
+            ).fetchall()
+            for task_id, data in rows:
+                task = json.loads(data)
+                task.update({
+                    'status': 'failed',
+                    'error': 'Processing was interrupted by a server restart',
+                    'current_stage': 'Failed: interrupted',
+                })
+                self._write(task_id, task)
+                self._records.pop(task_id, None)
+        if rows:
+            logging.warning(f"Marked {len(rows)} interrupted task(s) as failed")
+        return len(rows)
+
+    def _write(self, task_id, task):
+        self._conn.execute(
+            'INSERT OR REPLACE INTO tasks (id, status, output_name, preview_name, updated_at, data) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (task_id, task.get('status') or 'queued', _basename(task.get('file_path')),
+             _basename(task.get('preview_path')), time.time(), json.dumps(task, default=str))
+        )
+
+    def _changed(self, record, key):
+        with self._lock:
+            task_id = record.get('id')
+            self._touched[task_id] = time.time()
+            if key in WRITE_THROUGH_KEYS:
+                self._db()
+                self._write(task_id, record)
+                self._dirty.pop(task_id, None)
+            else:
+                self._dirty[task_id] = record
+
+    def flush(self):
+        """Write all batched updates in one transaction."""
+        with self._lock:
+            if not self._dirty:
+                return
+            conn = self._db()
+            conn.execute('BEGIN')
+            try:
+                for task_id, record in self._dirty.items():
+                    self._write(task_id, record)
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            self._dirty.clear()
+
+    def compact(self):
+        """Delete finished tasks older than the TTL and release idle finished records from memory."""
+        now = time.time()
+        with self._lock:
+            self.flush()
+            for task_id, record in list(self._records.items()):
+                if record.get('status') in FINISHED_STATUSES and now - self._touched.get(task_id, 0) > MEMORY_TTL:
+                    del self._records[task_id]
+                    self._touched.pop(task_id, None)
+                    self._released(task_id)
+            deleted = self._db().execute(
+                'DELETE FROM tasks WHERE status IN (?, ?, ?) AND updated_at < ?',
+                FINISHED_STATUSES + (now - self.ttl,)
+            ).rowcount
+        if deleted:
+            logging.info(f"Task store compaction removed {deleted} finished task(s)")
+        return deleted
+
+    def _maintenance_loop(self):
+        last_compaction = time.time()
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+                if time.time() - last_compaction >= COMPACT_INTERVAL:
+                    last_compaction = time.time()
+                    self.compact()
+            except Exception as e:
+                logging.error(f"Task store maintenance failed: {str(e)}")
+
+    def _load(self, task_id):
+        row = self._db().execute('SELECT data FROM tasks WHERE id = ?', (task_id,)).fetchone()
+        if row is None:
+            return None
+        record = TaskRecord(self, json.loads(row[0]))
+        self._records[task_id] = record
+        self._touched[task_id] = time.time()
+        return record
+
+    def add(self, task):
+        """
+        Store a new task (a dict with an 'id' key).
+
+        Returns:
+            TaskRecord: The stored record; later changes to it are persisted
+        """
+        record = TaskRecord(self, task)
+        with self._lock:
+            self._records[task['id']] = record
+            self._touched[task['id']] = time.time()
+            self._db()
+            self._write(task['id'], record)
+        return record
+
+    def attach(self, task_id, record):
+        """
+        Track a record in this process's memory only.
+
+        Used in worker processes, whose task updates reach the web process's
+        store through the job scheduler rather than being written here.
+        """
+        self._local[task_id] = record
+
+    def get(self, task_id, default=None):
+        # Attached records are checked without the lock, which a forked worker may have inherited held
+        record = self._local.get(task_id)
+        if record is not None:
+            return record
+        with self._lock:
+            record = self._records.get(task_id)
+            if record is None:
+                record = self._load(task_id)
+        return default if record is None else record
+
+    def __getitem__(self, task_id):
+        record = self.get(task_id)
+        if record is None:
+            raise KeyError(task_id)
+        return record
+
+    def __setitem__(self, task_id, task):
+        self.add(dict(task, id=task_id))
+
+    def __contains__(self, task_id):
+        return self.get(task_id) is not None
+
+    def pop(self, task_id, default=None):
+        """Forget a task, deleting it from the database unless it was only attached."""
+        if task_id in self._local:
+            return self._local.pop(task_id)
+        with self._lock:
+            record = self.get(task_id)
+            self._records.pop(task_id, None)
+            self._touched.pop(task_id, None)
+            self._dirty.pop(task_id, None)
+            self._db().execute('DELETE FROM tasks WHERE id = ?', (task_id,))
+        self._released(task_id)
+        return default if record is None else record
+
+    def _released(self, task_id):
+        if self.on_release is not None:
+            self.on_release(task_id)
+
+    def with_status(self, *statuses):
+        """Return the (id, record) pairs of tasks in any of the given statuses."""
+        with self._lock:
+            placeholders = ', '.join('?' * len(statuses))
+            rows = self._db().execute(f'SELECT id FROM tasks WHERE status IN ({placeholders})', statuses).fetchall()
+            pairs = [(task_id, self.get(task_id)) for (task_id,) in rows]
+        return [(task_id, record) for task_id, record in pairs if record is not None]
+
+    def find_file(self, filename):
+        """
+        Find a task output (final render or preview) by file name.
+
+        Returns:
+            str: Full path of the file, or None if no task produced it
+        """
+        with self._lock:
+            row = self._db().execute(
+                'SELECT id, output_name = ? FROM tasks WHERE output_name = ? OR preview_name = ? '
+                'ORDER BY updated_at DESC LIMIT 1', (filename, filename, filename)
+            ).fetchone()
+            record = self.get(row[0]) if row else None
+        if record is None:
+            return None
+        return record.get('file_path') if row[1] else record.get('preview_path')
+
+
+def _basename(path):
+    return os.path.basename(path) if path else None
+
+
+_store = None
+
+
+def get_task_store():
+    """Return the process-wide task store."""
+    global _store
+    if _store is None:
+        _store = TaskStore()
+    return _store
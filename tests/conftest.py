@@ -0,0 +1,14 @@
+import os
+import sys
+import tempfile
+
+# The app's modules live flat at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep every store the modules open at import time out of the working tree
+_state_dir = tempfile.mkdtemp(prefix='clipkart-tests-')
+for _name, _path in (('TASK_DB', 'tasks.db'), ('ARTIFACT_DB', 'artifacts.db'),
+                     ('RENDER_CACHE_INDEX', 'renders.json'), ('UPLOAD_ROOT', 'uploads'),
+                     ('SOURCE_CACHE_DIR', 'sources'), ('FEATURE_STORE_DIR', 'features'),
+                     ('SCRATCH_ROOT', 'scratch'), ('CANCEL_DIR', 'cancel')):
+    os.environ.setdefault(_name, os.path.join(_state_dir, _path))
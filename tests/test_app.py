@@ -0,0 +1,110 @@
+import hashlib
+import io
+import os
+
+import pytest
+
+app = pytest.importorskip('app')
+import render_cache
+import uploads
+
+
+def _send(upload, data, index):
+    chunk = data[index * upload.chunk_size:(index + 1) * upload.chunk_size]
+    upload.write_chunk(index, io.BytesIO(chunk), hashlib.sha256(chunk).hexdigest())
+
+
+def test_chunked_upload_render_is_cached_under_its_digest(tmp_path, monkeypatch):
+    if not app.processor_available:
+        pytest.skip('video processor not importable')
+    data = os.urandom(20000)
+    output_dir = str(tmp_path / 'output')
+    upload = uploads.ChunkedUpload.create('clip.mp4', len(data), chunk_size=10000)
+    _send(upload, data, 0)
+
+    # The first chunk covers the duration the job needs
+    wait_until_ready = uploads.ChunkedUpload.wait_until_ready
+    monkeypatch.setattr(uploads.ChunkedUpload, 'wait_until_ready',
+                        lambda self, duration=None, **kwargs:
+                        None if duration else wait_until_ready(self, duration, **kwargs))
+
+    renders = []
+
+    def process_local_video(video_path, output_file, **kwargs):
+        # The rest of the upload arrives while the job renders
+        _send(upload, data, 1)
+        with open(output_file, 'wb') as f:
+            f.write(b'short')
+        renders.append(output_file)
+
+    monkeypatch.setattr(app.video_processor, 'process_local_video', process_local_video)
+
+    task = app.processing_tasks.add({'id': 'chunked-task', 'status': 'queued', 'is_upload': True})
+    app.process_video_task(task['id'], '', upload.path, output_dir, 'mp4', duration=10, reframe=False,
+                           upload_id=upload.upload_id)
+    assert app.processing_tasks['chunked-task']['status'] == 'completed'
+    assert len(renders) == 1
+
+    render_key = app.get_render_key('', hashlib.sha256(data).hexdigest(), 10, True, 'mp4', 'moviepy',
+                                    app.encode_profiles.DEFAULT_PROFILE, False, False, False)
+    assert render_cache.get_render_cache().lookup(render_key) == os.path.abspath(renders[0])
+
+    # The same bytes uploaded again are served from the cache without a job
+    again = uploads.ChunkedUpload.create('clip.mp4', len(data), chunk_size=10000)
+    _send(again, data, 0)
+    _send(again, data, 1)
+    response = app.app.test_client().post('/process', data={
+        'upload_id': again.upload_id, 'duration': '10', 'output_path': output_dir, 'reframe': 'false'})
+    assert response.get_json()['cached'] is True
+    assert len(renders) == 1
+
+
+class _Queue:
+    def __init__(self, pending):
+        self.pending = pending
+
+    def queue_position(self, task_id):
+        return self.pending.index(task_id) + 1 if task_id in self.pending else 0
+
+    def queue_depth(self):
+        return len(self.pending)
+
+
+def test_status_etag_follows_queue_depth(monkeypatch):
+    monkeypatch.setattr(app, 'scheduler', _Queue(['queued-task']))
+    app.processing_tasks.add({'id': 'queued-task', 'status': 'queued', 'progress': 0})
+    client = app.app.test_client()
+    first = client.get('/status/queued-task')
+    assert first.get_json()['queue_depth'] == 1
+    assert client.get('/status/queued-task', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+
+    # A job queued behind this one changes the payload, so the tag must change too
+    app.scheduler.pending.append('other-task')
+    second = client.get('/status/queued-task', headers={'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 200
+    assert second.get_json()['queue_depth'] == 2
+
+
+def test_finished_job_leaves_no_cancel_marker():
+    app.cancellation.request_cancel('finished-task')
+    app.apply_task_update('finished-task', 'finished_at', 0)
+    assert not app.cancellation.is_requested('finished-task')
+
+
+def test_upload_digest_reaches_the_processor(tmp_path, monkeypatch):
+    if not app.processor_available:
+        pytest.skip('video processor not importable')
+    upload_path = tmp_path / 'upload.mp4'
+    upload_path.write_bytes(b'video')
+    digests = []
+
+    def process_local_video(video_path, output_file, source_digest=None, **kwargs):
+        digests.append(source_digest)
+        with open(output_file, 'wb') as f:
+            f.write(b'short')
+
+    monkeypatch.setattr(app.video_processor, 'process_local_video', process_local_video)
+    task = app.processing_tasks.add({'id': 'digest-task', 'status': 'queued', 'is_upload': True})
+    app.process_video_task(task['id'], '', str(upload_path), str(tmp_path / 'output'), 'mp4', highlights=True,
+                           upload_digest='cd' * 32)
+    assert digests == ['cd' * 32]
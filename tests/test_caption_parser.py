@@ -0,0 +1,56 @@
+from caption_parser import CaptionTrack, parse_captions
+
+SRT = """1
+00:00:01,000 --> 00:00:03,000
+First
+
+2
+00:00:04,000 --> 00:00:30,000
+Long cue
+
+3
+00:00:05,000 --> 00:00:06,000
+Short cue
+
+4
+00:00:40,000 --> 00:00:42,000
+Late cue
+"""
+
+
+def test_window_includes_long_cue_started_before_shorter_ones():
+    track = parse_captions(SRT)
+    # Cue 3 ends before 10s, but the long cue that started earlier is still showing
+    assert track.window(10, 20) == [(4.0, 30.0, 'Long cue')]
+
+
+def test_window_bounds():
+    track = parse_captions(SRT)
+    assert [cue[2] for cue in track.window(0, 5)] == ['First', 'Long cue']
+    assert [cue[2] for cue in track.window(5.5, 41)] == ['Long cue', 'Short cue', 'Late cue']
+    assert track.window(30, 40) == []
+    assert CaptionTrack().window(0, 10) == []
+
+
+def test_window_matches_linear_scan():
+    cues = [(i * 0.7, i * 0.7 + (5.0 if i % 7 == 0 else 0.5), str(i)) for i in range(60)]
+    track = CaptionTrack(cues)
+    for start in range(0, 45, 3):
+        end = start + 2.5
+        expected = [cue for cue in track if cue[1] > start and cue[0] < end]
+        assert track.window(start, end) == expected
+
+
+def test_parse_until_clips_the_track():
+    track = parse_captions(SRT, end=10)
+    assert track.to_list() == [(1.0, 3.0, 'First'), (4.0, 10.0, 'Long cue'), (5.0, 6.0, 'Short cue')]
+
+
+def test_active_sees_a_long_cue_under_a_finished_short_one():
+    track = CaptionTrack([(4, 30, 'Long'), (5, 6, 'Short'), (40, 41, 'Later')])
+    assert track.active(3) is None
+    assert track.active(4.5) == 'Long'
+    assert track.active(5.5) == 'Short'
+    assert track.active(10) == 'Long'
+    assert track.active(35) is None
+    assert track.active(40) == 'Later'
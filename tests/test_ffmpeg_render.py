@@ -0,0 +1,20 @@
+import ffmpeg_render
+
+SEGMENTS = [(1.0, 3.0), (10.0, 12.5)]
+
+
+def test_concat_with_audio_joins_both_streams():
+    graph = ffmpeg_render.build_concat_filter(SEGMENTS)
+    assert '[0:a]atrim=start=10.000:end=12.500' in graph
+    assert graph.endswith('[v0][a0][v1][a1]concat=n=2:v=1:a=1[cv][ca]')
+    command = ffmpeg_render.build_command('in.mp4', 'out.mp4', 4.5, segments=SEGMENTS)
+    assert command[command.index('[outv]') + 1:command.index('[outv]') + 3] == ['-map', '[ca]']
+
+
+def test_concat_without_audio_is_video_only():
+    graph = ffmpeg_render.build_concat_filter(SEGMENTS, audio=False)
+    assert '[0:a]' not in graph
+    assert graph.endswith('[v0][v1]concat=n=2:v=1:a=0[cv]')
+    command = ffmpeg_render.build_command('in.mp4', 'out.mp4', 4.5, segments=SEGMENTS, audio=False)
+    assert '[ca]' not in command
+    assert ' '.join(command).count('-map') == 1
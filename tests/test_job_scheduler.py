@@ -0,0 +1,47 @@
+import threading
+import time
+
+import job_scheduler
+
+
+def sleep_briefly(task_id, seconds):
+    time.sleep(seconds)
+
+
+def _scheduler():
+    updates = []
+    finished = threading.Event()
+
+    def on_update(task_id, key, value):
+        updates.append((task_id, key))
+        if key == 'finished_at':
+            finished.set()
+
+    return job_scheduler.JobScheduler(sleep_briefly, workers=1, on_update=on_update), updates, finished
+
+
+def test_stop_is_requested_only_while_the_job_runs():
+    scheduler, updates, finished = _scheduler()
+    requests = []
+    scheduler.submit('job', 1.0)
+    deadline = time.time() + 10
+    while not scheduler.running_count() and time.time() < deadline:
+        time.sleep(0.01)
+
+    assert scheduler.cancel('job', requests.append) == 'running'
+    assert requests == ['job']
+    assert finished.wait(10)
+    # The finish is reported after the stop request, so it can clean the request up
+    assert updates.index(('job', 'finished_at')) == len(updates) - 1
+
+    assert scheduler.cancel('job', requests.append) is None
+    assert requests == ['job']
+
+
+def test_cancel_of_a_queued_job_requests_no_stop():
+    scheduler, updates, finished = _scheduler()
+    requests = []
+    scheduler.submit('first', 1.0)
+    scheduler.submit('second', 0)
+    assert scheduler.cancel('second', requests.append) == 'dequeued'
+    assert requests == []
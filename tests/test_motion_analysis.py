@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from motion_analysis import MotionProfile
+
+
+def make_profile():
+    times = np.arange(20) / 2
+    diffs = np.linspace(0.05, 0.5, 20)
+    return MotionProfile(times, diffs)
+
+
+def test_mean_motion_matches_direct_mean():
+    profile = make_profile()
+    # Samples at 2.0 .. 4.5; the first is skipped
+    expected = profile.diffs[5:10].mean()
+    assert profile.mean_motion([2.0], [5.0])[0] == pytest.approx(expected)
+
+
+def test_window_at_end_of_timeline_gets_default():
+    profile = make_profile()
+    assert profile.mean_motion([9.7], [10.0], default=0.5)[0] == 0.5
+    assert profile.mean_motion([9.5], [12.0], default=0.5)[0] == 0.5
+
+
+def test_window_running_past_the_end_uses_remaining_samples():
+    profile = make_profile()
+    expected = profile.diffs[17:].mean()
+    assert profile.mean_motion([8.0], [20.0])[0] == pytest.approx(expected)
+
+
+def test_empty_profile():
+    profile = MotionProfile(np.zeros(0), np.zeros(0))
+    assert profile.mean_motion([0.0, 3.0], [1.0, 4.0], default=0.25).tolist() == [0.25, 0.25]
@@ -0,0 +1,143 @@
+import http.server
+import re
+import struct
+import threading
+
+import pytest
+
+import range_download
+from range_download import RangeNotSupported
+
+FRAGMENT_SECONDS = 2
+FRAGMENT_COUNT = 5
+
+
+def box(box_type, payload):
+    return struct.pack('>I4s', 8 + len(payload), box_type) + payload
+
+
+def sidx_box(references, timescale=1000, nested=False):
+    payload = b'\x00\x00\x00\x00' + struct.pack('>II', 1, timescale) + struct.pack('>II', 0, 0)
+    payload += struct.pack('>HH', 0, len(references))
+    for size, duration in references:
+        payload += struct.pack('>III', size | (0x80000000 if nested else 0), duration, 0x90000000)
+    return box(b'sidx', payload)
+
+
+def fragment(index):
+    return box(b'moof', bytes(92)) + box(b'mdat', bytes([index + 1]) * 892)
+
+
+def make_fmp4(moov_size=1000, with_sidx=True, nested=False):
+    """ftyp + moov + sidx + (moof + mdat)*, with a moov of `moov_size` bytes."""
+    init = box(b'ftyp', b'iso6\x00\x00\x00\x00') + box(b'moov', bytes(moov_size - 8))
+    fragments = [fragment(i) for i in range(FRAGMENT_COUNT)]
+    index = sidx_box([(len(f), FRAGMENT_SECONDS * 1000) for f in fragments], nested=nested)
+    return init, (index if with_sidx else b'') + b''.join(fragments), fragments
+
+
+class MediaHandler(http.server.BaseHTTPRequestHandler):
+    files = {}
+    honor_range = True
+
+    def do_GET(self):
+        data = self.files[self.path]
+        match = re.match(r'bytes=(\d+)-(\d+)', self.headers.get('Range', ''))
+        if not (self.honor_range and match):
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        start, end = int(match.group(1)), min(int(match.group(2)), len(data) - 1)
+        body = data[start:end + 1]
+        self.send_response(206)
+        self.send_header('Content-Range', f'bytes {start}-{end}/{len(data)}')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    MediaHandler.files = {}
+    MediaHandler.honor_range = True
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), MediaHandler)
+    thread = threading.Thread(target=httpd.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+    thread.start()
+
+    def serve(name, data):
+        MediaHandler.files[f'/{name}'] = data
+        return f'http://127.0.0.1:{httpd.server_address[1]}/{name}'
+
+    yield serve
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_download_prefix_keeps_init_and_covering_fragments(server, tmp_path):
+    init, media, fragments = make_fmp4()
+    url = server('video.mp4', init + media)
+    output = tmp_path / 'prefix.mp4'
+
+    written = range_download.download_prefix(url, str(output), 3.0)
+
+    # 3s need the first two 2s fragments; the sidx is dropped
+    expected = init + fragments[0] + fragments[1]
+    assert output.read_bytes() == expected
+    assert written == len(expected)
+
+
+def test_plan_prefix_byte_range(server):
+    init, media, fragments = make_fmp4()
+    url = server('video.mp4', init + media)
+    header, media_start, media_end = range_download.plan_prefix(url, FRAGMENT_SECONDS * FRAGMENT_COUNT + 5)
+    assert header == init
+    # Longer than the video: every fragment
+    assert media_end - media_start + 1 == sum(len(f) for f in fragments)
+
+
+@pytest.mark.parametrize('offset', [-4, -8, 0, 3, 500])
+def test_header_boxes_straddling_probe_boundary(server, offset):
+    # Put the end of moov (and so the start of sidx) around the 64 KiB probe edge
+    ftyp_size = 16
+    moov_size = range_download.HEADER_PROBE_SIZE + offset - ftyp_size
+    init, media, fragments = make_fmp4(moov_size=moov_size)
+    url = server('big.mp4', init + media)
+    header, media_start, media_end = range_download.plan_prefix(url, 1.0)
+    assert header == init
+    data = init + media
+    assert data[media_start:media_end + 1] == fragments[0]
+
+
+def test_moov_larger_than_probe(server):
+    init, media, fragments = make_fmp4(moov_size=3 * range_download.HEADER_PROBE_SIZE + 123)
+    url = server('large-moov.mp4', init + media)
+    header, media_start, media_end = range_download.plan_prefix(url, 4.0)
+    assert header == init
+    assert (init + media)[media_start:media_end + 1] == fragments[0] + fragments[1]
+
+
+def test_missing_sidx_falls_back(server):
+    init, media, _ = make_fmp4(with_sidx=False)
+    url = server('nosidx.mp4', init + media)
+    with pytest.raises(RangeNotSupported, match='no segment index'):
+        range_download.plan_prefix(url, 3.0)
+
+
+def test_server_ignoring_range_falls_back(server, tmp_path):
+    init, media, _ = make_fmp4()
+    url = server('norange.mp4', init + media)
+    MediaHandler.honor_range = False
+    with pytest.raises(RangeNotSupported, match='200'):
+        range_download.download_prefix(url, str(tmp_path / 'out.mp4'), 3.0)
+
+
+def test_nested_sidx_falls_back(server):
+    init, media, _ = make_fmp4(nested=True)
+    url = server('nested.mp4', init + media)
+    with pytest.raises(RangeNotSupported, match='Nested'):
+        range_download.plan_prefix(url, 3.0)
@@ -0,0 +1,35 @@
+import shutil
+import subprocess
+
+import pytest
+
+import scene_detection
+
+pytestmark = pytest.mark.skipif(not shutil.which('ffmpeg'), reason='ffmpeg not installed')
+
+
+@pytest.fixture
+def three_scenes(tmp_path):
+    """Six seconds of 25 fps video: red, blue and white for two seconds each."""
+    path = str(tmp_path / 'scenes.mp4')
+    sources = []
+    for color in ('red', 'blue', 'white'):
+        sources += ['-f', 'lavfi', '-i', f'color={color}:s=64x64:r=25:d=2']
+    subprocess.run(['ffmpeg', '-loglevel', 'error', '-y', *sources, '-filter_complex',
+                    '[0][1][2]concat=n=3:v=1:a=0', '-pix_fmt', 'yuv420p', path], check=True)
+    return path
+
+
+def test_shards_decoded_by_ffmpeg_find_the_cuts(three_scenes, monkeypatch):
+    monkeypatch.setattr(scene_detection, 'probe_stream', lambda path: (64, 64, 25.0, 6.0))
+    # Shards of 3s: the second one starts in the middle of the blue scene with 2s of context
+    scenes = scene_detection.find_scenes(three_scenes, workers=1, shard_seconds=3)
+    assert len(scenes) == 3
+    assert scenes[0] == (0.0, pytest.approx(2.0, abs=0.1))
+    assert scenes[1][1] == pytest.approx(4.0, abs=0.1)
+    assert scenes[2][1] == 6.0
+
+
+def test_cut_in_the_overlap_belongs_to_the_previous_shard(three_scenes):
+    # The 2s cut lies in the context decoded before a shard starting at 2.5s
+    assert scene_detection._detect_shard(three_scenes, 2.5, 6.0, 30.0, 0, 25.0, (16, 16)) == [4.0]
@@ -0,0 +1,48 @@
+import os
+import time
+
+import source_cache
+from source_cache import SourceCache
+
+
+def producer(content, covered):
+    def produce(tmp_path):
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+        return '137-140', covered
+    return produce
+
+
+def test_partial_and_full_entries_use_separate_files(tmp_path):
+    cache = SourceCache(str(tmp_path))
+    partial = cache.fetch('vid', producer(b'p' * 10, 35.0), duration=30)
+    full = cache.fetch('vid', producer(b'f' * 100, None), duration=None)
+    assert partial != full
+    assert open(partial, 'rb').read() == b'p' * 10
+    assert open(full, 'rb').read() == b'f' * 100
+    # The partial entry still serves short requests, the full one everything else
+    assert cache.lookup('vid', 30) in (partial, full)
+    assert cache.lookup('vid', 60) == full
+
+
+def test_checked_out_entries_are_not_evicted(tmp_path, monkeypatch):
+    monkeypatch.setattr(source_cache, 'EVICTION_GRACE', 0)
+    cache = SourceCache(str(tmp_path), max_bytes=150)
+    with cache.checkout('a', producer(b'a' * 100, None)) as pinned:
+        time.sleep(0.01)
+        cache.fetch('b', producer(b'b' * 100, None))
+        assert os.path.exists(pinned)
+    time.sleep(0.01)
+    cache.fetch('c', producer(b'c' * 100, None))
+    assert not os.path.exists(pinned)
+
+
+def test_pins_of_dead_processes_are_ignored(tmp_path, monkeypatch):
+    monkeypatch.setattr(source_cache, 'EVICTION_GRACE', 0)
+    monkeypatch.setattr(source_cache, 'pid_alive', lambda pid: False)
+    cache = SourceCache(str(tmp_path), max_bytes=150)
+    context = cache.checkout('a', producer(b'a' * 100, None))
+    pinned = context.__enter__()
+    time.sleep(0.01)
+    cache.fetch('b', producer(b'b' * 100, None))
+    assert not os.path.exists(pinned)
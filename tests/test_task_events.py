@@ -0,0 +1,40 @@
+import threading
+import time
+
+from task_events import TaskEvents
+
+
+def _wait_in_thread(events, task_id):
+    result = []
+    marker = events.marker(task_id)
+    thread = threading.Thread(target=lambda: result.append(events.wait(task_id, marker, timeout=5)), daemon=True)
+    thread.start()
+    time.sleep(0.05)
+    return thread, marker, result
+
+
+def test_updates_wake_only_the_task_followed():
+    events = TaskEvents()
+    thread, marker, result = _wait_in_thread(events, 'a')
+    events.publish('b')
+    thread.join(0.3)
+    assert thread.is_alive()
+    events.publish('a')
+    thread.join(1)
+    assert result == [(marker[0] + 1, marker[1])]
+    assert not events._conditions
+
+
+def test_queue_moves_wake_every_task():
+    events = TaskEvents()
+    waiting = [_wait_in_thread(events, task_id) for task_id in ('a', 'b')]
+    events.publish_queue()
+    for thread, marker, result in waiting:
+        thread.join(1)
+        assert result == [(marker[0], marker[1] + 1)]
+
+
+def test_wait_times_out_with_the_same_marker():
+    events = TaskEvents()
+    marker = events.marker('a')
+    assert events.wait('a', marker, timeout=0.05) == marker
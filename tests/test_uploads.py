@@ -0,0 +1,104 @@
+import hashlib
+import io
+import os
+import threading
+
+import pytest
+
+import uploads
+import workspace
+
+
+def test_workspace_path_refuses_dot_ids(tmp_path):
+    for bad in ('', '.', '..'):
+        with pytest.raises(ValueError):
+            workspace.workspace_path(bad, str(tmp_path))
+    assert workspace.workspace_path('../x', str(tmp_path)) == os.path.join(str(tmp_path), '.._x')
+
+
+def test_malformed_upload_ids_are_unknown(tmp_path):
+    root = str(tmp_path / 'uploads')
+    os.makedirs(root)
+    upload = uploads.ChunkedUpload.create('clip.mp4', 10, root=root)
+    for bad in ('.', '..', '../uploads', upload.upload_id.upper(), upload.upload_id + 'x'):
+        with pytest.raises(uploads.UploadError):
+            uploads.ChunkedUpload(bad, root)
+        assert uploads.discard(bad, root) is False
+    assert os.path.isdir(upload.directory)
+    assert uploads.discard(upload.upload_id, root) is True
+    assert not os.path.isdir(upload.directory)
+    assert uploads.discard(upload.upload_id, root) is False
+
+
+def test_completed_upload_has_whole_file_digest(tmp_path):
+    data = os.urandom(25000)
+    upload = uploads.ChunkedUpload.create('clip.mp4', len(data), chunk_size=7000, root=str(tmp_path))
+    for index in reversed(range(upload.chunk_count)):
+        chunk = data[index * 7000:(index + 1) * 7000]
+        state = upload.write_chunk(index, io.BytesIO(chunk), hashlib.sha256(chunk).hexdigest())
+    assert state['complete']
+    assert upload.state()['sha256'] == hashlib.sha256(data).hexdigest()
+
+
+def _send(upload, data, index):
+    chunk = data[index * upload.chunk_size:(index + 1) * upload.chunk_size]
+    upload.write_chunk(index, io.BytesIO(chunk), hashlib.sha256(chunk).hexdigest())
+
+
+def _wait_in_thread(upload, duration):
+    done = threading.Event()
+    errors = []
+
+    def wait():
+        try:
+            upload.wait_until_ready(duration, stall_timeout=10)
+        except Exception as e:
+            errors.append(e)
+        done.set()
+
+    threading.Thread(target=wait, daemon=True).start()
+    return done, errors
+
+
+def test_partial_upload_waits_for_the_packets_it_needs(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, 'WAIT_POLL', 0.01)
+    data = os.urandom(50000)
+    upload = uploads.ChunkedUpload.create('clip.mp4', len(data), chunk_size=10000, root=str(tmp_path))
+    probes = []
+
+    def probe_packet_extent(path, duration):
+        # The index places the first 10s of packets in the first 25000 bytes
+        probes.append(upload.contiguous_bytes())
+        return 25000, duration, 40.0
+
+    monkeypatch.setattr(uploads.ffmpeg_render, 'probe_packet_extent', probe_packet_extent)
+    done, errors = _wait_in_thread(upload, 10)
+
+    # Chunks past the needed range, and a gap before it, don't make the upload ready
+    for index in (4, 0, 2):
+        _send(upload, data, index)
+        assert not done.wait(0.2)
+    _send(upload, data, 1)
+    assert done.wait(5) and not errors
+    assert upload.contiguous_bytes() >= 25000
+    assert not upload.state()['complete']
+    assert probes and probes[0] >= upload.chunk_size
+
+
+def test_unprobeable_upload_waits_for_all_of_it(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, 'WAIT_POLL', 0.01)
+    data = os.urandom(30000)
+    upload = uploads.ChunkedUpload.create('clip.mp4', len(data), chunk_size=10000, root=str(tmp_path))
+
+    def probe_packet_extent(path, duration):
+        # Index at the end of the file: only the received prefix parses, and not far
+        return 9000, 2.0, 0.0
+
+    monkeypatch.setattr(uploads.ffmpeg_render, 'probe_packet_extent', probe_packet_extent)
+    done, errors = _wait_in_thread(upload, 10)
+    for index in (0, 1):
+        _send(upload, data, index)
+        assert not done.wait(0.2)
+    _send(upload, data, 2)
+    assert done.wait(5) and not errors
+    assert upload.state()['complete']
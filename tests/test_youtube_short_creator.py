@@ -0,0 +1,225 @@
+import http.server
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+ysc = pytest.importorskip('youtube_short_creator_enhanced')
+import cancellation
+import ffmpeg_runner
+import range_download
+from test_range_download import make_fmp4
+
+# Seconds each media request is held, so overlapping downloads show in the stage timings
+MEDIA_DELAY = 0.3
+SRT = "1\n00:00:01,000 --> 00:00:03,000\nHello\n"
+
+
+class StreamHandler(http.server.BaseHTTPRequestHandler):
+    """Range-capable stand-in for the stream CDN; `failing` paths answer 500."""
+    files = {}
+    failing = set()
+    delays = {}
+
+    def do_GET(self):
+        if self.path in self.failing:
+            self.send_error(500)
+            return
+        data = self.files[self.path]
+        match = re.match(r'bytes=(\d+)-(\d+)', self.headers.get('Range', ''))
+        start, end = (int(match.group(1)), min(int(match.group(2)), len(data) - 1)) if match else (0, len(data) - 1)
+        if start > 0:
+            # Media request (not a header probe)
+            time.sleep(self.delays.get(self.path, MEDIA_DELAY))
+        body = data[start:end + 1]
+        self.send_response(206 if match else 200)
+        if match:
+            self.send_header('Content-Range', f'bytes {start}-{end}/{len(data)}')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeStream:
+    def __init__(self, itag, url, only_audio=False):
+        self.itag = itag
+        self.url = url
+        self.only_audio = only_audio
+
+    def download(self, output_path, filename):
+        with urllib.request.urlopen(self.url) as response, open(f"{output_path}/{filename}", 'wb') as f:
+            f.write(response.read())
+
+
+class FakeQuery(list):
+    def filter(self, only_audio=False, **kwargs):
+        return FakeQuery(s for s in self if s.only_audio == only_audio)
+
+    def order_by(self, attribute):
+        return self
+
+    def desc(self):
+        return self
+
+    def first(self):
+        return self[0] if self else None
+
+
+class FakeCaption:
+    def generate_srt_captions(self):
+        time.sleep(MEDIA_DELAY)
+        return SRT
+
+
+@pytest.fixture
+def youtube(monkeypatch, tmp_path):
+    """Serve a video and an audio fMP4 locally behind a fake pytubefix YouTube."""
+    StreamHandler.files = {}
+    StreamHandler.failing = set()
+    StreamHandler.delays = {}
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), StreamHandler)
+    threading.Thread(target=httpd.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True).start()
+    base = f'http://127.0.0.1:{httpd.server_address[1]}'
+    for name in ('video', 'audio'):
+        init, media, _ = make_fmp4()
+        StreamHandler.files[f'/{name}'] = init + media
+
+    class FakeYouTube:
+        def __init__(self, url):
+            self.video_id = 'abcdefghijk'
+            self.length = 10
+            self.captions = {'a.en': FakeCaption()}
+            self.streams = FakeQuery([FakeStream(137, f'{base}/video'), FakeStream(140, f'{base}/audio', True)])
+
+        def register_on_progress_callback(self, callback):
+            pass
+
+    merges = []
+
+    def fake_merge(args, *rest, **kwargs):
+        # Stand-in for the ffmpeg merge: concatenate the two inputs
+        inputs = [args[i + 1] for i, arg in enumerate(args) if arg == '-i']
+        with open(args[-1], 'wb') as out:
+            for path in inputs:
+                with open(path, 'rb') as f:
+                    out.write(f.read())
+        merges.append(inputs)
+
+    renders = []
+
+    def fake_render(source_path, output_file, duration, caption_data, timer, temp_dir, **kwargs):
+        with open(source_path, 'rb') as f:
+            renders.append((f.read(), caption_data))
+        return output_file
+
+    monkeypatch.setattr(ysc, 'YouTube', FakeYouTube)
+    monkeypatch.setattr(ffmpeg_runner, 'run', fake_merge)
+    monkeypatch.setattr(ysc, 'render_short_from_source', fake_render)
+    yield base, merges, renders
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _create(tmp_path, reports):
+    return ysc.create_short_from_youtube(
+        'https://www.youtube.com/watch?v=abcdefghijk', str(tmp_path / 'short.mp4'), duration=3,
+        use_cache=False, report_callback=lambda key, value: reports.setdefault(key, value))
+
+
+def test_streams_and_captions_are_fetched_together_then_merged(youtube, tmp_path):
+    base, merges, renders = youtube
+    reports = {}
+    assert _create(tmp_path, reports) == str(tmp_path / 'short.mp4')
+
+    # Both prefixes were merged and handed to the render with the captions
+    video_init, _, video_fragments = make_fmp4()
+    expected_prefix = video_init + video_fragments[0] + video_fragments[1] + video_fragments[2] + video_fragments[3]
+    assert len(merges) == 1
+    source, caption_data = renders[0]
+    assert source == expected_prefix * 2
+    assert caption_data == [(1.0, 3.0, 'Hello')]
+
+    timings = reports['stage_timings']
+    video, audio, captions = timings['download_video'], timings['download_audio'], timings['captions']
+    for a, b in ((video, audio), (video, captions), (audio, captions)):
+        assert a['start'] < b['end'] and b['start'] < a['end']
+    assert timings['merge']['start'] >= max(video['end'], audio['end'])
+    assert timings['source']['end'] >= timings['merge']['end']
+
+
+def test_failed_stream_stops_the_other_and_surfaces(youtube, tmp_path, monkeypatch):
+    base, merges, renders = youtube
+    StreamHandler.failing = {'/audio'}
+    StreamHandler.delays = {'/video': 1.0}
+
+    outcomes = {}
+    download_prefix = range_download.download_prefix
+
+    def recording_download_prefix(url, *args, **kwargs):
+        try:
+            return download_prefix(url, *args, **kwargs)
+        except Exception as e:
+            outcomes[url.rsplit('/', 1)[-1]] = e
+            raise
+
+    monkeypatch.setattr(range_download, 'download_prefix', recording_download_prefix)
+    reports = {}
+    with pytest.raises(urllib.error.HTTPError):
+        _create(tmp_path, reports)
+
+    # The video download was stopped (and had ended) by the time the error surfaced
+    assert isinstance(outcomes['video'], cancellation.TaskCancelled)
+    assert not merges and not renders
+    assert 'merge' not in reports['stage_timings']
+
+
+class FakeClip:
+    duration = 10
+    closed = False
+
+    def subclip(self, start, end):
+        return self
+
+    def fl(self, function):
+        return self
+
+    def resize(self, size):
+        return self
+
+    def write_videofile(self, *args, **kwargs):
+        raise cancellation.TaskCancelled('cancelled mid-render')
+
+    def close(self):
+        FakeClip.closed = True
+
+
+def test_moviepy_render_closes_the_source_when_cancelled(monkeypatch, tmp_path):
+    monkeypatch.setattr(ysc, 'VideoFileClip', lambda path: FakeClip())
+    with pytest.raises(cancellation.TaskCancelled):
+        ysc.render_short_moviepy('source.mp4', str(tmp_path / 'short.mp4'), 5, crop_path=object())
+    assert FakeClip.closed
+
+
+def test_local_video_uses_the_known_digest(monkeypatch, tmp_path):
+    source = tmp_path / 'upload.mp4'
+    source.write_bytes(b'video')
+    feature_ids = []
+
+    def fake_render(source_path, output_file, duration, caption_data, timer, temp_dir, feature_id=None, **kwargs):
+        feature_ids.append(feature_id)
+        return output_file
+
+    def no_rehash(path):
+        raise AssertionError('upload read again to hash it')
+
+    monkeypatch.setattr(ysc.ffmpeg_render, 'probe_video', lambda path: (1920, 1080, 60.0))
+    monkeypatch.setattr(ysc, 'render_short_from_source', fake_render)
+    monkeypatch.setattr(ysc, 'file_digest', no_rehash)
+    ysc.process_local_video(str(source), str(tmp_path / 'short.mp4'), highlights_mode=True, source_digest='ab' * 32)
+    assert feature_ids == ['upload-' + 'ab' * 16]
@@ -0,0 +1,213 @@
+"""
+Offline caption generation with Whisper for videos that have no captions.
+
+Whisper models stay loaded in a long-lived pool of worker processes, so
+only the first transcription in a process pays for loading. Audio for the
+requested time ranges is decoded by ffmpeg straight to 16 kHz float PCM in
+memory, split into chunks at pauses found by a simple energy VAD, and the
+chunks are transcribed in parallel. The result is the usual list of
+(start, end, text) tuples on the timeline of the concatenated ranges.
+
+Whisper (`openai-whisper`) is optional; without it `available()` is False
+and callers keep going without captions.
+"""
+import concurrent.futures
+import importlib.util
+import logging
+import os
+import threading
+
+import numpy as np
+
+import ffmpeg_runner
+
+WHISPER_MODEL = os.getenv('WHISPER_MODEL', 'tiny')
+WHISPER_WORKERS = int(os.getenv('WHISPER_WORKERS', max(1, (os.cpu_count() or 2) // 4)))
+
+# Whisper expects 16 kHz mono audio
+SAMPLE_RATE = 16000
+# VAD analysis frame length in seconds
+VAD_FRAME = 0.03
+# Chunks are cut at pauses at least this long
+MIN_SILENCE = 0.3
+# Longest chunk sent to Whisper (its own context window is 30 s)
+MAX_CHUNK = 28.0
+# Frames more than 20 dB below the loud parts (95th percentile) count as silence
+SILENCE_RATIO = 0.1
+# Absolute silence threshold in RMS, for very clean recordings
+MIN_SILENCE_RMS = 0.005
+
+_model = None
+
+
+def available():
+    """True if Whisper is installed."""
+    return importlib.util.find_spec('whisper') is not None
+
+
+def _init_worker(model_name, threads):
+    """Load the model once per pool process."""
+    global _model
+    import torch
+    import whisper
+    torch.set_num_threads(threads)
+    _model = whisper.load_model(model_name)
+
+
+def _transcribe_chunk(samples, language):
+    result = _model.transcribe(samples, language=language, fp16=False, condition_on_previous_text=False)
+    return [(segment['start'], segment['end'], segment['text'].strip()) for segment in result['segments']]
+
+
+def extract_pcm(video_path, start=0.0, duration=None):
+    """
+    Decode an audio range to 16 kHz mono float32 samples in memory.
+
+    Returns:
+        ndarray: Samples in [-1, 1]
+    """
+    command = ['ffmpeg', '-loglevel', 'error', '-ss', str(start)]
+    if duration is not None:
+        command += ['-t', str(duration)]
+    command += ['-i', video_path, '-vn', '-ac', '1', '-ar', str(SAMPLE_RATE), '-f', 'f32le', 'pipe:1']
+    pcm = ffmpeg_runner.capture(command, timeout=ffmpeg_runner.FFMPEG_TIMEOUT, label='ffmpeg audio extraction',
+                                text=False)
+    return np.frombuffer(pcm, dtype='<f4')
+
+
+def split_on_silence(samples, max_chunk=MAX_CHUNK, min_silence=MIN_SILENCE):
+    """
+    Split audio into speech chunks at pauses, using frame energy.
+
+    Chunks are cut in the middle of pauses of at least `min_silence` seconds
+    and never exceed `max_chunk` seconds (a chunk with no pause is cut hard).
+    Chunks that are silent throughout are dropped.
+
+    Returns:
+        list: (start_sample, end_sample) tuples
+    """
+    frame = int(VAD_FRAME * SAMPLE_RATE)
+    count = len(samples) // frame
+    if not count:
+        return []
+    frames = samples[:count * frame].reshape(count, frame)
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    threshold = max(np.percentile(rms, 95) * SILENCE_RATIO, MIN_SILENCE_RMS)
+    speech = rms > threshold
+
+    # Candidate cut points: middles of long enough silent runs
+    min_frames = max(1, int(min_silence / VAD_FRAME))
+    cuts = []
+    run_start = None
+    for i, is_speech in enumerate(np.append(speech, True)):
+        if not is_speech and run_start is None:
+            run_start = i
+        elif is_speech and run_start is not None:
+            if i - run_start >= min_frames:
+                cuts.append((run_start + i) // 2)
+            run_start = None
+
+    max_frames = int(max_chunk / VAD_FRAME)
+    chunks = []
+    start = 0
+    for cut in cuts + [count]:
+        # Hard splits inside a chunk that has no usable pause
+        while cut - start > max_frames:
+            chunks.append((start, start + max_frames))
+            start += max_frames
+        if cut > start:
+            chunks.append((start, cut))
+            start = cut
+
+    tail = len(samples)
+    return [(s * frame, tail if e == count else e * frame) for s, e in chunks if speech[s:e].any()]
+
+
+class TranscriptionPool:
+    """
+    Whisper worker processes that keep their model loaded between jobs.
+
+    Args:
+        model_name (str): Whisper model to load in each worker
+        workers (int): Number of worker processes
+    """
+
+    def __init__(self, model_name=WHISPER_MODEL, workers=WHISPER_WORKERS):
+        self.model_name = model_name
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                threads = max(1, (os.cpu_count() or 1) // self.workers)
+                self._executor = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.workers, initializer=_init_worker, initargs=(self.model_name, threads)
+                )
+            return self._executor
+
+    def _reset(self, executor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False)
+
+    def transcribe_ranges(self, video_path, ranges, language=None):
+        """
+        Transcribe time ranges of a source as if they were played back to back.
+
+        Args:
+            video_path (str): Source with an audio track
+            ranges (list): (start, end) tuples in source seconds
+            language (str): Spoken language code, or None to let Whisper detect it
+
+        Returns:
+            list: (start, end, text) tuples on the concatenated timeline
+        """
+        jobs = []
+        offset = 0.0
+        for start, end in ranges:
+            samples = extract_pcm(video_path, start, end - start)
+            for first, last in split_on_silence(samples):
+                jobs.append((offset + first / SAMPLE_RATE, offset + (end - start), samples[first:last]))
+            offset += end - start
+
+        executor = self._get_executor()
+        try:
+            futures = [executor.submit(_transcribe_chunk, chunk, language) for _, _, chunk in jobs]
+            captions = []
+            for (chunk_offset, range_end, _), future in zip(jobs, futures):
+                for start, end, text in future.result():
+                    if text:
+                        captions.append((chunk_offset + start, min(chunk_offset + end, range_end), text))
+        except concurrent.futures.process.BrokenProcessPool:
+            # A crashed worker takes the pool down; start fresh next time
+            self._reset(executor)
+            raise
+        captions.sort()
+        logging.info(f"Transcribed {len(jobs)} chunks into {len(captions)} captions")
+        return captions
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Process-wide transcription pool."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = TranscriptionPool()
+        return _pool
+
+
+def generate_captions(video_path, ranges, language=None):
+    """
+    Generate captions for time ranges of a source with the shared Whisper pool.
+
+    Returns:
+        list: (start, end, text) tuples on the concatenated timeline of `ranges`
+    """
+    return get_pool().transcribe_ranges(video_path, ranges, language)
@@ -0,0 +1,315 @@
+"""
+Resumable, chunked uploads of source videos.
+
+A client creates an upload session with the file's size, then PUTs the file
+in fixed-size chunks, each with its SHA-256. Every chunk is streamed from
+the request body straight into the session's scratch file at its offset and
+hashed on the way; a chunk whose checksum doesn't match is rejected and can
+simply be sent again. The session state (size, chunk size, digests of the
+chunks received) is a JSON file next to the data, so an interrupted upload
+resumes by asking which chunks are missing, and worker processes can follow
+an upload that is still in progress.
+
+A job may be queued before its upload has finished: wait_until_ready()
+returns as soon as the contiguous prefix received holds every packet of the
+part of the video the job needs, as located by the container's index.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+import uuid
+
+from werkzeug.utils import secure_filename
+
+import cancellation
+import ffmpeg_render
+import ffmpeg_runner
+from source_cache import atomic_write_json, file_lock
+from workspace import create_workspace, remove_workspace, workspace_path
+
+UPLOAD_ROOT = os.getenv('UPLOAD_ROOT', os.path.join(tempfile.gettempdir(), 'clipkart_uploads'))
+CHUNK_SIZE = 8 * 1024 * 1024
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+# Bytes read from the request body per write
+READ_SIZE = 1024 * 1024
+# Sessions untouched for this long are removed
+UPLOAD_TTL = 6 * 3600
+# Seconds a waiting job tolerates without new data before giving up
+STALL_TIMEOUT = 600
+# Packets found by the probe may end this much (s) short of the requested duration
+READY_TOLERANCE = 1.0
+WAIT_POLL = 1.0
+STATE_FILE = 'upload.json'
+# Session ids are uuid4().hex; anything else is refused before touching the disk
+_UPLOAD_ID = re.compile(r'^[0-9a-f]{32}$')
+
+
+class UploadError(ValueError):
+    """Invalid upload request: unknown session, chunk out of range, wrong length, ..."""
+
+
+class ChecksumMismatch(UploadError):
+    """A chunk's data doesn't match the checksum sent with it."""
+
+
+class ChunkedUpload:
+    """
+    One upload session.
+
+    Args:
+        upload_id (str): Session id returned by create()
+        root (str): Directory holding upload sessions
+    """
+
+    def __init__(self, upload_id, root=UPLOAD_ROOT):
+        if not valid_id(upload_id):
+            raise UploadError(f"Unknown upload: {upload_id}")
+        self.upload_id = upload_id
+        self.directory = workspace_path(upload_id, root)
+        self._state_path = os.path.join(self.directory, STATE_FILE)
+        state = self.state()
+        self.size = state['size']
+        self.chunk_size = state['chunk_size']
+        self.path = os.path.join(self.directory, state['data_name'])
+
+    @classmethod
+    def create(cls, filename, size, chunk_size=CHUNK_SIZE, root=UPLOAD_ROOT):
+        """
+        Start an upload session for a file of `size` bytes.
+
+        Returns:
+            ChunkedUpload: The new session, with its data file preallocated
+        """
+        if not isinstance(size, int) or size <= 0:
+            raise UploadError("Upload size must be a positive number of bytes")
+        if not 0 < chunk_size <= MAX_CHUNK_SIZE:
+            raise UploadError(f"Chunk size must be between 1 and {MAX_CHUNK_SIZE} bytes")
+        reap_stale(root)
+
+        upload_id = uuid.uuid4().hex
+        directory = create_workspace(upload_id, root)
+        # Keep the extension so ffmpeg can tell the container from the name
+        extension = os.path.splitext(secure_filename(filename or ''))[1].lower()
+        data_name = f"source{extension or '.mp4'}"
+        with open(os.path.join(directory, data_name), 'wb') as f:
+            f.truncate(size)
+        atomic_write_json(os.path.join(directory, STATE_FILE), {
+            'filename': filename,
+            'data_name': data_name,
+            'size': size,
+            'chunk_size': chunk_size,
+            'chunks': {},
+            'complete': False,
+            'created_at': time.time(),
+        })
+        logging.info(f"Upload {upload_id} started: {filename} ({size} bytes)")
+        return cls(upload_id, root)
+
+    def state(self):
+        """Read the session state; raises UploadError if the session doesn't exist."""
+        try:
+            with open(self._state_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise UploadError(f"Unknown upload: {self.upload_id}")
+
+    @property
+    def chunk_count(self):
+        return -(-self.size // self.chunk_size)
+
+    def write_chunk(self, index, stream, checksum):
+        """
+        Stream one chunk from `stream` into the data file and record it.
+
+        Args:
+            index (int): 0-based chunk number
+            stream: File-like object positioned at the chunk's data
+            checksum (str): Hex SHA-256 of the chunk
+
+        Returns:
+            dict: Session state after the chunk was recorded
+
+        Raises:
+            ChecksumMismatch: If the data doesn't match `checksum`
+            UploadError: If the chunk is out of range or has the wrong length
+        """
+        if not checksum:
+            raise UploadError("Missing chunk checksum")
+        if not 0 <= index < self.chunk_count:
+            raise UploadError(f"Chunk {index} is out of range (0-{self.chunk_count - 1})")
+        offset = index * self.chunk_size
+        expected = min(self.chunk_size, self.size - offset)
+
+        digest = hashlib.sha256()
+        written = 0
+        with open(self.path, 'r+b') as f:
+            f.seek(offset)
+            while written <= expected:
+                data = stream.read(min(READ_SIZE, expected + 1 - written))
+                if not data:
+                    break
+                digest.update(data)
+                f.write(data[:expected - written])
+                written += len(data)
+        valid = written == expected and digest.hexdigest() == checksum.lower()
+
+        with file_lock(self._state_path + '.lock'):
+            state = self.state()
+            if not valid:
+                # The bytes on disk were overwritten, so an earlier copy of this chunk is gone too
+                if state['chunks'].pop(str(index), None):
+                    state['complete'] = False
+                    state.pop('sha256', None)
+                    atomic_write_json(self._state_path, state)
+                if written != expected:
+                    raise UploadError(f"Chunk {index} must be exactly {expected} bytes")
+                raise ChecksumMismatch(f"Checksum mismatch for chunk {index}")
+            previous = state['chunks'].get(str(index))
+            state['chunks'][str(index)] = digest.hexdigest()
+            # A finished upload whose chunk was replaced with different data needs a new digest
+            completed = len(state['chunks']) == self.chunk_count and (
+                not state['complete'] or previous != digest.hexdigest())
+            if completed:
+                if not state['complete']:
+                    logging.info(f"Upload {self.upload_id} complete")
+                state['complete'] = True
+                state.pop('sha256', None)
+            atomic_write_json(self._state_path, state)
+
+        if completed:
+            # Whole-file digest, as for plain uploads, so the render cache matches either way;
+            # hashed outside the lock so status requests aren't held up
+            hashed_chunks = dict(state['chunks'])
+            sha256 = file_sha256(self.path)
+            with file_lock(self._state_path + '.lock'):
+                state = self.state()
+                # Skipped if a chunk changed while hashing; that write computes its own digest
+                if state['complete'] and state['chunks'] == hashed_chunks:
+                    state['sha256'] = sha256
+                    atomic_write_json(self._state_path, state)
+        return state
+
+    def missing_chunks(self, state=None):
+        """Indexes of the chunks not received yet."""
+        chunks = (state or self.state())['chunks']
+        return [i for i in range(self.chunk_count) if str(i) not in chunks]
+
+    def contiguous_bytes(self, state=None):
+        """Length of the prefix of the file that has fully arrived."""
+        chunks = (state or self.state())['chunks']
+        count = 0
+        while str(count) in chunks:
+            count += 1
+        return min(count * self.chunk_size, self.size)
+
+    def wait_until_ready(self, duration=None, progress_callback=None, stall_timeout=STALL_TIMEOUT):
+        """
+        Block until enough of the file has arrived to process its first `duration` seconds.
+
+        With duration None the whole file is waited for. A partial file is
+        considered ready once its container index can be probed and the
+        received prefix reaches the end of the last packet of the first
+        `duration` seconds. Files whose index comes last (or that can't be
+        probed) are waited for in full.
+
+        Args:
+            duration (float): Seconds from the start of the video that will be used
+            progress_callback (function): Called with the share of the file received (0-1)
+            stall_timeout (float): Seconds without new data before giving up
+
+        Raises:
+            ValueError: If the upload stalls
+        """
+        needed = None
+        probed_at = 0
+        last_received = -1
+        last_change = time.time()
+        while True:
+            cancellation.check()
+            state = self.state()
+            if state['complete']:
+                return
+            received = self.contiguous_bytes(state)
+            if received != last_received:
+                last_received = received
+                last_change = time.time()
+                if progress_callback:
+                    progress_callback(received / self.size)
+            elif time.time() - last_change > stall_timeout:
+                raise ValueError("Upload stalled before enough of the video arrived")
+
+            if duration and received and needed is None and received - probed_at >= self.chunk_size:
+                probed_at = received
+                needed = self._needed_bytes(duration)
+            if needed is not None and received >= needed:
+                logging.info(f"Upload {self.upload_id}: {received} of {self.size} bytes cover {duration}s")
+                return
+            time.sleep(WAIT_POLL)
+
+    def _needed_bytes(self, duration):
+        """Bytes the first `duration` seconds need, or None until the container index says."""
+        try:
+            end, covered, source_duration = ffmpeg_render.probe_packet_extent(self.path, duration)
+        except (ffmpeg_runner.FFmpegError, ValueError):
+            # Header not here yet (or not first in the file)
+            return None
+        # Stopping short of the duration means the index wasn't usable (e.g. fragments not received)
+        if not end or covered < min(duration, source_duration or duration) - READY_TOLERANCE:
+            return None
+        return min(end, self.size)
+
+    def remove(self):
+        """Delete the session and its data."""
+        remove_workspace(self.directory)
+
+
+def file_sha256(path, chunk_size=READ_SIZE):
+    """SHA-256 hex digest of a whole file, read sequentially."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for data in iter(lambda: f.read(chunk_size), b''):
+            digest.update(data)
+    return digest.hexdigest()
+
+
+def valid_id(upload_id):
+    """True if `upload_id` has the form of the ids create() hands out."""
+    return isinstance(upload_id, str) and bool(_UPLOAD_ID.match(upload_id))
+
+
+def discard(upload_id, root=UPLOAD_ROOT):
+    """
+    Delete an upload session and its data, if it still exists.
+
+    Returns:
+        bool: False if there was no such session
+    """
+    if not valid_id(upload_id):
+        return False
+    path = workspace_path(upload_id, root)
+    if not os.path.isdir(path):
+        return False
+    remove_workspace(path)
+    return True
+
+
+def reap_stale(root=UPLOAD_ROOT, max_age=UPLOAD_TTL):
+    """Remove upload sessions whose state hasn't changed for max_age seconds."""
+    if not os.path.isdir(root):
+        return 0
+    removed = 0
+    cutoff = time.time() - max_age
+    for name in os.listdir(root):
+        state_path = os.path.join(root, name, STATE_FILE)
+        try:
+            if os.path.getmtime(state_path) > cutoff:
+                continue
+        except OSError:
+            continue
+        remove_workspace(os.path.join(root, name))
+        removed += 1
+    return removed
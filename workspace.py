@@ -0,0 +1,154 @@
+"""
+Per-task scratch workspaces.
+
+Every job gets its own directory for intermediates (downloaded streams,
+merged source, subtitle files) so concurrent jobs never overwrite each
+other. Workspaces are removed when the job ends, and a background reaper
+cleans up directories left behind by crashed or killed workers.
+"""
+import contextlib
+import logging
+import os
+import platform
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+
+SCRATCH_ROOT = os.getenv('SCRATCH_ROOT', os.path.join(tempfile.gettempdir(), 'clipkart_scratch'))
+OWNER_FILE = '.owner'
+# Workspaces untouched for this long whose owner is gone are considered orphaned
+ORPHAN_MAX_AGE = 6 * 3600
+REAPER_INTERVAL = 15 * 60
+
+_reaper_started = False
+_reaper_lock = threading.Lock()
+
+
+def workspace_path(task_id, root=None):
+    """
+    Return the scratch directory path for a task id.
+
+    Raises:
+        ValueError: If the id would not name a directory inside the root ('', '.' or '..')
+    """
+    safe_id = re.sub(r'[^A-Za-z0-9_.-]', '_', str(task_id))
+    if safe_id in ('', '.', '..'):
+        raise ValueError(f"Invalid workspace id: {task_id!r}")
+    return os.path.join(root or SCRATCH_ROOT, safe_id)
+
+
+def create_workspace(task_id=None, root=None):
+    """
+    Create the scratch directory for a task.
+
+    Args:
+        task_id (str): Task identifier; a random one is used when omitted
+        root (str): Parent directory for workspaces (default: SCRATCH_ROOT)
+
+    Returns:
+        str: Path to the new, empty workspace
+    """
+    path = workspace_path(task_id or uuid.uuid4().hex, root)
+    if os.path.exists(path):
+        # Leftover from an earlier attempt with the same id
+        shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+    with open(os.path.join(path, OWNER_FILE), 'w') as f:
+        f.write(str(os.getpid()))
+    return path
+
+
+def remove_workspace(path):
+    """Delete a workspace and everything in it; never raises."""
+    if path and os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+        logging.info(f"Removed workspace {path}")
+
+
+@contextlib.contextmanager
+def task_workspace(task_id=None, root=None):
+    """Context manager yielding a task workspace that is removed on exit, even on failure."""
+    path = create_workspace(task_id, root)
+    try:
+        yield path
+    finally:
+        remove_workspace(path)
+
+
+def pid_alive(pid):
+    """
+    Return True if a process with this pid may still be running, False if it
+    is gone, or None when liveness can't be checked on this platform.
+    """
+    if platform.system() == 'Windows':
+        # os.kill(pid, 0) would send CTRL_C_EVENT on Windows; callers rely on age alone
+        return None
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _owner_alive(path):
+    """Return True if the process that created the workspace may still be running."""
+    try:
+        with open(os.path.join(path, OWNER_FILE)) as f:
+            pid = int(f.read().strip())
+    except (OSError, ValueError):
+        return False
+    return bool(pid_alive(pid))
+
+
+def reap_orphans(root=None, max_age=ORPHAN_MAX_AGE):
+    """
+    Remove workspaces older than max_age whose owning process is gone.
+
+    Returns:
+        int: Number of workspaces removed
+    """
+    root = root or SCRATCH_ROOT
+    if not os.path.isdir(root):
+        return 0
+
+    removed = 0
+    cutoff = time.time() - max_age
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        try:
+            if not os.path.isdir(path) or os.path.getmtime(path) > cutoff:
+                continue
+        except OSError:
+            continue
+        if _owner_alive(path):
+            continue
+        remove_workspace(path)
+        removed += 1
+
+    if removed:
+        logging.info(f"Reaped {removed} orphaned workspaces from {root}")
+    return removed
+
+
+def start_reaper(root=None, interval=REAPER_INTERVAL, max_age=ORPHAN_MAX_AGE):
+    """Start the background orphan reaper thread (once per process)."""
+    global _reaper_started
+    with _reaper_lock:
+        if _reaper_started:
+            return
+        _reaper_started = True
+
+    def run():
+        while True:
+            try:
+                reap_orphans(root, max_age)
+            except Exception as e:
+                logging.warning(f"Workspace reaper error: {str(e)}")
+            time.sleep(interval)
+
+    threading.Thread(target=run, name='workspace-reaper', daemon=True).start()
@@ -1,21 +1,46 @@
 import logging
 import tempfile
 from moviepy.editor import VideoFileClip, concatenate_videoclips, TextClip, CompositeVideoClip, ColorClip, AudioFileClip
-from pytubefix import YouTube
+from pytubefix import YouTube, extract
 import numpy as np
 import cv2
 from google.cloud import videointelligence
 import io
+import hashlib
 import time
 import json
 import logging
 import os
 from scenedetect import VideoManager, SceneManager
 from scenedetect.detectors import ContentDetector
+import urllib.error
+import concurrent.futures
+import contextlib
+import threading
+import range_download
+import ffmpeg_render
+import ffmpeg_runner
+import caption_renderer
+import highlights
+import feature_store
+import transcription
+import caption_parser
+import cancellation
+import proglog
+import workspace
+import source_cache
+import encode_profiles
+import reframing
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Extra seconds fetched beyond the requested duration in partial downloads
+PARTIAL_DOWNLOAD_MARGIN = 5
+
+# Available final render engines
+RENDER_BACKENDS = ('moviepy', 'ffmpeg')
+
 def download_youtube_video(url):
     logging.info(f"Downloading video from {url}...")
     #Getting the OS PATH
@@ -234,34 +259,6 @@ def download_youtube_video(url):
 #     print(f"Google analysis complete. Found {len(scene_boundaries)} scenes.")
 #     return scene_boundaries, scene_data
 
-# def find_scenes(video_path):
-#     """Fallback method to find scenes using local processing (PySceneDetect)"""
-#     print("Using local scene detection...")
-    
-#     # Create video manager and scene manager
-#     video_manager = VideoManager([video_path])
-#     scene_manager = SceneManager()
-#     scene_manager.add_detector(ContentDetector(threshold=30.0))
-    
-#     # Start video manager
-#     video_manager.start()
-    
-#     # Detect scenes
-#     scene_manager.detect_scenes(frame_source=video_manager)
-    
-#     # Get scene boundaries
-#     scene_list = scene_manager.get_scene_list()
-    
-#     # Convert scene list to timestamp format
-#     scene_boundaries = []
-#     for scene in scene_list:
-#         start_time = scene[0].get_seconds()
-#         end_time = scene[1].get_seconds()
-#         scene_boundaries.append((start_time, end_time))
-    
-#     video_manager.release()
-#     return scene_boundaries
-
 # def calculate_scene_interest(video_path, scene_boundaries, scene_data=None):
 #     """
 #     Calculate how interesting each scene is based on Google AI results and visual analysis
@@ -574,60 +571,6 @@ def download_youtube_video(url):
     
 #     return output_path_full
 
-# def generate_captions_with_whisper(video_path, progress_callback=None):
-#     """
-#     Generate captions using OpenAI's Whisper model
-    
-#     Args:
-#         video_path (str): Path to the video file
-#         progress_callback (function): Optional callback to report progress
-        
-#     Returns:
-#         list: List of caption dictionaries with text, start and end times
-#     """
-#     try:
-#         import whisper
-        
-#         if progress_callback:
-#             progress_callback(72, "Extracting audio for captions")
-        
-#         # Extract audio from video to a temporary file
-#         temp_audio = tempfile.NamedTemporaryFile(suffix='.wav', delete=False)
-#         temp_audio_path = temp_audio.name
-#         temp_audio.close()
-        
-#         # Extract audio using moviepy
-#         audio_clip = AudioFileClip(video_path)
-#         audio_clip.write_audiofile(temp_audio_path, verbose=False, logger=None)
-#         audio_clip.close()
-        
-#         if progress_callback:
-#             progress_callback(75, "Generating captions with Whisper")
-        
-#         # Load Whisper model (using the smallest model for speed)
-#         model = whisper.load_model("tiny")
-        
-#         # Transcribe audio
-#         result = model.transcribe(temp_audio_path)
-        
-#         # Format captions
-#         captions = []
-#         for segment in result["segments"]:
-#             caption = {
-#                 "text": segment["text"].strip(),
-#                 "start": segment["start"],
-#                 "end": segment["end"]
-#             }
-#             captions.append(caption)
-        
-#         # Clean up temporary file
-#         os.remove(temp_audio_path)
-        
-#         return captions
-#     except Exception as e:
-#         print(f"Error generating captions with Whisper: {e}")
-#         return []
-
 # def process_video(url, output_file='short_video.mp4', duration=30, progress_callback=None, captions=True):
 #     """
 #     Process a YouTube video to create a short-form clip with the first 30 seconds
@@ -745,134 +688,402 @@ def download_youtube_video(url):
 #         logging.error(f"Error processing video: {e}")
 #         raise e
 
-# def process_local_video(video_path, output_file='short_video.mp4', duration=30, progress_callback=None, captions=True):
-#     """
-#     Process a local video file to create a short-form clip
+# if __name__ == "__main__":
+#     # Example usage
+#     url = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+#     output_path = "output"
+#     analyze_video(url, output_path, format='mp4', duration=60) 
+
+def get_video_id(url):
+    """Return the YouTube video id for a URL without any network access"""
+    return extract.video_id(url)
+
+def download_stream(stream, output_path, filename, duration=None, margin=PARTIAL_DOWNLOAD_MARGIN, cancel_event=None):
+    """
+    Download a pytubefix stream, fetching only its first `duration` seconds when possible
     
-#     Args:
-#         video_path (str): Path to the local video file
-#         output_file (str): Path to save the output file
-#         duration (int): Target duration in seconds (default: 30)
-#         progress_callback (function): Optional callback to report progress percentage
-#         captions (bool): Whether to add captions to the video
+    Args:
+        stream (Stream): pytubefix stream to download
+        output_path (str): Directory to save the file in
+        filename (str): Name of the downloaded file
+        duration (float): Seconds needed from the start, or None for the full stream
+        margin (float): Extra seconds fetched beyond `duration`
+        cancel_event (threading.Event): Stops a partial download between chunks when set
         
-#     Returns:
-#         str: Path to the output video file
-#     """
-#     try:
-#         if not os.path.exists(video_path):
-#             raise ValueError(f"Video file not found: {video_path}")
-            
-#         # Report starting progress
-#         if progress_callback:
-#             progress_callback(10, "Loading video file")
+    Returns:
+        str: Path to the downloaded file
+    """
+    file_path = os.path.join(output_path, filename)
+    
+    if duration is not None:
+        try:
+            range_download.download_prefix(stream.url, file_path, duration + margin, cancel_event=cancel_event)
+            return file_path
+        except range_download.RangeNotSupported as e:
+            logging.info(f"Partial download not possible for itag {stream.itag}: {str(e)}. Downloading full stream")
+        except (urllib.error.URLError, OSError) as e:
+            logging.warning(f"Partial download failed for itag {stream.itag}: {str(e)}. Downloading full stream")
+    
+    stream.download(output_path=output_path, filename=filename)
+    return file_path
+
+class RenderLogger(proglog.ProgressBarLogger):
+    """
+    moviepy progress logger that reports export progress and honours cancellation
+    
+    Raising from the callback aborts write_videofile, which closes its ffmpeg
+    writer process on the way out.
+    """
+    
+    def __init__(self, progress_callback=None, start=80, end=98):
+        super().__init__()
+        self.progress_callback = progress_callback
+        self.start = start
+        self.end = end
+        self.last_percent = None
+    
+    def bars_callback(self, bar, attr, value, old_value=None):
+        cancellation.check()
+        if not self.progress_callback or bar != 't' or attr != 'index':
+            return
+        total = self.bars[bar].get('total')
+        if total:
+            percent = self.start + int((self.end - self.start) * min(1.0, (value + 1) / total))
+            if percent != self.last_percent:
+                self.last_percent = percent
+                self.progress_callback(percent, "Exporting final video")
+
+def render_short_moviepy(input_path, output_file, duration, caption_data=None, progress_callback=None,
+                         encode_profile=None, segments=None, crop_path=None):
+    """
+    Render a vertical short with moviepy (crop, resize, letterbox, captions)
+    
+    Args:
+        input_path (str): Merged source video (video + audio)
+        output_file (str): Path to save the output file
+        duration (float): Seconds to keep from the start of the source
+        caption_data (list): Optional (start, end, text) tuples to overlay
+        progress_callback (function): Optional callback to report progress percentage
+        encode_profile (str): Name of the x264 encode profile (see encode_profiles)
+        segments (list): Optional (start, end) tuples to concatenate instead of the first
+            `duration` seconds; caption times are then on the concatenated timeline
+        crop_path (reframing.CropPath): Optional moving 9:16 window to cut instead of the
+            letterboxed square
         
-#         logging.info(f"Processing local video: {video_path}")
-            
-#         # Load the video
-#         clip = VideoFileClip(video_path)
+    Returns:
+        str: Path to the output video file
+    """
+    # Load the video; its readers (and ffmpeg processes) are closed however the render ends
+    source = VideoFileClip(input_path)
+    try:
+        video = source
         
-#         if progress_callback:
-#             progress_callback(30, "Video loaded successfully")
-            
-#         # Take the first 30 seconds (or duration)
-#         if clip.duration > duration:
-#             if progress_callback:
-#                 progress_callback(40, "Trimming video")
-#             clip = clip.subclip(0, duration)
+        if segments:
+            # Join the highlight segments in one concat
+            video = concatenate_videoclips([source.subclip(start, end) for start, end in segments])
+        elif video.duration > duration:
+            # Trim to desired duration
+            video = video.subclip(0, duration)
         
-#         if progress_callback:
-#             progress_callback(50, "Creating vertical format")
-            
-#         # Convert to vertical format (9:16 aspect ratio)
-#         # Calculate crop dimensions to achieve 9:16 ratio
-#         target_aspect = 9/16  # vertical aspect ratio
+        if crop_path is not None:
+            return _render_reframed_moviepy(video, output_file, caption_data, crop_path, progress_callback,
+                                            encode_profile)
         
-#         # Get original dimensions
-#         w, h = clip.size
+        # Overlay captions (rasterized in-process, one layer per frame)
+        if caption_data:
+            video_with_captions = caption_renderer.overlay_captions(video, caption_data)
+        else:
+            video_with_captions = video
         
-#         # Calculate new width to achieve target aspect ratio
-#         new_w = int(h * target_aspect)
+        if progress_callback:
+            progress_callback(70, "Converting to vertical format")
         
-#         # Center crop
-#         if new_w < w:
-#             # Crop width to achieve vertical aspect ratio
-#             x1 = (w - new_w) // 2
-#             x2 = x1 + new_w
-#             cropped_clip = clip.crop(x1=x1, y1=0, x2=x2, y2=h)
-#         else:
-#             # If video is already narrower than 9:16, add black bars
-#             cropped_clip = clip
-            
-#         if progress_callback:
-#             progress_callback(60, "Format conversion completed")
-            
-#         # Add captions if requested
-#         if captions:
-#             if progress_callback:
-#                 progress_callback(70, "Generating captions")
-                
-#             # Generate captions using Whisper
-#             caption_data = generate_captions_with_whisper(video_path, progress_callback)
-            
-#             if caption_data:
-#                 # Create TextClip objects for each caption
-#                 txt_clips = []
-                
-#                 for caption in caption_data:
-#                     txt_clip = TextClip(
-#                         caption["text"], 
-#                         fontsize=24, 
-#                         color='white',
-#                         bg_color='rgba(0,0,0,0.5)',
-#                         stroke_color='black',
-#                         stroke_width=1,
-#                         method='caption',
-#                         size=(cropped_clip.w - 40, None),
-#                         font='Arial-Bold'
-#                     )
-                    
-#                     # Position at the bottom and set time
-#                     txt_clip = txt_clip.set_position(('center', 'bottom')).set_start(caption["start"]).set_duration(caption["end"] - caption["start"])
-#                     txt_clips.append(txt_clip)
-                
-#                 # Add all caption clips to the video
-#                 final_clip = CompositeVideoClip([cropped_clip] + txt_clips)
-#             else:
-#                 # Fallback if captions generation fails
-#                 final_clip = cropped_clip
-#         else:
-#             final_clip = cropped_clip
-            
-#         if progress_callback:
-#             progress_callback(80, "Exporting video")
+        # Get original dimensions
+        w, h = video_with_captions.size
         
-#         # Export the final video
-#         logging.info(f"Exporting video to {output_file}")
-#         final_clip.write_videofile(output_file, codec='libx264', audio_codec='aac')
+        # Calculate crop dimensions for square (center crop)
+        square_size = min(w, h)
+        x_center = w // 2
+        y_center = h // 2
         
-#         if progress_callback:
-#             progress_callback(100, "Complete")
-            
-#         # Clean up
-#         clip.close()
-#         if final_clip != cropped_clip:
-#             cropped_clip.close()
-#         final_clip.close()
-            
-#         return output_file
+        # Crop to square
+        square_video = video_with_captions.crop(
+            width=square_size,
+            height=square_size,
+            x_center=x_center,
+            y_center=y_center
+        )
         
-#     except Exception as e:
-#         logging.error(f"Error processing local video: {e}")
-#         raise e
+        # Calculate padding to achieve 9:16 aspect ratio (vertical)
+        target_width = 1080
+        target_height = 1920
+        scale_factor = target_width / square_size
+        
+        # Resize the square video to target width
+        resized_video = square_video.resize(width=target_width)
+        
+        # Add black bars on top and bottom
+        padding = (target_height - target_width) // 2
+        video_with_bars = resized_video.margin(top=padding, bottom=padding, color=(0, 0, 0))
+        
+        if progress_callback:
+            progress_callback(80, "Exporting final video")
+        
+        # Save the final video (the logger stops the writer if the job is cancelled)
+        video_with_bars.write_videofile(output_file, codec="libx264", audio_codec="aac", fps=24,
+                                        logger=RenderLogger(progress_callback),
+                                        **encode_profiles.moviepy_kwargs(encode_profile))
+        
+        return output_file
+    finally:
+        source.close()
 
-# if __name__ == "__main__":
-#     # Example usage
-#     url = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
-#     output_path = "output"
-#     analyze_video(url, output_path, format='mp4', duration=60) 
+def _render_reframed_moviepy(video, output_file, caption_data, crop_path, progress_callback, encode_profile):
+    """Cut the moving 9:16 window out of a trimmed clip, caption it and write it at 1080x1920"""
+    if progress_callback:
+        progress_callback(70, "Converting to vertical format")
+    
+    # Crop first so captions are laid out for the vertical frame
+    reframed = video.fl(lambda get_frame, t: crop_path.crop_frame(get_frame(t), t))
+    if caption_data:
+        reframed = caption_renderer.overlay_captions(reframed, caption_data)
+    vertical = reframed.resize((1080, 1920))
+    
+    if progress_callback:
+        progress_callback(80, "Exporting final video")
+    
+    vertical.write_videofile(output_file, codec="libx264", audio_codec="aac", fps=24,
+                             logger=RenderLogger(progress_callback),
+                             **encode_profiles.moviepy_kwargs(encode_profile))
+    
+    return output_file
+
+def render_preview(input_path, output_file, duration, caption_data=None, work_dir=None, segments=None,
+                   crop_path=None):
+    """
+    Render a quick low-resolution proxy next to the output file
+    
+    Failures are logged and ignored so they never fail the full render.
+    
+    Returns:
+        str: Path to the preview file, or None if it couldn't be rendered
+    """
+    preview_file = os.path.splitext(output_file)[0] + "_preview.mp4"
+    try:
+        start_time = time.time()
+        ffmpeg_render.render_preview(input_path, preview_file, duration, caption_data, work_dir=work_dir,
+                                     segments=segments, crop_path=crop_path)
+        logging.info(f"Preview rendered in {time.time() - start_time:.1f}s: {preview_file}")
+        return preview_file
+    except Exception as e:
+        logging.warning(f"Could not render preview: {str(e)}")
+        return None
+
+class StageTimer:
+    """
+    Thread-safe record of when each pipeline stage started and finished
+    
+    Times are seconds since the timer was created, so overlapping stages
+    (e.g. parallel downloads) are easy to spot.
+    """
+    
+    def __init__(self):
+        self.origin = time.time()
+        self.stages = {}
+        self._lock = threading.Lock()
+    
+    @contextlib.contextmanager
+    def stage(self, name):
+        # Every stage boundary is also a cancellation point
+        cancellation.check()
+        start = time.time() - self.origin
+        try:
+            yield
+        finally:
+            end = time.time() - self.origin
+            with self._lock:
+                self.stages[name] = {'start': round(start, 3), 'end': round(end, 3),
+                                     'duration': round(end - start, 3)}
+    
+    def summary(self):
+        with self._lock:
+            return dict(self.stages)
+
+def fetch_captions(yt, parse_until=None, use_cache=True):
+    """
+    Fetch and parse a video's YouTube captions, preferring English
+    
+    Args:
+        yt (YouTube): Video to fetch captions for
+        parse_until (float): Stop parsing at cues starting after this time (None = whole track)
+        use_cache (bool): Reuse and store parsed cues in the feature store; a stored
+            track is reused for any window it covers
+        
+    Returns:
+        list: (start, end, text) tuples, empty if the video has no usable captions
+    """
+    if use_cache:
+        stored_captions = feature_store.load_captions(yt.video_id, parse_until)
+        if stored_captions is not None:
+            return stored_captions
+    
+    try:
+        # Try to get captions from YouTube
+        try:
+            caption = yt.captions['a.en']
+        except:
+            try:
+                caption = yt.captions.get_by_language_code('en')
+            except:
+                # Try other available captions
+                if yt.captions:
+                    caption = list(yt.captions.values())[0]
+                else:
+                    caption = None
+        
+        if not caption:
+            return []
+        
+        caption_data = caption_parser.parse_captions(caption.generate_srt_captions(), parse_until).to_list()
+        if use_cache and caption_data:
+            feature_store.save_captions(yt.video_id, caption_data, parse_until)
+        return caption_data
+    except Exception as e:
+        logging.warning(f"Error getting captions: {str(e)}")
+        return []
+
+def render_short_from_source(source_path, output_file, duration, caption_data, timer, temp_dir,
+                             progress_callback=None, captions=True, render_backend='moviepy',
+                             encode_profile=encode_profiles.DEFAULT_PROFILE, preview_callback=None, fast_path=True,
+                             letterbox_source=False, report_callback=None, highlights_mode=False, feature_id=None,
+                             source_duration=None, reframe=False):
+    """
+    Turn a local source video into the short: the render pipeline shared by YouTube and uploaded sources
+    
+    Picks highlights if asked, transcribes with Whisper when there are no captions,
+    then takes the stream-copy fast path or finds the subject-following crop and
+    renders with the chosen backend. Only
+    the first `duration` seconds (or the highlight segments) are decoded; both
+    backends seek within the source instead of reading all of it.
+    
+    Args:
+        source_path (str): Source video with audio
+        output_file (str): Path to save the output file
+        duration (float): Seconds to keep from the start of the source (the budget in highlights mode)
+        caption_data (list): (start, end, text) tuples already available for the source
+        timer (StageTimer): Records the stages run here
+        temp_dir (str): The job's scratch workspace
+        feature_id (str): Feature store id for the source's analysis (None = don't store it)
+        source_duration (float): Length of the source in seconds, if known
+        Other args are as for create_short_from_youtube
+        
+    Returns:
+        str: Path to the output video file
+    """
+    segments = None
+    if highlights_mode:
+        if progress_callback:
+            progress_callback(52, "Finding highlights")
+        # Analysis is kept in the feature store under feature_id
+        with timer.stage('highlights'):
+            segments = highlights.pick_highlights(source_path, duration, feature_id,
+                                                  source_duration=source_duration)
+        if not segments:
+            raise ValueError("No scenes long enough for a highlight were found.")
+        duration = sum(end - start for start, end in segments)
+        caption_data = highlights.remap_captions(caption_data, segments)
+        if report_callback:
+            report_callback('segments', segments)
+    
+    # No captions from the source: transcribe just the part we keep with Whisper
+    if captions and not caption_data and transcription.available():
+        if progress_callback:
+            progress_callback(54, "Generating captions with Whisper")
+        try:
+            with timer.stage('transcription'):
+                caption_data = transcription.generate_captions(source_path, segments or [(0, duration)])
+        except Exception as e:
+            logging.warning(f"Error generating captions with Whisper: {str(e)}")
+            caption_data = []
+    
+    # Fast path: no captions to burn in and nothing to reframe, so just trim and remux
+    if fast_path and not segments:
+        try:
+            width, height, _ = ffmpeg_render.probe_video(source_path)
+            copy_ok = ffmpeg_render.can_stream_copy(width, height, bool(captions and caption_data),
+                                                    letterbox_source)
+        except Exception as e:
+            logging.warning(f"Could not probe source for stream copy: {str(e)}")
+            copy_ok = False
+        
+        if copy_ok:
+            if progress_callback:
+                progress_callback(70, "Trimming without re-encoding")
+            with timer.stage('render'):
+                ffmpeg_render.stream_copy(source_path, output_file, duration)
+            if report_callback:
+                report_callback('render_path', 'stream-copy')
+            if progress_callback:
+                progress_callback(100, "Complete")
+            return output_file
+    
+    crop_path = None
+    if reframe and not letterbox_source:
+        if progress_callback:
+            progress_callback(55, "Finding the subject to follow")
+        # Sparse sampling: a small fraction of the encode; a failure just keeps the centered crop
+        try:
+            with timer.stage('reframe'):
+                crop_path = reframing.compute_crop_path(source_path, segments or [(0, duration)])
+        except cancellation.TaskCancelled:
+            raise
+        except Exception as e:
+            logging.warning(f"Reframing failed, using the centered crop: {str(e)}")
+        if report_callback:
+            report_callback('reframe_keyframes', len(crop_path) if crop_path is not None else 0)
+    
+    if preview_callback:
+        if progress_callback:
+            progress_callback(57, "Rendering preview")
+        with timer.stage('preview'):
+            preview_file = render_preview(source_path, output_file, duration,
+                                          caption_data if captions else None, temp_dir, segments, crop_path)
+        if preview_file:
+            preview_callback(preview_file)
+    
+    if progress_callback:
+        progress_callback(60, "Creating short video")
+    
+    if report_callback:
+        report_callback('render_path', render_backend)
+    
+    with timer.stage('render'):
+        if render_backend == 'ffmpeg':
+            if progress_callback:
+                progress_callback(70, "Rendering vertical video with ffmpeg")
+            def render_progress(fraction):
+                progress_callback(70 + int(fraction * 28), "Rendering vertical video with ffmpeg")
+            
+            ffmpeg_render.render_short(source_path, output_file, duration,
+                                       caption_data if captions else None, work_dir=temp_dir,
+                                       encode_profile=encode_profile, segments=segments,
+                                       progress_callback=render_progress if progress_callback else None,
+                                       crop_path=crop_path)
+        else:
+            render_short_moviepy(source_path, output_file, duration,
+                                 caption_data if captions else None, progress_callback,
+                                 encode_profile=encode_profile, segments=segments, crop_path=crop_path)
+    
+    if progress_callback:
+        progress_callback(100, "Complete")
+    
+    return output_file
 
-def create_short_from_youtube(url, output_file='short_video.mp4', duration=45, progress_callback=None, captions=True):
+def create_short_from_youtube(url, output_file='short_video.mp4', duration=45, progress_callback=None, captions=True,
+                              partial_download=True, render_backend='moviepy', task_id=None, use_cache=True,
+                              encode_profile=encode_profiles.DEFAULT_PROFILE, preview_callback=None,
+                              fast_path=True, letterbox_source=False, report_callback=None, highlights_mode=False,
+                              reframe=False):
     """
     Creates a short vertical video from a YouTube URL with captions
     Based on the test_editing.ipynb workflow
@@ -883,33 +1094,71 @@ def create_short_from_youtube(url, output_file='short_video.mp4', duration=45, p
         duration (int): Target duration in seconds (default: 45)
         progress_callback (function): Optional callback to report progress percentage
         captions (bool): Whether to add captions to the video
+        partial_download (bool): Fetch only the first `duration` seconds of each stream
+            when the container allows it, falling back to a full download otherwise
+        render_backend (str): 'moviepy' or 'ffmpeg' (single native filtergraph)
+        task_id (str): Identifier for the job's scratch workspace (random if omitted)
+        use_cache (bool): Reuse downloaded sources from the shared source cache
+        encode_profile (str): x264 encode profile: 'fast-preview', 'balanced' or 'archive'
+        preview_callback (function): If given, a 360x640 proxy is rendered before the full
+            render and its path passed to this callback
+        fast_path (bool): Trim with stream copy instead of re-encoding when no captions are
+            burned in and the source is already vertical (or letterbox_source is set)
+        letterbox_source (bool): Accept the source frame as-is at its own resolution, letting
+            the player letterbox it, so landscape sources can use the fast path too
+        report_callback (function): Optional callback(key, value) for job details such as
+            the chosen 'render_path' ('stream-copy', 'moviepy' or 'ffmpeg') and 'stage_timings'
+        highlights_mode (bool): Fill `duration` with the most interesting scenes of the whole
+            video instead of taking its first `duration` seconds
+        reframe (bool): Cut a full 9:16 window that follows faces or the most salient
+            region of landscape sources, instead of a letterboxed center square
         
     Returns:
         str: Path to the output video file
     """
+    if render_backend not in RENDER_BACKENDS:
+        raise ValueError(f"Unknown render backend: {render_backend}")
+    encode_profiles.get_profile(encode_profile)
+    
+    temp_dir = None
+    timer = StageTimer()
+    io_pool = concurrent.futures.ThreadPoolExecutor(max_workers=3)
     try:
         # Report starting progress
         if progress_callback:
             progress_callback(5, "Starting download")
         
-        # Create temporary directory for processing
-        temp_dir = os.path.dirname(output_file)
-        if not temp_dir:
-            temp_dir = "videos"
+        # Create an isolated scratch directory for this job's intermediates
+        temp_dir = workspace.create_workspace(task_id)
         
-        os.makedirs(temp_dir, exist_ok=True)
+        output_dir = os.path.dirname(output_file)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
         
         logging.info(f"Processing YouTube URL: {url}")
         logging.info(f"Output file: {output_file}")
         
         # Download the YouTube video
         yt = YouTube(url)
+        # Set when one stream fails to download, so the other one stops instead of running on
+        download_failed = threading.Event()
+        
+        def check_download(stream, chunk, bytes_remaining):
+            """Called between chunks of full-stream downloads; aborts them on cancellation"""
+            cancellation.check()
+            if download_failed.is_set():
+                raise cancellation.TaskCancelled("Download stopped: the other stream failed")
+        
+        yt.register_on_progress_callback(check_download)
         
         if progress_callback:
             progress_callback(10, "Getting video information")
         
-        # Download video and audio separately for best quality
-        try:
+        # Only fetch the part of each stream we are going to keep (highlights need all of it)
+        fetch_duration = duration if partial_download and not highlights_mode else None
+        
+        def download_and_merge(merged_path):
+            """Download video and audio separately for best quality and merge them"""
             video_stream = yt.streams.filter(res="1080p", mime_type="video/mp4").first()
             if not video_stream:
                 # Fallback to the highest resolution available
@@ -921,176 +1170,83 @@ def create_short_from_youtube(url, output_file='short_video.mp4', duration=45, p
                 raise ValueError("Could not find suitable video and audio streams.")
             
             if progress_callback:
-                progress_callback(20, "Downloading video")
-            
-            # Download video and audio to temp directory
-            video_path = os.path.join(temp_dir, "temp_video.mp4")
-            audio_path = os.path.join(temp_dir, "temp_audio.mp4")
-            
-            video_stream.download(output_path=temp_dir, filename="temp_video.mp4")
-            
-            if progress_callback:
-                progress_callback(30, "Downloading audio")
-                
-            audio_stream.download(output_path=temp_dir, filename="temp_audio.mp4")
-            
-            # Merge video and audio
+                progress_callback(20, "Downloading video and audio")
+            
+            # Download video and audio to temp directory at the same time
+            def timed_download(stage, stream, filename):
+                with timer.stage(stage):
+                    return download_stream(stream, temp_dir, filename, duration=fetch_duration,
+                                           cancel_event=download_failed)
+            
+            video_future = io_pool.submit(timed_download, 'download_video', video_stream, "temp_video.mp4")
+            audio_future = io_pool.submit(timed_download, 'download_audio', audio_stream, "temp_audio.mp4")
+            done, _ = concurrent.futures.wait([video_future, audio_future],
+                                              return_when=concurrent.futures.FIRST_EXCEPTION)
+            error = next((future.exception() for future in done if future.exception()), None)
+            if error is not None:
+                # Stop the other download and let it end before the scratch directory goes away
+                download_failed.set()
+                concurrent.futures.wait([video_future, audio_future])
+                raise error
+            video_path = video_future.result()
+            audio_path = audio_future.result()
+            
+            # Merge video and audio as soon as both have landed
             if progress_callback:
                 progress_callback(40, "Merging video and audio")
-                
-            merged_path = os.path.join(temp_dir, "temp_merged.mp4")
             
-            os.system(f'ffmpeg -i "{video_path}" -i "{audio_path}" -c:v copy -c:a aac -map 0:v:0 -map 1:a:0 "{merged_path}" -y -loglevel quiet')
+            def merge_progress(fraction):
+                progress_callback(40 + int(fraction * 8), "Merging video and audio")
             
-            if progress_callback:
-                progress_callback(50, "Processing captions")
+            with timer.stage('merge'):
+                ffmpeg_runner.run(
+                    ['ffmpeg', '-y', '-loglevel', 'error', '-i', video_path, '-i', audio_path,
+                     '-c:v', 'copy', '-c:a', 'aac', '-map', '0:v:0', '-map', '1:a:0', merged_path],
+                    fetch_duration or yt.length, merge_progress if progress_callback else None,
+                    label='ffmpeg merge'
+                )
             
-            # Get captions
-            caption_data = []
-            try:
-                # Try to get captions from YouTube
-                try:
-                    caption = yt.captions['a.en']
-                except:
-                    try:
-                        caption = yt.captions.get_by_language_code('en')
-                    except:
-                        # Try other available captions
-                        if yt.captions:
-                            caption = list(yt.captions.values())[0]
-                        else:
-                            caption = None
+            covered = fetch_duration + PARTIAL_DOWNLOAD_MARGIN if fetch_duration is not None else None
+            return f"{video_stream.itag}-{audio_stream.itag}", covered
+        
+        try:
+            # Captions don't depend on the media, so fetch them while it downloads
+            caption_future = None
+            if captions:
+                # Highlights need the whole track, otherwise stop at `duration`
+                parse_until = None if highlights_mode else duration
                 
-                if caption and captions:
-                    srt_captions = caption.generate_srt_captions()
-                    
-                    # Parse SRT captions
-                    def parse_srt(srt_text):
-                        blocks = srt_text.strip().split("\n\n")
-                        parsed_captions = []
-                        
-                        for block in blocks:
-                            lines = block.split("\n")
-                            if len(lines) >= 3:
-                                index = int(lines[0])
-                                time_range = lines[1]
-                                text = " ".join(lines[2:])
-                                parsed_captions.append((index, time_range, text))
-                        
-                        return parsed_captions
-                    
-                    captions_list = parse_srt(srt_captions)
-                    
-                    # Convert time format from SRT to seconds
-                    def srt_to_seconds(time_str):
-                        h, m, s = time_str.split(":")
-                        s, ms = s.split(",")
-                        return int(h) * 3600 + int(m) * 60 + int(s) + int(ms) / 1000
-                    
-                    formatted_captions = []
-                    for index, time_range, text in captions_list:
-                        start, end = time_range.split(" --> ")
-                        start_time = srt_to_seconds(start)
-                        end_time = srt_to_seconds(end)
-                        formatted_captions.append((start_time, end_time, text))
-                    
-                    caption_data = formatted_captions
-            except Exception as e:
-                logging.warning(f"Error getting captions: {str(e)}")
-                caption_data = []
-            
-            if progress_callback:
-                progress_callback(60, "Creating short video")
-            
-            # Load the video
-            video = VideoFileClip(merged_path)
-            
-            # Trim to desired duration
-            if video.duration > duration:
-                video = video.subclip(0, duration)
-            
-            # Create text clips for captions
-            text_clips = []
-            if captions and caption_data:
-                for start, end, text in caption_data:
-                    # Skip captions beyond the video duration
-                    if start >= video.duration:
-                        continue
-                    
-                    # Adjust end time if it exceeds video duration
-                    if end > video.duration:
-                        end = video.duration
-                    
-                    txt_clip = TextClip(
-                        text, 
-                        fontsize=40, 
-                        color='white', 
-                        bg_color='rgba(0,0,0,0.5)',
-                        stroke_color='black',
-                        stroke_width=1,
-                        method='caption',
-                        size=(video.w * 0.8, None),
-                        font='Arial-Bold'
-                    )
-                    
-                    txt_clip = txt_clip.set_position(('center', 'bottom')).set_duration(end - start).set_start(start)
-                    text_clips.append(txt_clip)
-            
-            # Overlay text on video
-            if text_clips:
-                video_with_captions = CompositeVideoClip([video] + text_clips)
-            else:
-                video_with_captions = video
-            
-            if progress_callback:
-                progress_callback(70, "Converting to vertical format")
-            
-            # Get original dimensions
-            w, h = video_with_captions.size
-            
-            # Calculate crop dimensions for square (center crop)
-            square_size = min(w, h)
-            x_center = w // 2
-            y_center = h // 2
-            
-            # Crop to square
-            square_video = video_with_captions.crop(
-                width=square_size,
-                height=square_size,
-                x_center=x_center,
-                y_center=y_center
-            )
-            
-            # Calculate padding to achieve 9:16 aspect ratio (vertical)
-            target_width = 1080
-            target_height = 1920
-            scale_factor = target_width / square_size
-            
-            # Resize the square video to target width
-            resized_video = square_video.resize(width=target_width)
-            
-            # Add black bars on top and bottom
-            padding = (target_height - target_width) // 2
-            video_with_bars = resized_video.margin(top=padding, bottom=padding, color=(0, 0, 0))
-            
-            if progress_callback:
-                progress_callback(80, "Exporting final video")
-            
-            # Save the final video
-            video_with_bars.write_videofile(output_file, codec="libx264", audio_codec="aac", fps=24)
-            
-            # Clean up temporary files
-            for file_path in [video_path, audio_path, merged_path]:
-                if os.path.exists(file_path):
-                    try:
-                        os.remove(file_path)
-                    except:
-                        pass
-            
-            if progress_callback:
-                progress_callback(100, "Complete")
+                def timed_captions():
+                    with timer.stage('captions'):
+                        return fetch_captions(yt, parse_until, use_cache)
                 
-            return output_file
+                caption_future = io_pool.submit(timed_captions)
+            
+            # A cached source stays pinned against eviction until the render is done
+            with contextlib.ExitStack() as source_pin:
+                with timer.stage('source'):
+                    if use_cache:
+                        # Repeated requests for the same video reuse the merged source
+                        merged_path = source_pin.enter_context(source_cache.get_cache().checkout(
+                            yt.video_id, download_and_merge, duration=fetch_duration))
+                        logging.info(f"Using source {merged_path}")
+                    else:
+                        merged_path = os.path.join(temp_dir, "temp_merged.mp4")
+                        download_and_merge(merged_path)
+                
+                if progress_callback:
+                    progress_callback(50, "Processing captions")
+                
+                caption_data = caption_future.result() if caption_future else []
+                
+                return render_short_from_source(
+                    merged_path, output_file, duration, caption_data, timer, temp_dir,
+                    progress_callback=progress_callback, captions=captions, render_backend=render_backend,
+                    encode_profile=encode_profile, preview_callback=preview_callback, fast_path=fast_path,
+                    letterbox_source=letterbox_source, report_callback=report_callback,
+                    highlights_mode=highlights_mode, feature_id=yt.video_id if use_cache else None,
+                    source_duration=yt.length, reframe=reframe
+                )
             
         except Exception as e:
             logging.error(f"Error processing video: {str(e)}")
@@ -1103,10 +1259,118 @@ def create_short_from_youtube(url, output_file='short_video.mp4', duration=45, p
         if progress_callback:
             progress_callback(0, f"Error: {str(e)}")
         raise e
+    
+    finally:
+        # A caption fetch still running after a failed download is simply abandoned
+        io_pool.shutdown(wait=False, cancel_futures=True)
+        
+        stage_timings = timer.summary()
+        logging.info(f"Stage timings: {stage_timings}")
+        if report_callback:
+            report_callback('stage_timings', stage_timings)
+        
+        # Intermediates are removed whether the job succeeded or not
+        workspace.remove_workspace(temp_dir)
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """SHA-256 hex digest of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def process_local_video(video_path, output_file='short_video.mp4', duration=30, progress_callback=None, captions=True,
+                        render_backend='moviepy', task_id=None, use_cache=True,
+                        encode_profile=encode_profiles.DEFAULT_PROFILE, preview_callback=None, fast_path=True,
+                        letterbox_source=False, report_callback=None, highlights_mode=False, reframe=False,
+                        source_digest=None):
+    """
+    Creates a short vertical video from a local (e.g. uploaded) video file
+    
+    There is nothing to download or merge, so the file goes straight to the
+    render pipeline shared with YouTube jobs, which decodes only the first
+    `duration` seconds. Uploads have no caption track; captions come from
+    Whisper when it is installed.
+    
+    Args:
+        video_path (str): Path to the local video file
+        use_cache (bool): Keep highlight analysis in the feature store, keyed by the file's content
+        source_digest (str): SHA-256 of the file if already known (e.g. hashed while it was
+            uploaded), so it isn't read a second time
+        Other args are as for create_short_from_youtube
+        
+    Returns:
+        str: Path to the output video file
+    """
+    if render_backend not in RENDER_BACKENDS:
+        raise ValueError(f"Unknown render backend: {render_backend}")
+    encode_profiles.get_profile(encode_profile)
+    if not os.path.isfile(video_path):
+        raise ValueError(f"Video file not found: {video_path}")
+    
+    temp_dir = None
+    timer = StageTimer()
+    try:
+        if progress_callback:
+            progress_callback(10, "Loading video file")
+        
+        # Create an isolated scratch directory for this job's intermediates
+        temp_dir = workspace.create_workspace(task_id)
+        
+        output_dir = os.path.dirname(output_file)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        
+        logging.info(f"Processing local video: {video_path}")
+        logging.info(f"Output file: {output_file}")
+        
+        with timer.stage('probe'):
+            try:
+                _, _, source_duration = ffmpeg_render.probe_video(video_path)
+            except (ffmpeg_runner.FFmpegError, KeyError, IndexError) as e:
+                raise ValueError(f"Could not read the video file: {str(e)}")
+        
+        # Highlights analyse the whole file; store it under the content hash so re-uploads reuse it
+        feature_id = None
+        if highlights_mode and use_cache:
+            if not source_digest:
+                with timer.stage('digest'):
+                    source_digest = file_digest(video_path)
+            feature_id = f"upload-{source_digest[:32]}"
+        
+        if progress_callback:
+            progress_callback(50, "Processing video")
+        
+        return render_short_from_source(
+            video_path, output_file, duration, [], timer, temp_dir,
+            progress_callback=progress_callback, captions=captions, render_backend=render_backend,
+            encode_profile=encode_profile, preview_callback=preview_callback, fast_path=fast_path,
+            letterbox_source=letterbox_source, report_callback=report_callback,
+            highlights_mode=highlights_mode, feature_id=feature_id, source_duration=source_duration or None,
+            reframe=reframe
+        )
+    
+    except Exception as e:
+        logging.error(f"Error processing local video: {str(e)}")
+        if progress_callback:
+            progress_callback(0, f"Error: {str(e)}")
+        raise e
+    
+    finally:
+        stage_timings = timer.summary()
+        logging.info(f"Stage timings: {stage_timings}")
+        if report_callback:
+            report_callback('stage_timings', stage_timings)
+        
+        # Intermediates are removed whether the job succeeded or not
+        workspace.remove_workspace(temp_dir)
 
-def process_video(url, output_file='short_video.mp4', duration=45, progress_callback=None, captions=True):
+def process_video(url, output_file='short_video.mp4', duration=45, progress_callback=None, captions=True,
+                  render_backend='moviepy', encode_profile=encode_profiles.DEFAULT_PROFILE):
     """
     Process a YouTube video to create a short.
     This is a wrapper around the create_short_from_youtube function for compatibility.
     """
-    return create_short_from_youtube(url, output_file, duration, progress_callback, captions) 
\ No newline at end of file
+    return create_short_from_youtube(url, output_file, duration, progress_callback, captions,
+                                     render_backend=render_backend, encode_profile=encode_profile) 
\ No newline at end of file